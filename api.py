@@ -1,19 +1,290 @@
 import traceback
-from typing import List, Optional
-from datetime import datetime
+import asyncio
+import base64
+import json
+import os
+import re
+import time
+import unicodedata
+from typing import AsyncIterator, Callable, List, Optional
+from datetime import date, datetime, timedelta, timezone
 from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 import httpx
+from .cache import TTLCache, SingleFlight
+from .deadline import clamp_timeout, detached
+from .emby_mirror import EmbyMirror
+from .rollup import IngestRollup, add_episode, format_episode_ranges
+from .search_index import SearchIndex
+from .jsonstream import iter_json_array
+from .resilience import CircuitBreaker, CircuitOpenError, resilient_call, resilient_stream
+from .reqlog import RequestLogger
+
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+
+# 今日入库汇总只需要这些字段（Type、Name 为基础字段，总会返回）
+ADDITIONS_FIELDS = "ProductionYear,SeriesId,SeriesName,ParentIndexNumber,IndexNumber,DateCreated"
+# 计入入库汇总时保留的字段
+ROLLUP_KEYS = ("Id", "Type", "Name", "ProductionYear", "DateCreated", "SeriesId", "SeriesName",
+               "ParentIndexNumber", "IndexNumber")
+
+
+def build_breaker(name: str, config: dict) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_threshold=config.get('circuit_failure_threshold', 5),
+        recovery_timeout=config.get('circuit_recovery_timeout', 30),
+    )
+
+
+def build_http_client(config: dict, timeout: float) -> httpx.AsyncClient:
+    """创建长连接复用的 httpx 客户端，由插件持有并在卸载时关闭"""
+    limits = httpx.Limits(
+        max_connections=config.get('http_max_connections', 20),
+        max_keepalive_connections=config.get('http_max_keepalive', 10),
+        keepalive_expiry=config.get('http_keepalive_expiry', 30),
+    )
+    http2 = bool(config.get('http2', False))
+    if http2 and not HAS_HTTP2:
+        logger.warning("未安装 h2，HTTP/2 已禁用。可通过 pip install httpx[http2] 安装")
+        http2 = False
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, read=timeout),
+        limits=limits,
+        http2=http2,
+    )
+
+
+class SubscribeIndex:
+    """本地订阅索引，按 (类型, tmdbid, 季号) 记录已有订阅，电影的季号记为 0
+
+    TMDB 的电影和电视剧 ID 各自编号，同一个数字可能分别对应一部电影和一部剧，因此键中包含类型（电影/电视剧）。
+    由完整的订阅列表重建，订阅成功后增量加入，超过 TTL 视为过期需要重新拉取。
+    """
+
+    MOVIE = "电影"
+    TV = "电视剧"
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = float(ttl)
+        self._entries: dict[tuple[str, str, int], int | None] = {}  # (类型, tmdbid, season) -> 订阅ID
+        self.updated_at = 0.0
+        self.task: asyncio.Task | None = None  # 进行中的刷新
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self.updated_at > self.ttl
+
+    @property
+    def ready(self) -> bool:
+        """是否至少建好过一次"""
+        return self.updated_at > 0
+
+    @classmethod
+    def _key(cls, media_type, tmdbid, season) -> tuple[str, str, int]:
+        season = int(season or 0)
+        # 没有类型时按季号推断：有季号的只能是电视剧
+        media_type = media_type if media_type in (cls.MOVIE, cls.TV) else (cls.TV if season else cls.MOVIE)
+        return media_type, str(tmdbid), season
+
+    def rebuild(self, subscribes: list):
+        entries = {}
+        for sub in subscribes:
+            if sub.get('tmdbid'):
+                entries[self._key(sub.get('type'), sub['tmdbid'], sub.get('season'))] = sub.get('id')
+        self._entries = entries
+        self.updated_at = time.monotonic()
+
+    def add(self, media_type: str, tmdbid, season: int = 0, sub_id: int | None = None):
+        self._entries[self._key(media_type, tmdbid, season)] = sub_id
+
+    def has(self, media_type: str, tmdbid, season: int = 0) -> bool:
+        return self._key(media_type, tmdbid, season) in self._entries
+
+    def seasons(self, tmdbid) -> list[int]:
+        """该 TMDB ID 的电视剧已订阅的季号"""
+        tmdbid = str(tmdbid)
+        return sorted(season for kind, tid, season in self._entries
+                      if kind == self.TV and tid == tmdbid and season > 0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LibraryIndex:
+    """Emby 媒体库的 TMDB ID 索引，按 (类型, tmdbid) 记录已入库的季号，电影为空集合
+
+    由本地镜像或在线分页查询整体重建；过期后在后台刷新，查询始终读取已建好的版本，
+    不会因为刷新而等待。
+    """
+
+    def __init__(self, ttl: float = 600):
+        self.ttl = float(ttl)
+        self._entries: dict[tuple[str, str], set[int]] = {}
+        self.updated_at = 0.0
+        self.version: float | None = None  # 构建时镜像的 last_sync，镜像再次同步后需要重建
+        self.ready = False
+        self.task: asyncio.Task | None = None
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self.updated_at > self.ttl
+
+    def rebuild(self, titles, seasons, version: float | None = None):
+        """titles: [(条目ID, Movie/Series, tmdbid)]，seasons: [(剧集条目ID, 季号)]"""
+        by_series: dict[str, set[int]] = {}
+        for series_id, season in seasons:
+            if series_id and season:
+                by_series.setdefault(series_id, set()).add(int(season))
+        entries: dict[tuple[str, str], set[int]] = {}
+        for item_id, kind, tmdbid in titles:
+            if tmdbid:
+                # 同一部剧可能在媒体库中有多个条目，季号合并
+                entries.setdefault((kind, str(tmdbid)), set()).update(by_series.get(item_id, ()))
+        self._entries = entries
+        self.version = version
+        self.updated_at = time.monotonic()
+        self.ready = True
+
+    def lookup(self, kind: str, tmdbid) -> set[int] | None:
+        """已入库时返回季号集合（电影为空集合），未入库返回 None"""
+        return self._entries.get((kind, str(tmdbid)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class MoviepilotApi:
-    def __init__(self, config: dict):
+    # 在 token 到期前多少秒视为过期，提前重新登录
+    TOKEN_REFRESH_MARGIN = 60
+    # token 中没有 exp 字段时的默认有效期（秒）
+    TOKEN_DEFAULT_TTL = 3600
+
+    def __init__(self, config: dict, data_dir: str | None = None):
         self.base_url = config.get('mp_url')
         self.mp_username = config.get('mp_username')
         self.mp_password = config.get('mp_password')
         # 已移除 print 语句以防止信息泄露        
+        self.config = config
+        self.timeout = float(config.get('mp_timeout', 120))
+        self._client: httpx.AsyncClient | None = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._singleflight = SingleFlight(ttl=config.get('http_coalesce_ttl', 0))
+        self.breaker = build_breaker("MoviePilot", config)
+        self.reqlog = RequestLogger("MoviePilot", config)
+
+        # 本地订阅索引，用于跳过已订阅的季、在搜索结果中标注已订阅
+        self.sub_index = SubscribeIndex(ttl=config.get('mp_subscribe_index_ttl', 300))
+
+        # 搜索结果缓存：热门片名短时间内会被多人重复搜索
+        self.search_cache = TTLCache(
+            maxsize=config.get('mp_search_cache_size', 256),
+            ttl=config.get('mp_search_cache_ttl', 600),
+        )
+        self.search_negative_ttl = float(config.get('mp_search_negative_ttl', 60))
+        # 季列表缓存：按 TMDB ID 缓存，剧集的季信息很少变化
+        self.season_cache = TTLCache(
+            maxsize=config.get('mp_season_cache_size', 512),
+            ttl=config.get('mp_season_cache_ttl', 21600),
+        )
+
+        # token 缓存：同一 token 在到期前复用，避免每次请求都登录
+        self._token: str | None = None
+        self._token_expire_at: float = 0.0
+        self._token_lock = asyncio.Lock()
+        self.token_file = None
+        if data_dir and config.get('mp_persist_token', True):
+            self.token_file = os.path.join(data_dir, "mp_token.json")
+            self._load_token()
+
+    def _load_token(self):
+        """从插件数据目录加载上次保存的 token"""
+        try:
+            if self.token_file and os.path.exists(self.token_file):
+                with open(self.token_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 地址或用户变更后旧 token 不再可用
+                if data.get("mp_url") != self.base_url or data.get("username") != self.mp_username:
+                    return
+                self._token = data.get("access_token")
+                self._token_expire_at = float(data.get("expire_at", 0))
+        except Exception as e:
+            logger.warning(f"加载 MoviePilot token 缓存失败: {e}")
+
+    def _save_token(self):
+        """保存 token 到插件数据目录，重启后可直接复用"""
+        if not self.token_file:
+            return
+        try:
+            data = {
+                "mp_url": self.base_url,
+                "username": self.mp_username,
+                "access_token": self._token,
+                "expire_at": self._token_expire_at,
+            }
+            # token 为明文凭证，仅允许属主读写；已存在的旧文件也收紧权限
+            fd = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'w', encoding='utf-8') as f:
+                os.chmod(self.token_file, 0o600)
+                json.dump(data, f)
+        except Exception as e:
+            logger.warning(f"保存 MoviePilot token 缓存失败: {e}")
+
+    @staticmethod
+    def _parse_token_expire(token: str) -> float | None:
+        """解析 JWT 中的 exp 字段（不校验签名），失败返回 None"""
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+            return float(exp) if exp else None
+        except Exception:
+            return None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共享的 HTTP 客户端（懒创建，连接池在请求间复用）"""
+        if self._client is None or self._client.is_closed:
+            self._client = build_http_client(self.config, self.timeout)
+        return self._client
+
+    async def close(self):
+        """关闭共享的 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _token_valid(self) -> bool:
+        return bool(self._token) and time.time() < self._token_expire_at - self.TOKEN_REFRESH_MARGIN
+
+    def invalidate_token(self, token: str | None = None):
+        """使缓存的 token 失效；传入 token 时仅当其仍为当前 token 才失效，避免误伤刚刷新的 token"""
+        if token is None or token == self._token:
+            self._token = None
+            self._token_expire_at = 0.0
 
     async def _get_mp_token(self) -> str | None:
+        if self._token_valid():
+            return self._token
+
+        # 并发调用者共用同一次登录：拿到锁后再检查一次，前一个持锁者可能已刷新
+        async with self._token_lock:
+            if self._token_valid():
+                return self._token
+
+            token = await self._login()
+            if token:
+                self._token = token
+                self._token_expire_at = self._parse_token_expire(token) or time.time() + self.TOKEN_DEFAULT_TTL
+                self._save_token()
+            return token
+
+    async def _login(self) -> str | None:
         _api_path = "/api/v1/login/access-token"
         headers = {
             "Content-Type": "application/x-www-form-urlencoded",
@@ -49,33 +320,55 @@ class MoviepilotApi:
             logger.error("访问MoviePilot失败，请确认密码或者是否开启了两步验证")
             return
 
+    @staticmethod
+    def _normalize_query(media_name: str) -> str:
+        """规范化搜索词：全角转半角、去首尾空白、合并空白、忽略大小写"""
+        text = unicodedata.normalize("NFKC", media_name or "")
+        return " ".join(text.split()).lower()
+
     async def search_media_info(self, media_name: str) -> dict | None:
         from urllib.parse import quote_plus
+        cache_key = self._normalize_query(media_name)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
         _api_path = f"/api/v1/media/search?title={quote_plus(media_name)}"
         try:
             headers = await self._get_headers()
             if not headers:
                 return None
-            return await self._request(
+            data = await self._request(
                 url=self.base_url + _api_path,
                 method="GET",
                 headers=headers
             )
+            # 请求失败（None）不缓存；空结果只做短时缓存，避免新片上架后长时间搜不到
+            if data is not None:
+                self.search_cache.set(cache_key, data, ttl=None if data else self.search_negative_ttl)
+            return data
         except Exception as e:
             logger.error(f"Error searching movies: {e}\n{traceback.format_exc()}")
             return None
 
     async def list_all_seasons(self, tmdbid: str) -> dict | None:
+        cached = self.season_cache.get(str(tmdbid))
+        if cached is not None:
+            return list(cached)
+
         _api_path = f"/api/v1/tmdb/seasons/{tmdbid}"
         try:
             headers = await self._get_headers()
             if not headers:
                 return None
-            return await self._request(
+            data = await self._request(
                 url=self.base_url + _api_path,
                 method="GET",
                 headers=headers
             )
+            if data:
+                self.season_cache.set(str(tmdbid), data, ttl=self._season_cache_ttl(data))
+            return data
         except Exception as e:
             logger.error(f"Error listing seasons: {e}")
             return None
@@ -97,13 +390,51 @@ class MoviepilotApi:
                 headers=headers,
                 data=body
             )
-            logger.info(response)
-            return response.get("success", False) if response else False
+            success = response.get("success", False) if response else False
+            if success:
+                self.sub_index.add(SubscribeIndex.MOVIE, movie['tmdb_id'], 0, (response.get("data") or {}).get("id"))
+            return success
         except Exception as e:
             logger.error(f"Error subscribing to movie: {e}")
             return False
 
     async def subscribe_series(self, movie: dict, season: int) -> bool:
+        return await self.subscribe_season(movie, season) == self.SUB_SUCCESS
+
+    # 单季订阅结果
+    SUB_SUCCESS = "success"
+    SUB_EXISTS = "exists"
+    SUB_ERROR = "error"
+    SUB_PENDING = "pending"
+
+    def _season_cache_ttl(self, seasons: list) -> float:
+        """季列表的缓存时间：有尚未开播的季时最多缓存到其开播日，之后重新拉取"""
+        ttl = self.season_cache.ttl
+        today = date.today()
+        for season in seasons:
+            try:
+                air_date = date.fromisoformat(str(season.get('air_date') or ''))
+            except ValueError:
+                continue
+            if air_date > today:
+                until = datetime.combine(air_date, datetime.min.time()).timestamp() - time.time()
+                ttl = min(ttl, max(60.0, until))
+        return ttl
+
+    def _check_season_cache(self, subscribes: list):
+        """订阅列表中出现缓存的季列表里没有的季（如新季上线后在 MoviePilot 中被订阅），说明缓存已过时，使其失效"""
+        for sub in subscribes:
+            season = int(sub.get('season') or 0)
+            if not season or not sub.get('tmdbid') or sub.get('type') == SubscribeIndex.MOVIE:
+                continue
+            tmdbid = str(sub['tmdbid'])
+            cached = self.season_cache.peek(tmdbid)
+            if cached is not None and not any(s.get('season_number') == season for s in cached):
+                self.season_cache.pop(tmdbid)
+                logger.debug(f"第 {season} 季不在缓存的季列表中，已使 {tmdbid} 的季缓存失效")
+
+    async def subscribe_season(self, movie: dict, season: int) -> str:
+        """订阅单季，返回 SUB_SUCCESS / SUB_EXISTS / SUB_ERROR"""
         _api_path = "/api/v1/subscribe/"
         body = {
             "name": movie['title'],
@@ -113,42 +444,81 @@ class MoviepilotApi:
         try:
             headers = await self._get_headers()
             if not headers:
-                return False
+                return self.SUB_ERROR
             response = await self._request(
                 url=self.base_url + _api_path,
                 method="POST-JSON",
                 headers=headers,
                 data=body
             )
-            return response.get("success", False) if response else False
+            if not response:
+                return self.SUB_ERROR
+            # MoviePilot 对已存在的订阅返回 "订阅已存在" 之类的提示
+            if "已存在" in str(response.get("message") or ""):
+                status = self.SUB_EXISTS
+            elif response.get("success", False):
+                status = self.SUB_SUCCESS
+            else:
+                return self.SUB_ERROR
+            self.sub_index.add(SubscribeIndex.TV, movie['tmdb_id'], season, (response.get("data") or {}).get("id"))
+            return status
         except Exception as e:
             logger.error(f"Error subscribing to series: {e}")
-            return False
+            return self.SUB_ERROR
 
-    async def subscribe_all_seasons(self, movie: dict, seasons: list) -> dict:
-        """订阅电视剧的所有季
+    async def subscribe_all_seasons(self, movie: dict, seasons: list, deadline: float | None = None) -> dict:
+        """并发订阅电视剧的所有季
 
         Args:
             movie: 电视剧信息
             seasons: 季度列表
+            deadline: 最长等待秒数，超时未完成的季在后台继续提交并记为 pending
+
+        本地订阅索引中已存在的季不会再提交，直接记为 exists。
 
         Returns:
-            dict: {"success": int, "failed": int, "total": int}
+            dict: {"success": int, "failed": int, "total": int,
+                   "exists": int, "errors": int, "pending": int,
+                   "seasons": {季号: 订阅结果}}
+            其中 failed = exists + errors，与旧版本含义一致
         """
-        result = {"success": 0, "failed": 0, "total": len(seasons)}
-
-        for season in seasons:
-            season_num = season.get('season_number', 0)
-            if season_num <= 0:  # 跳过特辑等（season 0）
-                result["total"] -= 1
-                continue
-
-            success = await self.subscribe_series(movie, season_num)
-            if success:
-                result["success"] += 1
-            else:
-                result["failed"] += 1
-
+        season_nums = [s.get('season_number', 0) for s in seasons]
+        season_nums = [n for n in season_nums if n > 0]  # 跳过特辑等（season 0）
+        semaphore = asyncio.Semaphore(max(1, int(self.config.get('mp_subscribe_concurrency', 4))))
+
+        async def _subscribe(num: int) -> str:
+            async with semaphore:
+                return await self.subscribe_season(movie, num)
+
+        outcomes = {num: self.SUB_EXISTS for num in season_nums if self.sub_index.has(SubscribeIndex.TV, movie['tmdb_id'], num)}
+        # 超时的季会在后台继续提交，不受发起命令的总时间预算约束
+        tasks = {asyncio.create_task(detached(_subscribe(num))): num for num in season_nums if num not in outcomes}
+        done, pending = set(), set()
+        if tasks:
+            done, pending = await asyncio.wait(tasks.keys(), timeout=deadline)
+
+        for task in done:
+            try:
+                outcomes[tasks[task]] = task.result()
+            except Exception as e:
+                logger.error(f"订阅第 {tasks[task]} 季失败: {e}")
+                outcomes[tasks[task]] = self.SUB_ERROR
+        for task in pending:
+            # 不取消，让请求在后台完成，只是不再阻塞结果返回
+            outcomes[tasks[task]] = self.SUB_PENDING
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+        statuses = list(outcomes.values())
+        result = {
+            "success": statuses.count(self.SUB_SUCCESS),
+            "exists": statuses.count(self.SUB_EXISTS),
+            "errors": statuses.count(self.SUB_ERROR),
+            "pending": statuses.count(self.SUB_PENDING),
+            "total": len(season_nums),
+            "seasons": dict(sorted(outcomes.items())),
+        }
+        result["failed"] = result["exists"] + result["errors"]
         return result
 
     async def _request(
@@ -156,39 +526,90 @@ class MoviepilotApi:
             url,
             method="GET",
             headers=None,
-            data=None
+            data=None,
+            auth_retry=True
     ) -> List | None:
 
         if headers is None:
             headers = {'user-agent': 'nonebot2/0.0.1'}
-        timeout = httpx.Timeout(120.0, read=120.0)
 
-        # 脱敏日志：隐藏敏感信息
-        safe_headers = {k: ("***" if k.lower() in {"authorization", "x-emby-token"} else v) for k, v in (headers or {}).items()}
-        safe_data = None
-        if isinstance(data, dict):
-            safe_data = {k: ("***" if k.lower() in {"password", "access_token"} else v) for k, v in data.items()}
+        # 相同的并发 GET 共享同一个请求
+        if method == "GET":
+            key = (url, headers.get("Authorization"))
+            return await self._singleflight.do(key, lambda: self._send(url, method, headers, data, auth_retry))
+        return await self._send(url, method, headers, data, auth_retry)
+
+    async def _send(self, url, method, headers, data, auth_retry) -> List | None:
+        client = self._get_client()
+        if method == "GET":
+            send = lambda: client.get(url, headers=headers, timeout=clamp_timeout(self.timeout))
+        elif method == "POST-JSON":
+            send = lambda: client.post(url, headers=headers, json=data, timeout=clamp_timeout(self.timeout))
+        elif method == "POST-DATA":
+            send = lambda: client.post(url, headers=headers, data=data, timeout=clamp_timeout(self.timeout))
         else:
-            safe_data = data
-        logger.info(f"请求: url={url}, method={method}, headers={safe_headers}, data={safe_data}")
-
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            if method == "GET":
-                r = await client.get(url, headers=headers)
-            elif method == "POST-JSON":
-                r = await client.post(url, headers=headers, json=data)
-            elif method == "POST-DATA":
-                r = await client.post(url, headers=headers, data=data)
-            else:
-                return
+            return
+        # 只有 GET 是幂等的，才允许重试
+        try:
+            async with self.reqlog.track(method.split("-")[0], url) as record:
+                r = record.response = await resilient_call(
+                    send, self.breaker,
+                    retries=self.config.get('http_retries', 2) if method == "GET" else 0,
+                    base_delay=self.config.get('http_retry_base_delay', 0.5),
+                )
+        except CircuitOpenError as e:
+            # 熔断期间快速失败，按无结果处理，不在每个调用方打印异常堆栈
+            logger.warning(str(e))
+            return None
 
-            if r.status_code != 200:
-                logger.error(f"{r.status_code} 请求错误\n{r}")
-            else:
-                return r.json()
+        # token 被服务端提前吊销（如 MoviePilot 重启、修改密码）时重新登录一次
+        auth = headers.get("Authorization", "")
+        if r.status_code == 401 and auth_retry and auth.startswith("Bearer "):
+            logger.info("MoviePilot token 已失效，重新登录")
+            self.invalidate_token(auth[len("Bearer "):])
+            new_headers = await self._get_headers()
+            if new_headers:
+                return await self._request(url, method, {**headers, **new_headers}, data, auth_retry=False)
+            return
+
+        if r.status_code == 200:
+            return r.json()
+
+    async def _iter_json(self, url: str, headers: dict, key: str | None = None,
+                         auth_retry: bool = True) -> AsyncIterator:
+        """流式 GET 并逐个产出 JSON 数组元素，不把整个响应体读入内存"""
+        retry_headers = None
+        client = self._get_client()
+        async with self.reqlog.track("GET", url) as record:
+            async with resilient_stream(client, "GET", url, self.breaker, headers=headers,
+                                        timeout=clamp_timeout(self.timeout)) as r:
+                record.response = r
+                auth = headers.get("Authorization", "")
+                if r.status_code == 401 and auth_retry and auth.startswith("Bearer "):
+                    logger.info("MoviePilot token 已失效，重新登录")
+                    self.invalidate_token(auth[len("Bearer "):])
+                    retry_headers = await self._get_headers()
+                    if not retry_headers:
+                        raise RuntimeError("MoviePilot 重新登录失败")
+                elif r.status_code != 200:
+                    raise RuntimeError(f"{r.status_code} 请求错误")
+                else:
+                    async for item in iter_json_array(r.aiter_text(), key):
+                        yield item
+
+        if retry_headers:
+            async for item in self._iter_json(url, {**headers, **retry_headers}, key, auth_retry=False):
+                yield item
 
-    async def get_subscribes(self) -> List[dict] | None:
+    async def get_subscribes(self, predicate: Callable[[dict], bool] | None = None) -> List[dict] | None:
         """获取当前订阅列表
+
+        响应以流式解析；同时进行的调用（命令、订阅监控、订阅索引刷新）共享同一次下载，
+        各调用的 predicate 在拿到完整列表后分别应用
+
+        Args:
+            predicate: 过滤函数，返回 True 的订阅才会保留
+
         Returns:
             List[dict] | None: 返回订阅列表，每个订阅包含以下字段：
             - id: int 订阅ID
@@ -207,15 +628,13 @@ class MoviepilotApi:
                 logger.error("获取认证头失败")
                 return None
 
-            data = await self._request(
-                url=self.base_url + _api_path,
-                method="GET",
-                headers=headers
-            )
+            url = self.base_url + _api_path
+            subscribes = await self._singleflight.do(
+                ("stream", url, headers.get("Authorization")), lambda: self._fetch_subscribes(url, headers))
+            data = [sub for sub in subscribes if predicate is None or predicate(sub)]
 
             if not data:
                 logger.info("当前没有订阅")
-                return []
 
             return data
 
@@ -223,6 +642,30 @@ class MoviepilotApi:
             logger.error(f"获取订阅列表失败: {e}")
             return None
 
+    async def _fetch_subscribes(self, url: str, headers: dict) -> List[dict]:
+        """流式下载完整订阅列表，并顺带刷新本地订阅索引、检查季列表缓存"""
+        subscribes = [sub async for sub in self._iter_json(url, headers)]
+        self.sub_index.rebuild(subscribes)
+        self._check_season_cache(subscribes)
+        return subscribes
+
+    async def ensure_subscribe_index(self, max_wait: float | None = None) -> SubscribeIndex:
+        """订阅索引过期时在后台重新拉取订阅列表，并发调用只拉取一次
+
+        max_wait 为 None 时等待刷新完成；否则直接返回现有（可能已过期的）索引，
+        只有从未建好时最多等待 max_wait 秒，刷新不增加调用方的延迟。
+        """
+        index = self.sub_index
+        if index.stale:
+            if index.task is None or index.task.done():
+                index.task = asyncio.create_task(detached(self.get_subscribes()))
+            if max_wait is None:
+                # shield：调用方超时或被取消时刷新仍在后台完成
+                await asyncio.shield(index.task)
+            elif not index.ready and max_wait > 0:
+                await asyncio.wait({index.task}, timeout=max_wait)
+        return index
+
     async def get_download_progress(self) -> List[dict] | None:
         """获取下载进度
         Returns:
@@ -246,6 +689,10 @@ class MoviepilotApi:
                 headers=headers
             )
 
+            # 请求失败返回 None，与下载队列为空区分开
+            if data is None:
+                logger.error("获取下载进度失败")
+                return None
             if not data:
                 logger.info("当前没有正在下载的任务")
                 return []
@@ -258,13 +705,97 @@ class MoviepilotApi:
 
 
 class EmbyApi:
-    """Emby 服务器 API 封装"""
+    """Emby 服务器 API 封装
 
-    def __init__(self, config: dict):
+    多服务器时每台服务器一个实例，name 为服务器标签，用于区分日志、熔断器和本地数据文件
+    """
+
+    def __init__(self, config: dict, data_dir: str | None = None, name: str = ""):
+        self.name = name
+        self.label = f"Emby {name}" if name else "Emby"
         self.base_url = config.get('emby_url', '').rstrip('/')
         self.api_key = config.get('emby_api_key', '')
         self.user_id = config.get('emby_user_id', '')
         self.max_results = config.get('emby_max_results', 10)
+        self.config = config
+        self.timeout = float(config.get('emby_timeout', 30))
+        self._client: httpx.AsyncClient | None = None
+        self._singleflight = SingleFlight(ttl=config.get('http_coalesce_ttl', 0))
+        self.breaker = build_breaker(self.label, config)
+        self.reqlog = RequestLogger(self.label, config)
+        self.library_index = LibraryIndex(ttl=config.get('emby_library_index_ttl', 600))
+        suffix = f"_{re.sub(r'[^0-9A-Za-z_-]', '_', name)}" if name else ""
+
+        # 本地镜像：同步后搜索、最新入库、统计和日报直接查本地数据库，过期时回退到在线查询
+        # 镜像开启时默认同时维护内存搜索索引（支持错别字、拼音、原名）
+        self.mirror: EmbyMirror | None = None
+        self.search_index: SearchIndex | None = None
+
+        # 按天预聚合的入库汇总，用于周报、月报和趋势
+        self.rollup: IngestRollup | None = None
+        if data_dir and config.get('emby_rollup_enabled', True) and self.is_configured():
+            try:
+                self.rollup = IngestRollup(os.path.join(data_dir, f"emby_rollup{suffix}.db"),
+                                           retention_days=config.get('emby_rollup_retention_days', 400))
+            except Exception as e:
+                logger.error(f"初始化入库汇总失败: {e}")
+
+        if data_dir and config.get('emby_mirror_enabled', False) and self.is_configured():
+            if config.get('emby_search_index', True):
+                self.search_index = SearchIndex()
+            try:
+                self.mirror = EmbyMirror(self, os.path.join(data_dir, f"emby_mirror{suffix}.db"), config,
+                                         search_index=self.search_index)
+                if self.rollup is not None:
+                    # 镜像同步到的条目同时计入入库汇总
+                    self.mirror.listeners.append(self.rollup.record_async)
+            except Exception as e:
+                logger.error(f"初始化 Emby 本地镜像失败: {e}")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取共享的 HTTP 客户端（懒创建，连接池在请求间复用）"""
+        if self._client is None or self._client.is_closed:
+            self._client = build_http_client(self.config, self.timeout)
+        return self._client
+
+    async def close(self):
+        """关闭共享的 HTTP 客户端和本地镜像"""
+        if self.mirror is not None:
+            await self.mirror.stop()
+            self.mirror.close()
+        if self.rollup is not None:
+            self.rollup.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _use_mirror(self) -> bool:
+        """本地镜像在允许的陈旧时间内同步过时才使用"""
+        return self.mirror is not None and self.mirror.fresh
+
+    @staticmethod
+    def _include_types(media_type: str) -> list[str]:
+        if media_type == "movie":
+            return ["Movie"]
+        if media_type == "series":
+            return ["Series"]
+        return ["Movie", "Series"]
+
+    def _to_media_info(self, item: dict, with_details: bool = False) -> dict:
+        media_info = {
+            'id': item.get('Id', ''),
+            'name': item.get('Name', '未知'),
+            'original_title': item.get('OriginalTitle', ''),
+            'year': item.get('ProductionYear', ''),
+            'type': '电影' if item.get('Type') == 'Movie' else '电视剧',
+            'date_created': self._format_date(item.get('DateCreated', '')),
+            'provider_ids': {k.lower(): v for k, v in (item.get('ProviderIds') or {}).items() if v},
+        }
+        if with_details:
+            overview = item.get('Overview', '')
+            media_info['overview'] = overview[:100] + '...' if overview and len(overview) > 100 else overview
+            media_info['community_rating'] = item.get('CommunityRating', 0)
+        return media_info
 
     def _get_headers(self) -> dict:
         """获取 Emby API 请求头"""
@@ -274,23 +805,44 @@ class EmbyApi:
         }
 
     async def _request(self, url: str, method: str = "GET") -> Optional[dict]:
-        """发送 HTTP 请求"""
+        """发送 HTTP 请求，相同的并发 GET 共享同一个请求"""
+        if method != "GET":
+            return None
+        return await self._singleflight.do(url, lambda: self._send(url))
+
+    async def _send(self, url: str) -> Optional[dict]:
         try:
-            timeout = httpx.Timeout(30.0, read=30.0)
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                if method == "GET":
-                    r = await client.get(url, headers=self._get_headers())
-                else:
-                    return None
+            client = self._get_client()
+            async with self.reqlog.track("GET", url) as record:
+                r = record.response = await resilient_call(
+                    lambda: client.get(url, headers=self._get_headers(), timeout=clamp_timeout(self.timeout)),
+                    self.breaker,
+                    retries=self.config.get('http_retries', 2),
+                    base_delay=self.config.get('http_retry_base_delay', 0.5),
+                )
 
-                if r.status_code != 200:
-                    logger.error(f"Emby API 请求失败: {r.status_code}")
-                    return None
-                return r.json()
+            if r.status_code != 200:
+                return None
+            return r.json()
+        except CircuitOpenError as e:
+            logger.warning(str(e))
+            return None
         except Exception as e:
             logger.error(f"Emby API 请求异常: {e}")
             return None
 
+    async def _iter_items(self, url: str) -> AsyncIterator[dict]:
+        """流式 GET 并逐个产出响应中 Items 数组的元素，不把整个响应体读入内存"""
+        client = self._get_client()
+        async with self.reqlog.track("GET", url) as record:
+            async with resilient_stream(client, "GET", url, self.breaker, headers=self._get_headers(),
+                                        timeout=clamp_timeout(self.timeout)) as r:
+                record.response = r
+                if r.status_code != 200:
+                    raise RuntimeError(f"Emby API 请求失败: {r.status_code}")
+                async for item in iter_json_array(r.aiter_text(), key="Items"):
+                    yield item
+
     def is_configured(self) -> bool:
         """检查 Emby 是否已配置"""
         return bool(self.base_url and self.api_key)
@@ -309,16 +861,16 @@ class EmbyApi:
             return []
 
         # 根据类型设置过滤条件
-        include_types = ""
-        if media_type == "movie":
-            include_types = "Movie"
-        elif media_type == "series":
-            include_types = "Series"
-        else:
-            include_types = "Movie,Series"
+        include_types = self._include_types(media_type)
+        if self._use_mirror():
+            try:
+                return [self._to_media_info(item, with_details=True)
+                        for item in await self.mirror.latest(include_types, self.max_results)]
+            except Exception as e:
+                logger.warning(f"查询 Emby 本地镜像失败，改为在线查询: {e}")
 
         # 构建 API 请求
-        params = f"?SortBy=DateCreated&SortOrder=Descending&IncludeItemTypes={include_types}&Recursive=true&Limit={self.max_results}"
+        params = f"?SortBy=DateCreated&SortOrder=Descending&IncludeItemTypes={','.join(include_types)}&Recursive=true&Limit={self.max_results}&Fields=ProviderIds,Overview"
 
         if self.user_id:
             url = f"{self.base_url}/Users/{self.user_id}/Items{params}"
@@ -330,21 +882,7 @@ class EmbyApi:
             if not data or 'Items' not in data:
                 return []
 
-            results = []
-            for item in data['Items']:
-                media_info = {
-                    'id': item.get('Id', ''),
-                    'name': item.get('Name', '未知'),
-                    'original_title': item.get('OriginalTitle', ''),
-                    'year': item.get('ProductionYear', ''),
-                    'type': '电影' if item.get('Type') == 'Movie' else '电视剧',
-                    'date_created': self._format_date(item.get('DateCreated', '')),
-                    'overview': item.get('Overview', '')[:100] + '...' if item.get('Overview') and len(item.get('Overview', '')) > 100 else item.get('Overview', ''),
-                    'community_rating': item.get('CommunityRating', 0),
-                }
-                results.append(media_info)
-
-            return results
+            return [self._to_media_info(item, with_details=True) for item in data['Items']]
 
         except Exception as e:
             logger.error(f"获取 Emby 最新入库失败: {e}\n{traceback.format_exc()}")
@@ -363,7 +901,21 @@ class EmbyApi:
             logger.error("Emby 未配置")
             return []
 
-        params = f"?SearchTerm={keyword}&IncludeItemTypes=Movie,Series&Recursive=true&Limit={self.max_results}"
+        if self._use_mirror():
+            # 本地索引、镜像都没有命中时依次降级，最后再在线查询一次
+            if self.search_index is not None and self.search_index.ready:
+                results = self.search_index.search(keyword, self.max_results, types=("Movie", "Series"))
+                if results:
+                    return [self._to_media_info(item) for item in results]
+            try:
+                results = await self.mirror.search(keyword.strip(), ["Movie", "Series"], self.max_results)
+                if results:
+                    return [self._to_media_info(item) for item in results]
+            except Exception as e:
+                logger.warning(f"查询 Emby 本地镜像失败，改为在线查询: {e}")
+
+        from urllib.parse import quote_plus
+        params = f"?SearchTerm={quote_plus(keyword.strip())}&IncludeItemTypes=Movie,Series&Recursive=true&Limit={self.max_results}&Fields=ProviderIds,OriginalTitle"
 
         if self.user_id:
             url = f"{self.base_url}/Users/{self.user_id}/Items{params}"
@@ -375,19 +927,7 @@ class EmbyApi:
             if not data or 'Items' not in data:
                 return []
 
-            results = []
-            for item in data['Items']:
-                media_info = {
-                    'id': item.get('Id', ''),
-                    'name': item.get('Name', '未知'),
-                    'original_title': item.get('OriginalTitle', ''),
-                    'year': item.get('ProductionYear', ''),
-                    'type': '电影' if item.get('Type') == 'Movie' else '电视剧',
-                    'date_created': self._format_date(item.get('DateCreated', '')),
-                }
-                results.append(media_info)
-
-            return results
+            return [self._to_media_info(item) for item in data['Items']]
 
         except Exception as e:
             logger.error(f"Emby 搜索失败: {e}\n{traceback.format_exc()}")
@@ -405,6 +945,16 @@ class EmbyApi:
 
         stats = {'movies': 0, 'series': 0, 'episodes': 0}
 
+        if self._use_mirror():
+            try:
+                counts = await self.mirror.counts()
+                stats['movies'] = counts.get('Movie', 0)
+                stats['series'] = counts.get('Series', 0)
+                stats['episodes'] = counts.get('Episode', 0)
+                return stats
+            except Exception as e:
+                logger.warning(f"查询 Emby 本地镜像失败，改为在线查询: {e}")
+
         try:
             # 获取电影数量
             movie_url = f"{self.base_url}/Items/Counts"
@@ -421,120 +971,231 @@ class EmbyApi:
             logger.error(f"获取 Emby 统计信息失败: {e}")
             return stats
 
+    async def ensure_library_index(self, max_wait: float = 0) -> LibraryIndex:
+        """入库索引过期（或本地镜像又同步过）时在后台重建
+
+        从未建好时最多等待 max_wait 秒，之后都直接返回现有版本，刷新不增加调用方的延迟。
+        """
+        index = self.library_index
+        version = self.mirror.last_sync if self._use_mirror() else None
+        if index.stale or (version is not None and version != index.version):
+            if index.task is None or index.task.done():
+                index.task = asyncio.create_task(detached(self._rebuild_library_index()))
+            if not index.ready and max_wait > 0:
+                await asyncio.wait({index.task}, timeout=max_wait)
+        return index
+
+    async def _rebuild_library_index(self):
+        try:
+            if self._use_mirror():
+                version = self.mirror.last_sync
+                titles, seasons = await self.mirror.library_entries()
+            else:
+                version = None
+                titles, seasons = [], []
+                params = ("?Recursive=true&IncludeItemTypes=Movie,Series,Season&Fields=ProviderIds"
+                          "&EnableImages=false&EnableUserData=false&EnableTotalRecordCount=false")
+                page_size = max(50, int(self.config.get('emby_page_size', 200)))
+                async for item in self._iter_item_pages(f"{self.base_url}/Items{params}", page_size):
+                    if item.get('Type') == "Season":
+                        seasons.append((item.get('SeriesId'), item.get('IndexNumber')))
+                    else:
+                        providers = {k.lower(): v for k, v in (item.get('ProviderIds') or {}).items()}
+                        titles.append((item.get('Id'), item.get('Type'), providers.get('tmdb')))
+            self.library_index.rebuild(titles, seasons, version)
+            logger.debug(f"{self.label} 入库索引已重建: {len(self.library_index)} 部")
+        except Exception as e:
+            logger.warning(f"重建 {self.label} 入库索引失败: {e}")
+
+    async def _iter_item_pages(self, url: str, page_size: int) -> AsyncIterator[dict]:
+        """按 StartIndex/Limit 分页流式拉取并逐个产出条目，同一时间只解析一页"""
+        start = 0
+        while True:
+            count = 0
+            async for item in self._iter_items(f"{url}&StartIndex={start}&Limit={page_size}"):
+                count += 1
+                yield item
+            if count < page_size:
+                return
+            start += count
+
+    @staticmethod
+    def _utc_string(dt: datetime) -> str:
+        """转为 Emby 查询参数使用的 UTC 时间字符串，如 2024-01-15T16:00:00Z"""
+        return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    @classmethod
+    def _local_midnight_utc(cls, day: date) -> str:
+        """本地日期 day 的 0 点对应的 UTC 时间字符串"""
+        return cls._utc_string(datetime.combine(day, datetime.min.time()).astimezone())
+
     async def get_today_additions_stats(self) -> dict:
         """获取今日入库统计及详情 (从今日0点开始)，同一剧集的集数会合并显示"""
         if not self.is_configured():
             return {}
 
         try:
-            now = datetime.now()
-            start_of_day = now.strftime("%Y-%m-%dT00:00:00Z")
+            started_at = datetime.now(timezone.utc)
+            start_of_day = self._local_midnight_utc(date.today())
+            result, recorded = await self._collect_additions(start_of_day)
+            # 上次刷新之后的新增已全部计入汇总时，水位线可以前移到本次查询开始的时间
+            if self.rollup is not None and recorded:
+                watermark = await asyncio.to_thread(self.rollup.watermark)
+                if watermark is not None and watermark >= start_of_day:
+                    await asyncio.to_thread(self.rollup.set_watermark, self._utc_string(started_at))
+            return result
+
+        except Exception as e:
+            logger.error(f"获取今日入库统计失败: {e}")
+            return {}
 
-            # 查询电影、剧集、单集
-            params = f"?Recursive=true&IncludeItemTypes=Movie,Series,Episode&MinDateCreated={start_of_day}&SortBy=DateCreated&SortOrder=Descending"
+    async def _refresh_rollup(self, window_start: date):
+        """把上次刷新（水位线）之后的新增计入入库汇总，水位线早于窗口起点时从窗口起点开始
 
-            if self.user_id:
-                url = f"{self.base_url}/Users/{self.user_id}/Items{params}"
+        没有本地镜像和 webhook 时，汇总只在生成报告时补齐；从水位线续查，
+        两次报告之间（如日报推送之后）入库的条目和没有生成报告的日子都不会遗漏
+        """
+        started_at = datetime.now(timezone.utc)
+        since = self._local_midnight_utc(window_start)
+        watermark = await asyncio.to_thread(self.rollup.watermark)
+        if watermark is not None and watermark > since:
+            since = watermark
+        try:
+            _, recorded = await self._collect_additions(since)
+            if recorded:
+                await asyncio.to_thread(self.rollup.set_watermark, self._utc_string(started_at))
+        except Exception as e:
+            logger.error(f"刷新入库汇总失败: {e}")
+
+    async def _collect_additions(self, since: str) -> tuple[dict, bool]:
+        """汇总 since（UTC 时间字符串）之后的入库条目，并计入入库汇总；查询出错时抛出异常
+
+        Returns:
+            ({"stats", "items"}, 是否全部成功计入入库汇总)
+        """
+        # 查询电影、剧集、单集，只取汇总用到的字段；按入库时间正序分页，
+        # 统计期间新入库的条目排在末尾，不会让后面的页错位
+        params = (f"?Recursive=true&IncludeItemTypes=Movie,Series,Episode&MinDateCreated={since}"
+                  f"&SortBy=DateCreated&SortOrder=Ascending&Fields={ADDITIONS_FIELDS}"
+                  f"&EnableImages=false&EnableUserData=false&EnableTotalRecordCount=false")
+
+        if self.user_id:
+            url = f"{self.base_url}/Users/{self.user_id}/Items{params}"
+        else:
+            url = f"{self.base_url}/Items{params}"
+
+        result = {
+            "stats": {"Movie": 0, "Series": 0, "Episode": 0, "Total": 0},
+            "items": []
+        }
+
+        # 分类处理：电影、剧集、单集
+        movies = []
+        series_map = {}  # 同一剧集同一季的集数合并为区间，内存与集数无关
+        new_series = []  # 新入库的剧集本身
+
+        # 本地镜像可用时直接查库，否则分页拉取，边接收边汇总，不保留完整的条目对象
+        page_size = max(50, int(self.config.get('emby_page_size', 200)))
+        if self._use_mirror():
+            source = self.mirror.iter_added_since(since, page_size)
+        else:
+            source = self._iter_item_pages(url, page_size)
+        batch = []  # 按页计入入库汇总
+        recorded = True
+
+        async def record(batch: list[dict]):
+            nonlocal recorded
+            try:
+                await asyncio.to_thread(self.rollup.record, batch)
+            except Exception as e:
+                logger.warning(f"写入入库汇总失败: {e}")
+                recorded = False
+
+        async for item in source:
+            if self.rollup is not None:
+                batch.append({k: item.get(k) for k in ROLLUP_KEYS if k in item})
+                if len(batch) >= page_size:
+                    await record(batch)
+                    batch = []
+            itype = item.get('Type')
+            result["stats"]["Total"] += 1
+            if itype in result["stats"]:
+                result["stats"][itype] += 1
+
+            name = item.get('Name', '未知')
+            year = item.get('ProductionYear', '')
+
+            if itype == "Movie":
+                movies.append(f"[电影] {name} ({year})" if year else f"[电影] {name}")
+
+            elif itype == "Series":
+                new_series.append(f"[剧集] {name} ({year})" if year else f"[剧集] {name}")
+
+            elif itype == "Episode":
+                series_name = item.get('SeriesName', '未知剧集')
+                series_id = item.get('SeriesId', series_name)
+                season_num = item.get('ParentIndexNumber', 0)
+                ep_num = item.get('IndexNumber', 0)
+
+                # 按 series_id + season 分组，重新插入使顺序跟随最近入库的一集
+                key = f"{series_id}_S{season_num}"
+                info = series_map.pop(key, None) or {
+                    'name': series_name,
+                    'season': season_num,
+                    'ranges': []
+                }
+                series_map[key] = info
+                if ep_num:
+                    add_episode(info['ranges'], ep_num)
+
+        # 构建合并后的剧集列表
+        merged_series = []
+        for info in series_map.values():
+            if info['ranges']:
+                # 连续集数已合并，如 1,2,3,5,6 -> "E1-E3, E5-E6"
+                ep_ranges = format_episode_ranges(info['ranges'])
+                season_str = f"S{info['season']}" if info['season'] else ""
+                merged_series.append(f"[剧集] {info['name']} {season_str} {ep_ranges}")
             else:
-                url = f"{self.base_url}/Items{params}"
+                merged_series.append(f"[剧集] {info['name']}")
 
-            data = await self._request(url)
+        if batch:
+            await record(batch)
 
-            result = {
-                "stats": {"Movie": 0, "Series": 0, "Episode": 0, "Total": 0},
-                "items": []
-            }
+        # 组合最终列表：电影 -> 新剧集 -> 合并后的单集，各自按入库时间倒序
+        result["items"] = movies[::-1] + new_series[::-1] + merged_series[::-1]
 
-            if data and 'Items' in data:
-                items = data['Items']
-                result["stats"]["Total"] = len(items)
-
-                # 统计数量
-                for item in items:
-                    itype = item.get('Type')
-                    if itype in result["stats"]:
-                        result["stats"][itype] += 1
-
-                # 分类处理：电影、剧集、单集
-                movies = []
-                series_map = {}  # 用于合并同一剧集的不同集数
-                new_series = []  # 新入库的剧集本身
-
-                for item in items:
-                    itype = item.get('Type')
-                    name = item.get('Name', '未知')
-                    year = item.get('ProductionYear', '')
-
-                    if itype == "Movie":
-                        movies.append(f"[电影] {name} ({year})" if year else f"[电影] {name}")
-
-                    elif itype == "Series":
-                        new_series.append(f"[剧集] {name} ({year})" if year else f"[剧集] {name}")
-
-                    elif itype == "Episode":
-                        series_name = item.get('SeriesName', '未知剧集')
-                        series_id = item.get('SeriesId', series_name)
-                        season_num = item.get('ParentIndexNumber', 0)
-                        ep_num = item.get('IndexNumber', 0)
-
-                        # 按 series_id + season 分组
-                        key = f"{series_id}_S{season_num}"
-                        if key not in series_map:
-                            series_map[key] = {
-                                'name': series_name,
-                                'season': season_num,
-                                'episodes': []
-                            }
-                        if ep_num:
-                            series_map[key]['episodes'].append(ep_num)
-
-                # 构建合并后的剧集列表
-                merged_series = []
-                for key, info in series_map.items():
-                    eps = sorted(info['episodes'])
-                    if eps:
-                        # 合并连续集数，如 [1,2,3,5,6] -> "E1-E3, E5-E6"
-                        ep_ranges = self._merge_episode_ranges(eps)
-                        season_str = f"S{info['season']}" if info['season'] else ""
-                        merged_series.append(f"[剧集] {info['name']} {season_str} {ep_ranges}")
-                    else:
-                        merged_series.append(f"[剧集] {info['name']}")
+        return result, recorded
 
-                # 组合最终列表：电影 -> 新剧集 -> 合并后的单集
-                result["items"] = movies + new_series + merged_series
+    async def get_additions_report(self, days: int, refresh: bool = True) -> dict:
+        """最近 days 天（含今天）的入库汇总，由预聚合的日桶合并而成
 
-            return result
+        refresh 为真时只查询上次刷新之后的新增来补齐汇总，已保存的日桶直接使用；
+        由 webhook 实时写入汇总时传 refresh=False，不发起任何查询。
 
+        Returns:
+            {"stats", "items", "trend", "start", "end"}，未启用入库汇总时返回 {}
+        """
+        if self.rollup is None:
+            return {}
+        end = date.today()
+        start = end - timedelta(days=max(1, days) - 1)
+        if refresh and self.is_configured():
+            await self._refresh_rollup(start)
+        try:
+            report = await asyncio.to_thread(self.rollup.summary, start.isoformat(), end.isoformat())
         except Exception as e:
-            logger.error(f"获取今日入库统计失败: {e}")
+            logger.error(f"读取入库汇总失败: {e}")
             return {}
+        report.update(start=start.isoformat(), end=end.isoformat())
+        return report
 
     def _merge_episode_ranges(self, episodes: list) -> str:
         """将集数列表合并为范围字符串，如 [1,2,3,5,6] -> 'E1-E3, E5-E6'"""
-        if not episodes:
-            return ""
-
-        episodes = sorted(set(episodes))
         ranges = []
-        start = end = episodes[0]
-
-        for ep in episodes[1:]:
-            if ep == end + 1:
-                end = ep
-            else:
-                if start == end:
-                    ranges.append(f"E{start}")
-                else:
-                    ranges.append(f"E{start}-E{end}")
-                start = end = ep
-
-        # 添加最后一个范围
-        if start == end:
-            ranges.append(f"E{start}")
-        else:
-            ranges.append(f"E{start}-E{end}")
-
-        return ", ".join(ranges)
+        for ep in episodes:
+            add_episode(ranges, ep)
+        return format_episode_ranges(ranges)
 
     def _format_date(self, date_str: str) -> str:
         """格式化日期字符串"""
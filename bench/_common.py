@@ -0,0 +1,48 @@
+"""基准脚本共用：把插件目录作为包加载，没有安装 AstrBot 时只提供各模块导入的名字"""
+import importlib
+import logging
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "mp_emby_plugin"
+
+
+def load(module: str):
+    """导入插件的子模块，如 load("api")"""
+    try:
+        importlib.import_module("astrbot.api")
+    except ImportError:
+        astrbot = types.ModuleType("astrbot")
+        astrbot_api = types.ModuleType("astrbot.api")
+        astrbot_api.logger = logging.getLogger("astrbot")
+        astrbot_event = types.ModuleType("astrbot.api.event")
+        astrbot_event.filter = astrbot_event.AstrMessageEvent = astrbot_event.MessageEventResult = None
+        astrbot_star = types.ModuleType("astrbot.api.star")
+        astrbot_star.Context = astrbot_star.Star = astrbot_star.register = None
+        astrbot.api = astrbot_api
+        astrbot_api.event, astrbot_api.star = astrbot_event, astrbot_star
+        sys.modules.update({"astrbot": astrbot, "astrbot.api": astrbot_api,
+                            "astrbot.api.event": astrbot_event, "astrbot.api.star": astrbot_star})
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [ROOT]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+
+def report(label: str, seconds: list[float], unit: str = "ms"):
+    """打印耗时的均值和中位数"""
+    scale = 1000 if unit == "ms" else 1
+    ordered = sorted(seconds)
+    mean = sum(seconds) / len(seconds) * scale
+    median = ordered[len(ordered) // 2] * scale
+    print(f"{label:<28} mean {mean:8.3f} {unit}   median {median:8.3f} {unit}   n={len(seconds)}")
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
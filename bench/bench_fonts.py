@@ -0,0 +1,52 @@
+"""user-024：共享字体注册表与每张卡片重新查找、加载字体的单张日报卡片渲染耗时
+
+改动前每次渲染都要遍历候选路径并重新解析字体文件，这里在每次渲染前重置注册表来模拟。
+未找到系统中文字体时可用 --font 指定一个 CJK 字体文件（如 msyh.ttc、NotoSansCJK）：
+    python bench/bench_fonts.py [--font /path/to/font.ttc] [--renders 50]
+"""
+import argparse
+import time
+
+from _common import load, report
+
+fonts = load("fonts")
+render = load("render")
+
+STATS = {"Movie": 4, "Series": 3, "Episode": 25, "Total": 32}
+ITEMS = ([f"[电影] 测试电影 {i} (2024)" for i in range(4)] + [f"[剧集] 测试剧集 {i} (2024)" for i in range(3)]
+         + [f"[剧集] 连续剧 {i} S1 E1-E{i + 3}" for i in range(5)])
+
+
+def render_card() -> float:
+    start = time.perf_counter()
+    render.compose_daily_report_card(STATS, ITEMS, "2024-01-15")
+    return time.perf_counter() - start
+
+
+def main(font: str, renders: int):
+    if not render.HAS_PILLOW:
+        raise SystemExit("需要安装 Pillow")
+    fonts.configure_fonts(font)
+    render_card()  # 预热 Pillow 自身的初始化
+
+    before = []
+    for _ in range(renders):
+        fonts._registry = None  # 模拟改动前：每张卡片重新查找并加载字体
+        start = time.perf_counter()
+        fonts.configure_fonts(font)
+        before.append(render_card() + time.perf_counter() - start)
+
+    fonts.configure_fonts(font)
+    after = [render_card() for _ in range(renders)]
+
+    print(f"font: {fonts.get_fonts().discover()['regular'] or 'Pillow 默认字体'}")
+    report("每张卡片重新加载字体", before)
+    report("共享字体注册表", after)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--font", default="")
+    parser.add_argument("--renders", type=int, default=50)
+    args = parser.parse_args()
+    main(args.font, args.renders)
@@ -0,0 +1,65 @@
+"""user-002：共享长连接 httpx 客户端与每次请求新建客户端的单次请求延迟
+
+在本机启动 aiohttp 桩服务器，分别用两种方式顺序发送相同的 GET 请求：
+    python bench/bench_http_client.py [--requests 500]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from aiohttp import web
+
+from _common import load, report
+
+api = load("api")
+
+PAYLOAD = [{"id": i, "name": f"订阅 {i}", "state": "R"} for i in range(20)]
+
+
+async def start_stub() -> tuple[web.AppRunner, str]:
+    async def handle(request: web.Request) -> web.Response:
+        return web.json_response(PAYLOAD)
+
+    app = web.Application()
+    app.router.add_get("/api/v1/subscribe/", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api/v1/subscribe/"
+
+
+async def main(count: int):
+    runner, url = await start_stub()
+    try:
+        # 改动前：每次请求新建客户端，连接池随之丢弃
+        fresh = []
+        for _ in range(count):
+            start = time.perf_counter()
+            async with httpx.AsyncClient(timeout=30) as client:
+                (await client.get(url)).json()
+            fresh.append(time.perf_counter() - start)
+
+        # 改动后：插件持有的共享客户端，连接保持复用
+        client = api.build_http_client({}, 30)
+        shared = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                (await client.get(url)).json()
+                shared.append(time.perf_counter() - start)
+        finally:
+            await client.aclose()
+    finally:
+        await runner.cleanup()
+
+    report("每次新建客户端", fresh)
+    report("共享客户端", shared)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    asyncio.run(main(parser.parse_args().requests))
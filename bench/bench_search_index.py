@@ -0,0 +1,59 @@
+"""user-018：内存搜索索引在合成片库上的重建耗时和单次查询耗时
+
+默认 5 万部，约 2/3 为随机中文片名，其余为随机英文单词组合；另加一部 复仇者联盟 / The Avengers
+作为拼音、错别字和原名查询的目标。安装 pypinyin 时拼音查询才会命中：
+    python bench/bench_search_index.py [--titles 50000] [--repeat 2000]
+"""
+import argparse
+import random
+import string
+import time
+
+from _common import load, report
+
+search_index = load("search_index")
+
+CHARS = ("的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定"
+         "行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些"
+         "然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公")
+QUERIES = ["复仇者联盟", "fczl", "fuchouzhe", "复仇着联盟", "avengers", "the dark knight", "star", "复", "a", "lianmeng"]
+
+
+def build_items(count: int) -> list[dict]:
+    rng = random.Random(1)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(3000)]
+    words += ["the", "dark", "knight", "love", "war", "star", "man", "night", "city", "lost"]
+    items = []
+    for i in range(count):
+        if i % 3:
+            name = "".join(rng.choice(CHARS) for _ in range(rng.randint(2, 8)))
+        else:
+            name = " ".join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+        items.append({"Id": str(i), "Type": rng.choice(["Movie", "Series"]), "Name": name, "OriginalTitle": ""})
+    items.append({"Id": "target", "Type": "Movie", "Name": "复仇者联盟", "OriginalTitle": "The Avengers"})
+    return items
+
+
+def main(count: int, repeat: int):
+    items = build_items(count)
+    index = search_index.SearchIndex()
+    start = time.perf_counter()
+    index.rebuild(items)
+    print(f"rebuild {len(index)} titles: {time.perf_counter() - start:.2f} s "
+          f"(pypinyin {'on' if search_index.HAS_PYPINYIN else 'off'})")
+    for query in QUERIES:
+        top = [item["Name"] for item in index.search(query, 10)[:3]]
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            index.search(query, 10)
+            samples.append(time.perf_counter() - start)
+        report(f"{query} -> {top[:1]}", samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.titles, args.repeat)
@@ -0,0 +1,75 @@
+"""user-007：流式解析与整体 json.loads 的峰值内存
+
+构造 Emby Items 格式的合成响应（默认 5 万条），按 64 KB 分块模拟网络接收，
+用 tracemalloc 记录汇总过程中的峰值内存；响应文本在计量开始前生成，不计入峰值：
+    python bench/bench_stream_json.py [--items 50000]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from _common import load
+
+jsonstream = load("jsonstream")
+
+CHUNK = 64 * 1024
+
+
+def build_payload(count: int) -> str:
+    items = [{
+        "Id": f"{i:032x}", "Type": ("Movie", "Series", "Episode")[i % 3], "Name": f"条目 {i}",
+        "SeriesName": f"剧集 {i // 20}", "SeriesId": f"{i // 20:032x}", "ParentIndexNumber": 1, "IndexNumber": i % 20 + 1,
+        "DateCreated": "2024-01-15T10:30:00.0000000Z", "ProductionYear": 2024,
+        "ProviderIds": {"Tmdb": str(i), "Imdb": f"tt{i:07d}"}, "Overview": "简介" * 40,
+    } for i in range(count)]
+    return json.dumps({"Items": items, "TotalRecordCount": count}, ensure_ascii=False)
+
+
+async def chunks(text: str):
+    for start in range(0, len(text), CHUNK):
+        yield text[start:start + CHUNK]
+
+
+def tally(counts: dict, item: dict):
+    counts[item["Type"]] = counts.get(item["Type"], 0) + 1
+
+
+async def streamed(text: str) -> dict:
+    counts = {}
+    async for item in jsonstream.iter_json_array(chunks(text), "Items"):
+        tally(counts, item)
+    return counts
+
+
+async def loaded(text: str) -> dict:
+    # 改动前：先读完整个响应再 json.loads
+    body = "".join([chunk async for chunk in chunks(text)])
+    counts = {}
+    for item in json.loads(body)["Items"]:
+        tally(counts, item)
+    return counts
+
+
+def measure(label: str, coro_fn, text: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    counts = asyncio.run(coro_fn(text))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} peak {peak / 1024 / 1024:8.2f} MB   {elapsed:6.2f} s   {counts}")
+
+
+def main(count: int):
+    text = build_payload(count)
+    print(f"payload: {count} items, {len(text.encode()) / 1024 / 1024:.1f} MB")
+    measure("json.loads", loaded, text)
+    measure("streaming", streamed, text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50000)
+    main(parser.parse_args().items)
@@ -0,0 +1,72 @@
+import csv
+import re
+import unicodedata
+
+_YEAR_SUFFIX = re.compile(r"^(.*?)[\s(（\[]+((?:19|20)\d{2})[)）\]]?$")
+_YEAR = re.compile(r"(19|20)\d{2}")
+_HEADER_WORDS = {"title", "name", "片名", "名称", "标题"}
+
+
+def normalize_title(title: str) -> str:
+    """规范化片名用于精确匹配：全角转半角、忽略大小写、去掉空白和常见标点"""
+    text = unicodedata.normalize("NFKC", title or "").lower()
+    return re.sub(r"[\s:：·•\-—_,，.。!！?？'\"“”‘’]+", "", text)
+
+
+def parse_title_list(text: str) -> list[tuple[str, str]]:
+    """解析批量订阅列表，每行一部，返回 [(片名, 年份)]，年份可能为空
+
+    支持以下格式：
+        片名
+        片名 2019 / 片名 (2019) / 片名（2019）
+        片名,2019 （CSV，第一列片名、第二列年份；片名中含逗号时需加引号）
+
+    第二列既不为空也不是年份的行按普通片名处理（如 Love, Death & Robots）。
+    """
+    entries = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip().lstrip("﻿")
+        if not line or line.startswith("#"):
+            continue
+
+        row = None
+        if "," in line or "\t" in line:
+            row = next(csv.reader([line], delimiter="\t" if "\t" in line else ","))
+            second = row[1].strip() if len(row) > 1 else ""
+            header = bool(row) and row[0].strip().lower() in _HEADER_WORDS
+            if not (header or not second or _YEAR.fullmatch(second)):
+                row = None
+        if row is not None:
+            title = row[0].strip() if row else ""
+            year = row[1].strip() if len(row) > 1 else ""
+            if not _YEAR.fullmatch(year):
+                year = ""
+        else:
+            match = _YEAR_SUFFIX.match(line)
+            title, year = (match.group(1).strip(), match.group(2)) if match and match.group(1).strip() else (line, "")
+
+        if not title or title.lower() in _HEADER_WORDS:
+            continue
+        key = (normalize_title(title), year)
+        if key not in seen:
+            seen.add(key)
+            entries.append((title, year))
+    return entries
+
+
+def pick_exact_match(results: list, title: str, year: str = "") -> tuple[dict | None, list]:
+    """从搜索结果中选出片名（及年份）完全匹配的唯一条目
+
+    Returns:
+        (唯一匹配, 候选列表)；没有唯一匹配时第一项为 None
+    """
+    target = normalize_title(title)
+    matches = [
+        r for r in results
+        if target in (normalize_title(r.get('title', '')), normalize_title(r.get('original_title', '')))
+        and (not year or str(r.get('year', '')) == year)
+    ]
+    if len(matches) == 1:
+        return matches[0], matches
+    return None, matches or results
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from .deadline import DeadlineExceeded, detached, time_left
+
+
+class TTLCache:
+    """带过期时间和容量上限的 LRU 缓存
+
+    - 每个条目可以单独指定 TTL（用于对空结果做短时缓存）
+    - 超过容量时淘汰最久未使用的条目
+    - 记录命中/未命中次数，便于观察缓存效果
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, self._MISSING)
+        if entry is self._MISSING:
+            self.misses += 1
+            return default
+        expire_at, value = entry
+        if expire_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目但不计入命中统计、不调整淘汰顺序"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, self._MISSING)
+        return default if entry is self._MISSING else entry[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """返回缓存统计：条目数、命中、未命中、命中率"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """合并相同 key 的并发请求
+
+    同一时刻相同 key 的调用共享同一个进行中的请求及其结果；
+    可选的短时 TTL 让紧随其后的调用也直接复用刚拿到的结果。
+    """
+
+    _MISSING = object()
+
+    def __init__(self, ttl: float = 0, maxsize: int = 128):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._recent = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        if self._recent is not None:
+            value = self._recent.peek(key, self._MISSING)
+            if value is not self._MISSING:
+                self.shared += 1
+                return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 共享的请求不受发起者的命令预算约束（使用后端自身的超时），
+            # 否则预算最紧的第一个调用者会让后来者一起超时
+            task = asyncio.ensure_future(detached(fn()))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.shared += 1
+        # shield：某个调用者被取消或超出自己的预算时不影响其他仍在等待的调用者
+        remaining = time_left()
+        if remaining is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=remaining)
+        except asyncio.TimeoutError as e:
+            if task.done():  # 请求本身抛出的超时
+                raise
+            raise DeadlineExceeded() from e
+
+    def _on_done(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        # 读取异常，避免所有调用者都已取消时出现 "exception was never retrieved"
+        if task.exception() is None and self._recent is not None and task.result() is not None:
+            self._recent.set(key, task.result())
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "inflight": len(self._inflight)}
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+_current: ContextVar["Deadline | None"] = ContextVar("mp_command_deadline", default=None)
+_clamped: ContextVar[bool] = ContextVar("mp_timeout_clamped", default=False)
+
+
+class DeadlineExceeded(Exception):
+    """命令的总时间预算已用完"""
+
+
+class Deadline:
+    """一条命令的总时间预算
+
+    经 run() 执行的协程及其中发起的请求都能通过 time_left()/budget()/clamp_timeout() 取得剩余预算；
+    预算用完时整个任务被取消，进行中的请求随之中断。seconds <= 0 表示不限制。
+    嵌套使用时不会超过外层的截止时间。
+    """
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds if seconds and seconds > 0 else None
+        parent = _current.get()
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = parent.expires_at if self.expires_at is None else min(self.expires_at, parent.expires_at)
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    async def run(self, coro: Awaitable[T]) -> T:
+        """在新任务中执行 coro，超出预算时取消它并抛出 DeadlineExceeded
+
+        预算只设置在新任务的上下文副本中，不会泄漏到调用方
+        （Python 3.12 起 wait_for 直接在调用方任务中执行协程，因此必须显式创建任务）
+        """
+        async def runner():
+            _current.set(self)
+            return await coro
+
+        remaining = self.remaining()
+        if remaining is None:
+            return await coro
+        task = asyncio.create_task(runner())
+        try:
+            return await asyncio.wait_for(task, timeout=remaining)
+        except asyncio.TimeoutError as e:
+            if self.expired:
+                raise DeadlineExceeded() from e
+            raise
+
+
+def current() -> Deadline | None:
+    return _current.get()
+
+
+def time_left() -> float | None:
+    """当前命令的剩余预算（秒），不在命令上下文中时返回 None"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def clamp_timeout(timeout: float) -> float:
+    """把单次请求的超时收紧到当前命令的剩余预算以内，预算已用完时抛出 DeadlineExceeded"""
+    remaining = time_left()
+    _clamped.set(remaining is not None and remaining < timeout)
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, remaining)
+
+
+def timeout_clamped() -> bool:
+    """当前任务最近一次 clamp_timeout 是否把超时收紧到了命令剩余预算
+
+    为真时请求超时是命令预算用完所致，不能说明后端响应慢
+    """
+    return _clamped.get()
+
+
+def budget(timeout: float, reserve: float = 0) -> float:
+    """在 timeout 和当前命令剩余预算（扣除 reserve 秒留给降级回复）中取较小者"""
+    remaining = time_left()
+    if remaining is None:
+        return timeout
+    return max(0.0, min(timeout, remaining - reserve))
+
+
+def detached(coro: Awaitable[T]) -> Awaitable[T]:
+    """让 coro 不受当前命令预算约束，用于需要在命令结束后继续运行的后台任务"""
+    async def runner():
+        # 直接 await 时与调用方共用上下文，结束后恢复调用方的预算
+        token = _current.set(None)
+        try:
+            return await coro
+        finally:
+            _current.reset(token)
+
+    return runner()
@@ -0,0 +1,139 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from astrbot.api import logger
+
+
+def format_download_task(task: dict) -> str:
+    """格式化单个下载任务：title season episode：progress%"""
+    media = task.get('media', {}) or {}
+    title = media.get('title', task.get('title', '未知'))
+    season = media.get('season', '')
+    episode = media.get('episode', '')
+    progress = round(task.get('progress', 0) or 0, 2)  # 保留两位小数
+    return f"{title} {season} {episode}：{progress}%"
+
+
+def _task_key(task: dict) -> str:
+    media = task.get('media', {}) or {}
+    return str(task.get('hash') or task.get('id') or
+               f"{media.get('title', task.get('title', ''))}|{media.get('season', '')}|{media.get('episode', '')}")
+
+
+class DownloadWatcher:
+    """下载进度监控
+
+    无论多少个会话在监控，每个后端只有一个轮询任务：
+    - 进度无变化时逐步放慢轮询，有任务接近完成时加快
+    - 只在进度跨过步长或任务完成时推送给订阅的会话
+    - 下载队列清空或没有会话订阅时自动停止
+    """
+
+    NEAR_DONE = 90  # 进度达到此百分比视为接近完成
+
+    def __init__(self, api, send: Callable[[str, str], Awaitable], config: dict):
+        self.api = api
+        self.send = send
+        self.min_interval = max(3, int(config.get('download_watch_min_interval', 10)))
+        self.max_interval = max(self.min_interval, int(config.get('download_watch_max_interval', 120)))
+        self.step = max(1, float(config.get('download_watch_step', 10)))
+        self.sessions: set[str] = set()
+        self.interval = self.min_interval
+        self._reported: dict[str, float] = {}  # 任务 -> 上次推送时的进度
+        self._titles: dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def subscribe(self, session: str):
+        self.sessions.add(session)
+        if not self.running:
+            self.interval = self.min_interval
+            self._reported.clear()
+            self._titles.clear()
+            self._task = asyncio.create_task(self._run())
+
+    def unsubscribe(self, session: str) -> bool:
+        if session not in self.sessions:
+            return False
+        self.sessions.discard(session)
+        if not self.sessions and self._task is not None:
+            # 取消后立即丢弃旧任务，之后的 subscribe 会启动新的轮询任务
+            self._task.cancel()
+            self._task = None
+        return True
+
+    async def stop(self):
+        self.sessions.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _broadcast(self, msg: str):
+        for session in list(self.sessions):
+            try:
+                await self.send(session, msg)
+            except Exception as e:
+                logger.warning(f"推送下载进度到 {session} 失败: {e}")
+
+    async def _run(self):
+        try:
+            while self.sessions:
+                tasks = await self.api.get_download_progress()
+                if tasks is None:
+                    # 获取失败时按最慢间隔重试，不打扰会话
+                    self.interval = self.max_interval
+                elif not tasks and not self._reported:
+                    await self._broadcast("当前没有正在下载的任务，已停止监控。")
+                    self.sessions.clear()
+                    break
+                else:
+                    changed, near_done = await self._report(tasks)
+                    if not tasks:
+                        await self._broadcast("✅ 下载队列已清空，已停止监控。")
+                        self.sessions.clear()
+                        break
+                    if near_done:
+                        self.interval = self.min_interval
+                    elif changed:
+                        self.interval = max(self.min_interval, self.interval // 2)
+                    else:
+                        self.interval = min(self.interval * 2, self.max_interval)
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            # 被 unsubscribe/stop 取消时不动 sessions，取消期间可能已有新会话订阅
+            raise
+        except Exception as e:
+            logger.error(f"下载进度监控异常: {e}")
+            self.sessions.clear()
+
+    async def _report(self, tasks: list) -> tuple[bool, bool]:
+        """比较进度并推送有意义的变化，返回 (是否有变化, 是否有任务接近完成)"""
+        lines = []
+        current = {}
+        near_done = False
+        for task in tasks:
+            key = _task_key(task)
+            progress = float(task.get('progress', 0) or 0)
+            current[key] = progress
+            self._titles[key] = format_download_task(task).rsplit("：", 1)[0]
+            near_done = near_done or progress >= self.NEAR_DONE
+            last = self._reported.get(key)
+            if last is None or progress - last >= self.step:
+                lines.append(format_download_task(task))
+                self._reported[key] = progress
+
+        finished = [key for key in self._reported if key not in current]
+        for key in finished:
+            lines.append(f"✅ {self._titles.pop(key, '未知')} 下载完成")
+            del self._reported[key]
+
+        if lines:
+            await self._broadcast("📥 下载进度\n" + "\n".join(lines))
+        return bool(lines), near_done
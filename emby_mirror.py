@@ -0,0 +1,292 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from astrbot.api import logger
+
+from .search_index import SearchIndex
+
+MIRROR_TYPES = "Movie,Series,Episode"
+MIRROR_FIELDS = ("OriginalTitle,ProductionYear,DateCreated,ProviderIds,Overview,CommunityRating,"
+                 "SeriesId,SeriesName,ParentIndexNumber,IndexNumber")
+# 增量同步的起点往前多取一段，避免 Emby 与本机时钟偏差导致漏掉条目
+SYNC_OVERLAP = timedelta(minutes=5)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT,
+    original_title TEXT,
+    year INTEGER,
+    overview TEXT,
+    community_rating REAL,
+    date_created TEXT,
+    series_id TEXT,
+    series_name TEXT,
+    season INTEGER,
+    episode INTEGER,
+    tmdb_id TEXT,
+    imdb_id TEXT,
+    generation INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_items_type_created ON items (type, date_created);
+CREATE INDEX IF NOT EXISTS idx_items_tmdb ON items (tmdb_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_COLUMNS = ("id", "type", "name", "original_title", "year", "overview", "community_rating", "date_created",
+            "series_id", "series_name", "season", "episode", "tmdb_id", "imdb_id")
+# 查询结果还原为 Emby 条目的字段名，EmbyApi 可以像处理在线查询结果一样处理
+_ITEM_KEYS = ("Id", "Type", "Name", "OriginalTitle", "ProductionYear", "Overview", "CommunityRating", "DateCreated",
+              "SeriesId", "SeriesName", "ParentIndexNumber", "IndexNumber")
+
+
+def _row_from_item(item: dict, generation: int) -> tuple:
+    providers = {k.lower(): v for k, v in (item.get('ProviderIds') or {}).items()}
+    return (
+        item.get('Id'), item.get('Type'), item.get('Name'), item.get('OriginalTitle'), item.get('ProductionYear'),
+        item.get('Overview'), item.get('CommunityRating'), item.get('DateCreated'),
+        item.get('SeriesId'), item.get('SeriesName'), item.get('ParentIndexNumber'), item.get('IndexNumber'),
+        providers.get('tmdb'), providers.get('imdb'), generation,
+    )
+
+
+def _item_from_row(row: tuple) -> dict:
+    item = {key: value for key, value in zip(_ITEM_KEYS, row) if value is not None}
+    providers = {key: value for key, value in zip(("Tmdb", "Imdb"), row[12:14]) if value}
+    if providers:
+        item['ProviderIds'] = providers
+    return item
+
+
+def _utc_iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class EmbyMirror:
+    """Emby 媒体库（电影、剧集、单集）的本地 SQLite 镜像
+
+    - 首次分页全量同步，之后按 MinDateLastSaved 增量同步新增和修改的条目
+    - 已删除的条目在定期全量同步时清理（全量同步未再见到的条目即视为删除）
+    - 数据库读写在线程中执行，不阻塞事件循环；超过 max_staleness 未同步成功时视为不可用，
+      由调用方回退到在线查询
+    - 传入 search_index 时随同步维护片名搜索索引：全量同步后在线程中重建，增量同步只更新变化的条目
+    - listeners 中的回调会收到每一页同步到的原始条目
+    """
+
+    def __init__(self, api, db_path: str, config: dict, search_index: SearchIndex | None = None):
+        self.api = api
+        self.search_index = search_index
+        self.listeners: list[Callable[[list[dict]], Awaitable]] = []
+        self.db_path = db_path
+        self.page_size = max(50, int(config.get('emby_mirror_page_size', 500)))
+        self.sync_interval = max(30, int(config.get('emby_mirror_sync_interval', 300)))
+        self.full_sync_interval = max(self.sync_interval, int(config.get('emby_mirror_full_sync_interval', 86400)))
+        self.max_staleness = max(self.sync_interval, int(config.get('emby_mirror_max_staleness', 900)))
+        self._db_lock = threading.Lock()
+        self._sync_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._db_lock:
+            self._conn.executescript(_SCHEMA)
+            meta = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        self.last_sync = float(meta['last_sync']) if 'last_sync' in meta else None
+        self.last_full_sync = float(meta['last_full_sync']) if 'last_full_sync' in meta else None
+        self.cursor = meta.get('cursor')
+        self.generation = int(meta.get('generation', 0))
+
+    # ---------- 数据库 ----------
+
+    def _db(self, fn: Callable[[sqlite3.Connection], object]):
+        with self._db_lock:
+            return fn(self._conn)
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], object]):
+        return await asyncio.to_thread(self._db, fn)
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+    # ---------- 同步 ----------
+
+    @property
+    def fresh(self) -> bool:
+        """最近一次同步是否在允许的陈旧时间内"""
+        return self.last_sync is not None and time.time() - self.last_sync <= self.max_staleness
+
+    def _items_url(self, start: int, min_saved: str | None) -> str:
+        params = (f"?Recursive=true&IncludeItemTypes={MIRROR_TYPES}&Fields={MIRROR_FIELDS}"
+                  f"&SortBy=DateCreated&SortOrder=Ascending&StartIndex={start}&Limit={self.page_size}"
+                  f"&EnableImages=false&EnableUserData=false")
+        if min_saved:
+            params += f"&MinDateLastSaved={min_saved}"
+        return f"{self.api.base_url}/Items{params}"
+
+    async def sync(self, full: bool = False) -> int:
+        """同步一次，返回写入的条目数；任意一页失败时放弃本次同步，下次从原起点重试"""
+        async with self._sync_lock:
+            now = time.time()
+            full = (full or self.cursor is None or self.last_full_sync is None
+                    or now - self.last_full_sync >= self.full_sync_interval)
+            started_at = datetime.now(timezone.utc)
+            generation = self.generation + 1 if full else self.generation
+            min_saved = None if full else self.cursor
+
+            written = 0
+            start = 0
+            changed_titles = []
+            while True:
+                data = await self.api._request(self._items_url(start, min_saved))
+                if not data or 'Items' not in data:
+                    raise RuntimeError("Emby 镜像同步请求失败")
+                rows = [_row_from_item(item, generation) for item in data['Items']
+                        if item.get('Id') and item.get('Type')]
+                if rows:
+                    await self._run(lambda conn, rows=rows: self._upsert(conn, rows))
+                for listener in self.listeners:
+                    await listener(data['Items'])
+                if not full and self.search_index is not None:
+                    changed_titles += [_item_from_row(row) for row in rows if row[1] in ("Movie", "Series")]
+                written += len(rows)
+                start += len(data['Items'])
+                if len(data['Items']) < self.page_size or start >= data.get('TotalRecordCount', 0):
+                    break
+
+            meta = {
+                'last_sync': str(now),
+                'cursor': _utc_iso(started_at - SYNC_OVERLAP),
+                'generation': str(generation),
+            }
+            if full:
+                meta['last_full_sync'] = str(now)
+            removed = await self._run(lambda conn: self._commit_sync(conn, meta, generation if full else None))
+
+            self.last_sync = now
+            self.cursor = meta['cursor']
+            self.generation = generation
+            if full:
+                self.last_full_sync = now
+            await self._refresh_index(full, changed_titles)
+            logger.info(f"Emby 镜像{'全量' if full else '增量'}同步完成: 写入 {written} 条，删除 {removed} 条")
+            return written
+
+    async def _refresh_index(self, full: bool, changed_titles: list[dict]):
+        if self.search_index is None:
+            return
+        if full or not self.search_index.ready:
+            titles = await self._select("type IN ('Movie', 'Series')", (), "date_created")
+            await asyncio.to_thread(self.search_index.rebuild, titles)
+        elif changed_titles:
+            self.search_index.update(changed_titles)
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, rows: list[tuple]):
+        placeholders = ",".join("?" * (len(_COLUMNS) + 1))
+        updates = ",".join(f"{c}=excluded.{c}" for c in _COLUMNS[1:] + ("generation",))
+        conn.executemany(
+            f"INSERT INTO items ({','.join(_COLUMNS)},generation) VALUES ({placeholders}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}",
+            rows,
+        )
+        conn.commit()
+
+    @staticmethod
+    def _commit_sync(conn: sqlite3.Connection, meta: dict, full_generation: int | None) -> int:
+        removed = 0
+        if full_generation is not None:
+            removed = conn.execute("DELETE FROM items WHERE generation < ?", (full_generation,)).rowcount
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta.items())
+        conn.commit()
+        return removed
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"已启动 Emby 本地镜像同步，间隔 {self.sync_interval} 秒")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Emby 镜像同步失败: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    # ---------- 查询 ----------
+
+    async def _select(self, where: str, params: tuple, order: str, limit: int | None = None,
+                      offset: int = 0) -> list[dict]:
+        sql = f"SELECT {','.join(_COLUMNS[:14])} FROM items WHERE {where} ORDER BY {order}"
+        if limit:
+            sql += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        rows = await self._run(lambda conn: conn.execute(sql, params).fetchall())
+        return [_item_from_row(row) for row in rows]
+
+    async def latest(self, types: list[str], limit: int) -> list[dict]:
+        """按入库时间倒序返回最新条目"""
+        marks = ",".join("?" * len(types))
+        return await self._select(f"type IN ({marks})", tuple(types), "date_created DESC", limit)
+
+    async def search(self, keyword: str, types: list[str], limit: int) -> list[dict]:
+        """按片名/原名子串匹配，名称以关键词开头的排在前面"""
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        marks = ",".join("?" * len(types))
+        return await self._select(
+            f"type IN ({marks}) AND (name LIKE ? ESCAPE '\\' OR original_title LIKE ? ESCAPE '\\')",
+            (*types, f"%{escaped}%", f"%{escaped}%", f"{escaped}%"),
+            "CASE WHEN name LIKE ? ESCAPE '\\' THEN 0 ELSE 1 END, date_created DESC",
+            limit,
+        ) if keyword else []
+
+    async def iter_added_since(self, since: str, page_size: int = 200) -> AsyncIterator[dict]:
+        """按入库时间正序分页产出 since（Emby 格式的 UTC 时间字符串）之后入库的电影、剧集和单集"""
+        offset = 0
+        while True:
+            page = await self._select("date_created >= ?", (since,), "date_created, id", page_size, offset)
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+    async def library_entries(self) -> tuple[list[tuple], list[tuple]]:
+        """入库索引所需的数据：[(条目ID, 类型, tmdbid)] 和各剧集已有单集的 [(剧集条目ID, 季号)]"""
+        def query(conn: sqlite3.Connection):
+            titles = conn.execute("SELECT id, type, tmdb_id FROM items "
+                                  "WHERE type IN ('Movie', 'Series') AND tmdb_id IS NOT NULL").fetchall()
+            seasons = conn.execute("SELECT DISTINCT series_id, season FROM items "
+                                   "WHERE type = 'Episode' AND season IS NOT NULL").fetchall()
+            return titles, seasons
+        return await self._run(query)
+
+    async def counts(self) -> dict[str, int]:
+        rows = await self._run(lambda conn: conn.execute("SELECT type, COUNT(*) FROM items GROUP BY type").fetchall())
+        return dict(rows)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "fresh": self.fresh,
+            "last_sync": self.last_sync,
+            "size": self._db(lambda conn: conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]),
+        }
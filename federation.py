@@ -0,0 +1,205 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from astrbot.api import logger
+
+from .api import EmbyApi, LibraryIndex
+from .deadline import budget
+
+T = TypeVar("T")
+
+# 按这些外部 ID 判断不同服务器上的条目是否为同一部作品
+DEDUP_PROVIDERS = ("tmdb", "imdb")
+
+
+def parse_servers(config: dict) -> list[tuple[str, dict]]:
+    """解析 emby_servers 配置，返回 [(服务器标签, 该服务器的配置)]
+
+    每行格式为 标签|地址|API密钥[|用户ID]；未配置时使用 emby_url 等单服务器配置，标签为空
+    """
+    servers = []
+    for line in config.get('emby_servers') or []:
+        parts = [part.strip() for part in str(line).split("|")]
+        if len(parts) < 3 or not all(parts[:3]):
+            logger.warning(f"忽略格式错误的 Emby 服务器配置: {line}")
+            continue
+        name, url, api_key = parts[:3]
+        servers.append((name, {**config, 'emby_url': url, 'emby_api_key': api_key,
+                               'emby_user_id': parts[3] if len(parts) > 3 else ''}))
+    return servers or [("", config)]
+
+
+def _dedup_keys(media: dict) -> list[tuple]:
+    return [(media.get('type'), provider, media['provider_ids'][provider])
+            for provider in DEDUP_PROVIDERS if media.get('provider_ids', {}).get(provider)]
+
+
+def merge_media(results: list[tuple[EmbyApi, list[dict]]], limit: int, key=None) -> list[dict]:
+    """合并各服务器的媒体列表，TMDB/IMDB ID 相同的条目只保留一条并在 servers 中记录所有来源
+
+    key 为空时按各服务器内的名次交错排列，否则按 key 倒序排列
+    """
+    merged: list[dict] = []
+    by_key: dict[tuple, dict] = {}
+    # 交错取各服务器的第 1 名、第 2 名……，多台服务器的搜索结果不会被某一台占满
+    depth = max((len(items) for _, items in results), default=0)
+    for rank in range(depth):
+        for server, items in results:
+            if rank >= len(items):
+                continue
+            media = items[rank]
+            keys = _dedup_keys(media)
+            existing = next((by_key[k] for k in keys if k in by_key), None)
+            if existing is not None:
+                if server.name not in existing['servers']:
+                    existing['servers'].append(server.name)
+                existing['provider_ids'] = {**media.get('provider_ids', {}), **existing['provider_ids']}
+            else:
+                existing = {**media, 'servers': [server.name]}
+                merged.append(existing)
+            for k in _dedup_keys(existing):
+                by_key[k] = existing
+    if key is not None:
+        merged.sort(key=key, reverse=True)
+    return merged[:limit]
+
+
+def merge_additions(results: list[tuple[EmbyApi, dict]], tagged: bool) -> dict:
+    """合并各服务器的入库汇总：数量相加，多服务器时明细末尾加服务器标签，完全相同的明细合并标签"""
+    stats = {"Movie": 0, "Series": 0, "Episode": 0, "Total": 0}
+    lines: dict[str, list[str]] = {}
+    trend: dict[str, dict[str, int]] = {}
+    for server, data in results:
+        for kind, count in data.get("stats", {}).items():
+            stats[kind] = stats.get(kind, 0) + count
+        for line in data.get("items", []):
+            lines.setdefault(line, []).append(server.name)
+        for day, counts in data.get("trend", []):
+            day_counts = trend.setdefault(day, {"Movie": 0, "Series": 0, "Episode": 0})
+            for kind, count in counts.items():
+                day_counts[kind] += count
+
+    # 各服务器的明细依次排列，再按电影在前稳定排序，与单服务器的顺序一致
+    ordered = sorted(lines.items(), key=lambda entry: not entry[0].startswith("[电影]"))
+    if tagged:
+        # 标签放在末尾，保留 [电影]/[剧集] 前缀供卡片分类
+        items = [f"{line} [{'/'.join(names)}]" for line, names in ordered]
+    else:
+        items = [line for line, _ in ordered]
+    merged = {"stats": stats, "items": items}
+    if trend:
+        merged["trend"] = sorted(trend.items())
+    for key in ("start", "end"):
+        if any(key in data for _, data in results):
+            merged[key] = next(data[key] for _, data in results if key in data)
+    return merged
+
+
+class EmbyFederation:
+    """多台 Emby/Jellyfin 服务器的统一入口
+
+    - 每台服务器一个 EmbyApi（独立的连接池、熔断器、本地镜像和入库汇总）
+    - 查询并发发往所有服务器，每台服务器单独限时 server_timeout 秒（且不超过命令剩余预算），
+      超时或不可用的服务器只缺失自己的部分，并在 failed 中注明
+    - 最新入库和搜索结果按 TMDB/IMDB ID 去重，每条结果带来源服务器标签
+    只配置了一台服务器时行为与单个 EmbyApi 相同，不显示标签
+    """
+
+    def __init__(self, config: dict, data_dir: str | None = None):
+        self.servers = [EmbyApi(server_config, data_dir=data_dir, name=name)
+                        for name, server_config in parse_servers(config)]
+        self.primary = self.servers[0]
+        self.server_timeout = float(config.get('emby_server_timeout', 15))
+
+    @property
+    def tagged(self) -> bool:
+        """多于一台服务器时结果带服务器标签"""
+        return len(self.servers) > 1
+
+    @property
+    def max_results(self) -> int:
+        return self.primary.max_results
+
+    def is_configured(self) -> bool:
+        return any(server.is_configured() for server in self.servers)
+
+    def configured(self) -> list[EmbyApi]:
+        return [server for server in self.servers if server.is_configured()]
+
+    def get_server(self, name: str) -> EmbyApi:
+        """按标签查找服务器，找不到时返回第一台"""
+        return next((server for server in self.servers if server.name == name), self.primary)
+
+    @property
+    def has_rollup(self) -> bool:
+        servers = self.configured()
+        return bool(servers) and all(server.rollup is not None for server in servers)
+
+    async def close(self):
+        for server in self.servers:
+            try:
+                await server.close()
+            except Exception as e:
+                logger.warning(f"关闭 {server.label} 失败: {e}")
+
+    async def _fanout(self, call: Callable[[EmbyApi], Awaitable[T]], empty: Callable[[T], bool] = lambda r: not r
+                      ) -> tuple[list[tuple[EmbyApi, T]], list[str]]:
+        """并发调用所有已配置的服务器
+
+        Returns:
+            ([(服务器, 结果)], [失败说明])；EmbyApi 出错时返回空结果，空结果且熔断中的服务器也算失败
+        """
+        servers = self.configured()
+
+        async def one(server: EmbyApi):
+            return await asyncio.wait_for(call(server), timeout=budget(self.server_timeout))
+
+        outcomes = await asyncio.gather(*(one(server) for server in servers), return_exceptions=True)
+        results, failed = [], []
+        for server, outcome in zip(servers, outcomes):
+            label = server.name or server.label
+            if isinstance(outcome, asyncio.TimeoutError):
+                failed.append(f"{label}（超时）")
+            elif isinstance(outcome, BaseException):
+                logger.warning(f"{server.label} 查询失败: {outcome}")
+                failed.append(f"{label}（出错）")
+            elif empty(outcome) and server.breaker.is_open:
+                failed.append(f"{label}（暂时不可用）")
+            else:
+                results.append((server, outcome))
+        return results, failed
+
+    async def ensure_library_index(self, max_wait: float = 0) -> list[tuple[EmbyApi, LibraryIndex]]:
+        """各服务器的入库索引，见 EmbyApi.ensure_library_index"""
+        servers = self.configured()
+        indexes = await asyncio.gather(*(server.ensure_library_index(max_wait) for server in servers),
+                                       return_exceptions=True)
+        return [(server, index) for server, index in zip(servers, indexes) if isinstance(index, LibraryIndex)]
+
+    async def get_latest_media(self, media_type: str = "all") -> tuple[list[dict], list[str]]:
+        results, failed = await self._fanout(lambda server: server.get_latest_media(media_type))
+        return merge_media(results, self.max_results, key=lambda media: media.get('date_created', '')), failed
+
+    async def search_media(self, keyword: str) -> tuple[list[dict], list[str]]:
+        results, failed = await self._fanout(lambda server: server.search_media(keyword))
+        return merge_media(results, self.max_results), failed
+
+    async def get_library_stats(self) -> tuple[list[tuple[EmbyApi, dict]], list[str]]:
+        """各服务器的统计分别返回，不同服务器的同一作品无法按数量去重"""
+        return await self._fanout(lambda server: server.get_library_stats())
+
+    async def get_today_additions_stats(self) -> dict:
+        """合并各服务器的今日入库，另含 failed: [失败说明]"""
+        results, failed = await self._fanout(lambda server: server.get_today_additions_stats())
+        if not results:
+            return {"failed": failed} if failed else {}
+        return {**merge_additions(results, self.tagged), "failed": failed}
+
+    async def get_additions_report(self, days: int, refresh: bool = True) -> dict:
+        """合并各服务器最近 days 天的入库汇总，任何服务器未启用入库汇总时返回 {}"""
+        if not self.has_rollup:
+            return {}
+        results, failed = await self._fanout(lambda server: server.get_additions_report(days, refresh=refresh))
+        if not results:
+            return {"failed": failed} if failed else {}
+        return {**merge_additions(results, self.tagged), "failed": failed}
@@ -0,0 +1,113 @@
+import os
+import threading
+
+from astrbot.api import logger
+
+try:
+    from PIL import ImageFont
+    HAS_PILLOW = True
+except ImportError:
+    HAS_PILLOW = False
+
+# 常规字体候选（优先微软雅黑）
+REGULAR_FONT_PATHS = [
+    "C:\\Windows\\Fonts\\msyhbd.ttc",  # 微软雅黑粗体
+    "C:\\Windows\\Fonts\\msyh.ttc",    # 微软雅黑
+    "/usr/share/fonts/truetype/msyh/msyhbd.ttc",
+    "/usr/share/fonts/truetype/msyh/msyh.ttc",
+    "/usr/share/fonts/msyh.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Medium.ttc",
+    "/System/Library/Fonts/STHeiti Light.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "C:\\Windows\\Fonts\\simhei.ttf",
+]
+# 黑体候选（用于简介等）
+BOLD_FONT_PATHS = [
+    "C:\\Windows\\Fonts\\simhei.ttf",  # 黑体
+    "C:\\Windows\\Fonts\\msyhbd.ttc",  # 微软雅黑粗体
+    "/usr/share/fonts/truetype/simhei/simhei.ttf",
+    "/System/Library/Fonts/STHeiti Medium.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+]
+
+
+class FontRegistry:
+    """进程内共享的卡片字体
+
+    - 字体文件只查找一次：自定义字体优先，其次按候选列表取第一个能加载的文件
+    - 按 (字形, 字号) 缓存 FreeTypeFont，CJK 字体集文件只在首次使用某个字号时解析
+    - 字形: "regular" 常规、"bold" 黑体；找不到黑体时使用常规字体，都找不到时使用 Pillow 默认字体
+    """
+
+    def __init__(self, custom_path: str = ""):
+        self.custom_path = custom_path or ""
+        self._paths: dict[str, str | None] | None = None
+        self._fonts: dict[tuple[str, int], object] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _first_loadable(candidates: list[str]) -> str | None:
+        for path in candidates:
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                ImageFont.truetype(path, 12)
+                return path
+            except Exception as e:
+                logger.warning(f"字体 {path} 无法加载: {e}")
+        return None
+
+    def discover(self) -> dict[str, str | None]:
+        """查找各字形使用的字体文件，只在首次调用时执行"""
+        with self._lock:
+            if self._paths is None:
+                custom = [self.custom_path] if self.custom_path else []
+                regular = self._first_loadable(custom + REGULAR_FONT_PATHS)
+                bold = self._first_loadable(custom + BOLD_FONT_PATHS) or regular
+                self._paths = {"regular": regular, "bold": bold}
+                if regular:
+                    logger.info(f"卡片字体: {regular}，黑体: {bold}")
+                else:
+                    logger.warning("未找到可用的中文字体，卡片将使用 Pillow 默认字体，可在配置中指定 card_font_path")
+            return self._paths
+
+    def get(self, face: str, size: int):
+        """取 face 字形、size 字号的字体，已加载过的直接复用"""
+        key = (face, size)
+        font = self._fonts.get(key)
+        if font is not None:
+            return font
+        path = self.discover().get(face)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is None:
+                try:
+                    font = ImageFont.truetype(path, size) if path else ImageFont.load_default()
+                except Exception as e:
+                    logger.warning(f"加载字体 {path} 失败: {e}")
+                    font = ImageFont.load_default()
+                self._fonts[key] = font
+        return font
+
+
+_registry: FontRegistry | None = None
+
+
+def configure_fonts(custom_path: str = "") -> FontRegistry:
+    """按配置创建进程内的字体注册表并查找字体，自定义路径变化时重新查找"""
+    global _registry
+    if _registry is None or _registry.custom_path != (custom_path or ""):
+        _registry = FontRegistry(custom_path)
+    if HAS_PILLOW:
+        _registry.discover()
+    return _registry
+
+
+def get_fonts() -> FontRegistry:
+    """进程内共享的字体注册表，未配置时使用默认候选字体"""
+    return _registry if _registry is not None else configure_fonts()
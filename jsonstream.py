@@ -0,0 +1,85 @@
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator
+
+_WHITESPACE = " \t\r\n"
+_DECODER = json.JSONDecoder()
+
+
+async def iter_json_array(chunks: AsyncIterable[str], key: str | None = None) -> AsyncIterator[Any]:
+    """增量解析 JSON 数组，边接收边逐个产出元素
+
+    Args:
+        chunks: 文本分块（如 httpx 的 response.aiter_text()）
+        key: 为 None 时解析顶层数组；否则解析顶层对象中该键对应的数组（如 Emby 的 "Items"），
+             该键之后的其余字段会被忽略
+
+    缓冲区只保留尚未解析完的部分，内存占用与单个元素大小相关，与数组长度无关。
+    """
+    iterator = chunks.__aiter__()
+    buf = ""
+    pos = 0
+    eof = False
+
+    async def read_more() -> bool:
+        nonlocal buf, pos, eof
+        try:
+            chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    # 1. 定位数组起始位置
+    start_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key)) if key else re.compile(r"\s*\[")
+    while True:
+        match = start_pattern.search(buf) if key else start_pattern.match(buf)
+        if match:
+            pos = match.end()
+            break
+        if not key and buf.strip():
+            raise ValueError("JSON 顶层不是数组")
+        if not await read_more():
+            if key:
+                return  # 没有该字段，视为空数组
+            raise ValueError("JSON 数据不完整")
+        if key and len(buf) > 4096:
+            # 只保留末尾，避免在超长前缀中反复搜索；键名被截断在边界处的情况由保留长度覆盖
+            pos = len(buf) - 64
+
+    # 2. 逐个解析元素
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if not await read_more():
+                raise ValueError("JSON 数据不完整")
+            continue
+
+        char = buf[pos]
+        if char == "]":
+            return
+        if char == ",":
+            pos += 1
+            continue
+
+        try:
+            value, end = _DECODER.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if not await read_more():
+                raise
+            continue
+
+        # 数字可能被分块截断（如 "12" 实为 "123"、"4." 实为 "4.5"），需确认其后紧跟分隔符
+        if char not in '{["':
+            tail = end
+            while tail < len(buf) and buf[tail] in _WHITESPACE:
+                tail += 1
+            if (tail >= len(buf) or buf[tail] not in ",]") and not eof:
+                await read_more()
+                continue
+
+        pos = end
+        yield value
@@ -1,9 +1,8 @@
-from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult
+from astrbot.api.event import filter, AstrMessageEvent, MessageEventResult, MessageChain
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 import time
 import asyncio
-import io
 import base64
 import tempfile
 import os
@@ -15,27 +14,42 @@ from astrbot.core.utils.session_waiter import (
     session_waiter,
     SessionController,
 )
-from .api import MoviepilotApi, EmbyApi
-
-
-async def async_download_image(url: str, timeout: int = 10) -> bytes | None:
-    """异步下载图片，避免阻塞事件循环"""
+from .api import MoviepilotApi, SubscribeIndex
+from .federation import EmbyFederation
+from .subscribe_watcher import SubscribeWatcher
+from .download_watcher import DownloadWatcher, format_download_task
+from .ratelimit import RateLimiter
+from .prefetch import SelectionPrefetcher, backdrop_url, poster_url
+from .bulk import parse_title_list, pick_exact_match
+from .deadline import Deadline, DeadlineExceeded, budget, clamp_timeout, time_left
+from .rollup import sparkline
+from .webhook import WebhookReceiver, format_batch
+from .fonts import configure_fonts
+from .render import HAS_PILLOW, RenderBusy, RenderExecutor, compose_daily_report_card, compose_subscribe_card
+
+
+async def async_download_image(url: str, timeout: int = 10, session: aiohttp.ClientSession | None = None) -> bytes | None:
+    """异步下载图片，避免阻塞事件循环
+
+    传入 session 时复用其连接池，否则临时创建一个会话；超时不超过当前命令的剩余预算
+    """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                if response.status == 200:
-                    return await response.read()
+        timeout = clamp_timeout(timeout)
+        if session is None:
+            async with aiohttp.ClientSession() as tmp_session:
+                return await _read_image(tmp_session, url, timeout)
+        return await _read_image(session, url, timeout)
     except Exception as e:
         logger.warning(f"异步下载图片失败: {e}")
     return None
 
-# 尝试导入 Pillow
-try:
-    from PIL import Image, ImageDraw, ImageFont
-    HAS_PILLOW = True
-except ImportError:
-    HAS_PILLOW = False
-    logger.warning("Pillow 未安装，推送将使用纯文本模式。可通过 pip install Pillow 安装")
+
+async def _read_image(session: aiohttp.ClientSession, url: str, timeout: int) -> bytes | None:
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        if response.status == 200:
+            return await response.read()
+    return None
+
 
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -47,17 +61,29 @@ except ImportError:
 
 @register("MoviepilotSubscribe", "ikirito", "MoviePilot订阅 & Emby入库查询插件", "1.3.0", "https://github.com/i-kirito/astrbot_plugin_mpemby")
 class MyPlugin(Star):
+    # 命令预算中为降级的纯文本回复预留的秒数
+    CARD_FALLBACK_RESERVE = 2
+    TIMEOUT_MSG = "⏱️ 查询超时，请稍后重试。"
+
     def __init__(self, context: Context, config: dict):
         super().__init__(context)
         self.config = config
-        self.api = MoviepilotApi(config)  # MoviePilot API
-        self.emby_api = EmbyApi(config)  # Emby API
-        self.state = {}  # 初始化状态管理字典
 
         # 数据持久化目录
         self.data_dir = os.path.join(os.getcwd(), "data", "astrbot_plugin_mpemby")
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir, exist_ok=True)
+
+        # 卡片字体只在启动时查找一次，所有渲染共用；卡片合成在专用的渲染池中执行
+        if HAS_PILLOW:
+            configure_fonts(self.config.get("card_font_path", ""))
+        self.renderer = RenderExecutor(self.config)
+
+        self.api = MoviepilotApi(config, data_dir=self.data_dir)  # MoviePilot API
+        self.emby_api = EmbyFederation(config, data_dir=self.data_dir)  # Emby API（一台或多台服务器）
+        self.state = {}  # 初始化状态管理字典
+        self._image_session: aiohttp.ClientSession | None = None  # 图片下载共享会话
+
         self.whitelist_file = os.path.join(self.data_dir, "whitelist.json")
 
         # 加载白名单数据
@@ -68,6 +94,42 @@ class MyPlugin(Star):
         if HAS_APSCHEDULER and self.config.get("enable_daily_report", False):
             self.setup_scheduler()
 
+        # 订阅变化监听（订阅完成、新增集数推送）
+        self.subscribe_watcher = None
+        if self.config.get("enable_subscribe_watch", False):
+            self.subscribe_watcher = SubscribeWatcher(self.api, self.data_dir, self._notify_subscribe_change, self.config)
+            try:
+                self.subscribe_watcher.start()
+            except RuntimeError as e:
+                logger.error(f"启动订阅变化监听失败: {e}")
+
+        # 命令限流（每分钟次数，0 为不限制）
+        self.rate_limiter = RateLimiter(
+            per_user=self.config.get("rate_limit_user", 6),
+            per_group=self.config.get("rate_limit_group", 20),
+            per_global=self.config.get("rate_limit_global", 60),
+        )
+
+        # Emby 本地镜像定期同步
+        for server in self.emby_api.servers:
+            if server.mirror:
+                try:
+                    server.mirror.start()
+                except RuntimeError as e:
+                    logger.error(f"启动 {server.label} 镜像同步失败: {e}")
+
+        # Emby / Jellyfin 新入库 webhook
+        self.webhook = None
+        if self.config.get("webhook_enabled", False):
+            self.webhook = WebhookReceiver(self.config, self._on_webhook_items)
+            try:
+                asyncio.get_running_loop().create_task(self.webhook.start())
+            except RuntimeError as e:
+                logger.error(f"启动 Emby webhook 失败: {e}")
+
+        # 下载进度监控（所有会话共用一个轮询）
+        self.download_watcher = DownloadWatcher(self.api, self._send_to_session, self.config)
+
         logger.info(f"插件初始化完成，Emby配置状态: {'已配置' if self.emby_api.is_configured() else '未配置'}")
 
     def _load_whitelist(self):
@@ -98,219 +160,79 @@ class MyPlugin(Star):
         except Exception as e:
             logger.error(f"保存白名单数据失败: {e}")
 
-    async def render_subscribe_card(self, media_info: dict, success_count: int = 0, failed_count: int = 0, is_movie: bool = False) -> bytes:
-        """渲染订阅成功卡片 - 上方横图海报，下方文字信息"""
-        if not HAS_PILLOW:
-            return None
-
-        # 配置参数
-        padding = 20
-        font_size = 20
-        title_font_size = 24
-        line_height = 32
-
-        # 纯白背景，黑色文字
-        bg_color = (255, 255, 255)
-        text_color = (50, 50, 50)
-        muted_color = (120, 120, 120)
-
-        # 加载字体（优先微软雅黑）
-        font = None
-        title_font = None
-        bold_font = None  # 黑体用于简介
-        font_paths = [
-            "C:\\Windows\\Fonts\\msyhbd.ttc",  # 微软雅黑粗体
-            "C:\\Windows\\Fonts\\msyh.ttc",    # 微软雅黑
-            "/usr/share/fonts/truetype/msyh/msyhbd.ttc",
-            "/usr/share/fonts/truetype/msyh/msyh.ttc",
-            "/usr/share/fonts/msyh.ttc",
-            "/System/Library/Fonts/PingFang.ttc",
-            "/System/Library/Fonts/STHeiti Medium.ttc",
-            "/System/Library/Fonts/STHeiti Light.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
-            "C:\\Windows\\Fonts\\simhei.ttf",
-        ]
-        # 黑体路径（用于简介）
-        bold_font_paths = [
-            "C:\\Windows\\Fonts\\simhei.ttf",  # 黑体
-            "C:\\Windows\\Fonts\\msyhbd.ttc",  # 微软雅黑粗体
-            "/usr/share/fonts/truetype/simhei/simhei.ttf",
-            "/System/Library/Fonts/STHeiti Medium.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-            "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
-        ]
+    def _get_image_session(self) -> aiohttp.ClientSession:
+        """获取图片下载共享会话（懒创建，需在事件循环中调用）"""
+        if self._image_session is None or self._image_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.get('http_max_connections', 20),
+                keepalive_timeout=self.config.get('http_keepalive_expiry', 30),
+            )
+            self._image_session = aiohttp.ClientSession(connector=connector)
+        return self._image_session
 
-        for path in font_paths:
-            try:
-                if os.path.exists(path):
-                    font = ImageFont.truetype(path, font_size)
-                    title_font = ImageFont.truetype(path, title_font_size)
-                    break
-            except Exception:
-                continue
+    async def _download_card_image(self, url: str) -> bytes | None:
+        return await async_download_image(url, timeout=10, session=self._get_image_session())
 
-        # 加载黑体（用于简介）
-        for path in bold_font_paths:
-            try:
-                if os.path.exists(path):
-                    bold_font = ImageFont.truetype(path, font_size)
-                    break
-            except Exception:
-                continue
+    async def render_subscribe_card(self, media_info: dict, success_count: int = 0, failed_count: int = 0, is_movie: bool = False,
+                                    error_count: int = 0, pending_count: int = 0,
+                                    prefetcher: SelectionPrefetcher | None = None) -> bytes:
+        """渲染订阅成功卡片：在事件循环上下载图片，合成交给渲染池"""
+        if not HAS_PILLOW:
+            return None
 
-        if not font:
-            font = ImageFont.load_default()
-            title_font = font
-        if not bold_font:
-            bold_font = font
+        async def download(image_url: str) -> bytes | None:
+            if prefetcher:
+                return await prefetcher.image(image_url)
+            return await self._download_card_image(image_url)
 
-        # 获取媒体信息
-        title = media_info.get('title', '未知')
-        year = media_info.get('year', '')
-        media_type = media_info.get('type', '电影')
-        vote_average = media_info.get('vote_average', 0)
-        overview = media_info.get('overview', '')
-        backdrop_path = media_info.get('backdrop_path', '')
-        poster_path = media_info.get('poster_path', '')
-
-        # 图片宽度
-        img_width = 500
-        poster_height = 280
-
-        # 尝试下载横图（backdrop），如果没有则用竖版海报裁剪
-        poster_img = None
-        if backdrop_path:
-            try:
-                poster_url = f"https://image.tmdb.org/t/p/w780{backdrop_path}"
-                poster_data = await async_download_image(poster_url, timeout=10)
-                if poster_data:
-                    poster_img = Image.open(io.BytesIO(poster_data))
-                    # 按宽度缩放，保持比例
-                    ratio = img_width / poster_img.width
-                    new_height = int(poster_img.height * ratio)
-                    poster_img = poster_img.resize((img_width, new_height), Image.Resampling.LANCZOS)
-                    poster_height = new_height
-            except Exception as e:
-                logger.warning(f"下载横图失败: {e}")
-                poster_img = None
+        # 优先横图（backdrop），没有时再下载竖版海报
+        backdrop_data = poster_data = None
+        if media_info.get('backdrop_path'):
+            backdrop_data = await download(backdrop_url(media_info['backdrop_path']))
+        if not backdrop_data and media_info.get('poster_path'):
+            poster_data = await download(poster_url(media_info['poster_path']))
 
-        # 如果没有横图，尝试竖版海报
-        if not poster_img and poster_path:
-            try:
-                poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}"
-                poster_data = await async_download_image(poster_url, timeout=10)
-                if poster_data:
-                    poster_img = Image.open(io.BytesIO(poster_data))
-                    # 缩放到合适宽度
-                    ratio = img_width / poster_img.width
-                    new_height = int(poster_img.height * ratio)
-                    poster_img = poster_img.resize((img_width, new_height), Image.Resampling.LANCZOS)
-                    # 如果太高则裁剪
-                    if new_height > 400:
-                        poster_img = poster_img.crop((0, 0, img_width, 400))
-                        poster_height = 400
-                    else:
-                        poster_height = new_height
-            except Exception as e:
-                logger.warning(f"下载海报失败: {e}")
-                poster_img = None
-
-        # 构建文本内容
-        # 标题行
-        title_line = f"{title}"
-        if year:
-            title_line += f" ({year})"
-        title_line += " 已完成订阅"
-
-        # 信息行
-        info_parts = []
-        if vote_average and vote_average > 0:
-            info_parts.append(f"评分：{vote_average}")
-        info_parts.append(f"类型：{media_type}")
+        season_info = ""
         if not is_movie and success_count > 0:
             season_info = f"已订阅 {success_count} 季"
-            if failed_count > 0:
-                season_info += f"（{failed_count} 季已存在）"
-            info_parts.append(season_info)
-        info_line = "  ".join(info_parts)
-
-        # 简介处理（自动换行）
-        overview_lines = []
-        if overview:
-            chars_per_line = 22  # 减少每行字数，留出左右间距
-            overview_text = overview[:200]
-            for i in range(0, len(overview_text), chars_per_line):
-                overview_lines.append(overview_text[i:i+chars_per_line])
-            if len(overview) > 200 and overview_lines:
-                overview_lines[-1] = overview_lines[-1][:chars_per_line-3] + "..."
-
-        # 时间戳
-        timestamp = datetime.now().strftime("%H:%M")
-
-        # 计算文字区域高度
-        text_area_height = padding + line_height  # 标题
-        text_area_height += line_height  # 信息行
-        if overview_lines:
-            text_area_height += padding * 2 + line_height * len(overview_lines)  # 简介上下间距
-        text_area_height += padding + line_height  # 底部时间戳
-
-        # 总高度
-        img_height = poster_height + text_area_height if poster_img else text_area_height + 50
-
-        # 创建图片
-        img = Image.new('RGB', (img_width, img_height), bg_color)
-        draw = ImageDraw.Draw(img)
-
-        current_y = 0
-
-        # 粘贴海报（铺满上方）
-        if poster_img:
-            img.paste(poster_img, (0, 0))
-            current_y = poster_height + padding
-        else:
-            current_y = padding
-
-        # 渲染标题
-        draw.text((padding, current_y), title_line, font=title_font, fill=text_color)
-        current_y += line_height + 5
-
-        # 渲染信息行
-        draw.text((padding, current_y), info_line, font=font, fill=muted_color)
-        current_y += line_height
-
-        # 渲染简介（四周有间距，使用黑体）
-        if overview_lines:
-            current_y += padding  # 上间距
-            draw.text((padding + 10, current_y), "简介：", font=bold_font, fill=text_color)
-            current_y += line_height
-            for line in overview_lines:
-                draw.text((padding + 10, current_y), line, font=bold_font, fill=muted_color)
-                current_y += line_height - 2
-            current_y += padding  # 下间距
-
-        # 右下角时间戳
-        timestamp_text = timestamp
-        # 计算时间戳位置（右下角）
-        try:
-            ts_bbox = draw.textbbox((0, 0), timestamp_text, font=font)
-            ts_width = ts_bbox[2] - ts_bbox[0]
-        except:
-            ts_width = len(timestamp_text) * font_size // 2
-        draw.text((img_width - padding - ts_width, img_height - padding - line_height + 5),
-                  timestamp_text, font=font, fill=muted_color)
-
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG', optimize=True)
-        return buffer.getvalue()
+            extra_info = self._season_extra_info(failed_count, error_count, pending_count)
+            if extra_info:
+                season_info += f"（{extra_info}）"
+        return await self.renderer.run(compose_subscribe_card, media_info, backdrop_data, poster_data, season_info)
+
+    @staticmethod
+    def _season_extra_info(exists_count: int = 0, error_count: int = 0, pending_count: int = 0) -> str:
+        """生成季订阅附加说明，如 "2 季已存在，1 季处理中" """
+        parts = []
+        if exists_count > 0:
+            parts.append(f"{exists_count} 季已存在")
+        if error_count > 0:
+            parts.append(f"{error_count} 季失败")
+        if pending_count > 0:
+            parts.append(f"{pending_count} 季处理中")
+        return "，".join(parts)
 
     async def send_subscribe_result(self, event: AstrMessageEvent, media_info: dict,
-                                     success_count: int = 0, failed_count: int = 0, is_movie: bool = False):
-        """发送订阅结果（渲染为图片：标题+海报+详情）"""
+                                     success_count: int = 0, failed_count: int = 0, is_movie: bool = False,
+                                     error_count: int = 0, pending_count: int = 0,
+                                     prefetcher: SelectionPrefetcher | None = None):
+        """发送订阅结果（渲染为图片：标题+海报+详情）
+
+        failed_count 为已存在的季数，error_count 为提交失败的季数，pending_count 为超时仍在后台提交的季数，
+        传入 prefetcher 时优先使用其预取的图片
+        """
         try:
-            img_bytes = await self.render_subscribe_card(media_info, success_count, failed_count, is_movie)
+            # 剩余预算不够渲染卡片时直接回退到文本
+            render_budget = time_left()
+            if render_budget is not None:
+                render_budget -= self.CARD_FALLBACK_RESERVE
+            img_bytes = None
+            if render_budget is None or render_budget > 0:
+                img_bytes = await asyncio.wait_for(
+                    self.render_subscribe_card(media_info, success_count, failed_count, is_movie,
+                                               error_count, pending_count, prefetcher),
+                    timeout=render_budget,
+                )
             if img_bytes:
                 with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
                     f.write(img_bytes)
@@ -325,6 +247,10 @@ class MyPlugin(Star):
                 except Exception:
                     pass
                 return
+        except asyncio.TimeoutError:
+            logger.warning("订阅卡片渲染超时，使用文本模式")
+        except RenderBusy as e:
+            logger.warning(f"{e}，订阅卡片使用文本模式")
         except Exception as e:
             logger.warning(f"订阅卡片渲染失败，使用文本模式: {e}")
 
@@ -335,8 +261,9 @@ class MyPlugin(Star):
         msg = f"✅ 订阅成功\n\n🎬 {title} ({year})\n类型：{media_type}"
         if not is_movie and success_count > 0:
             msg += f"\n已订阅 {success_count} 季"
-            if failed_count > 0:
-                msg += f"（{failed_count} 季已存在）"
+            extra_info = self._season_extra_info(failed_count, error_count, pending_count)
+            if extra_info:
+                msg += f"（{extra_info}）"
         await event.send(event.plain_result(msg))
 
     def setup_scheduler(self):
@@ -366,159 +293,21 @@ class MyPlugin(Star):
         except Exception as e:
             logger.error(f"启动定时任务失败: {e}")
 
-    def render_daily_report_card(self, stats: dict, items: list, date_str: str, free_space: str = "") -> bytes:
-        """渲染每日入库日报卡片 - 纯白背景，微软雅黑字体"""
-        if not HAS_PILLOW:
-            return None
-
-        # 配置参数
-        padding = 25
-        line_height = 32
-        font_size = 20
-        title_font_size = 24
-        small_font_size = 18
-
-        # 纯白背景，黑色文字
-        bg_color = (255, 255, 255)
-        text_color = (50, 50, 50)
-        muted_color = (120, 120, 120)
-
-        # 加载字体（优先微软雅黑）
-        font = None
-        title_font = None
-        small_font = None
-        bold_font = None
-        font_paths = [
-            "C:\\Windows\\Fonts\\msyhbd.ttc",
-            "C:\\Windows\\Fonts\\msyh.ttc",
-            "/usr/share/fonts/truetype/msyh/msyhbd.ttc",
-            "/usr/share/fonts/truetype/msyh/msyh.ttc",
-            "/usr/share/fonts/msyh.ttc",
-            "/System/Library/Fonts/PingFang.ttc",
-            "/System/Library/Fonts/STHeiti Medium.ttc",
-            "/System/Library/Fonts/STHeiti Light.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
-            "C:\\Windows\\Fonts\\simhei.ttf",
-        ]
-        bold_font_paths = [
-            "C:\\Windows\\Fonts\\simhei.ttf",
-            "C:\\Windows\\Fonts\\msyhbd.ttc",
-            "/usr/share/fonts/truetype/simhei/simhei.ttf",
-            "/System/Library/Fonts/STHeiti Medium.ttc",
-            "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
-        ]
+    # 报告周期: (天数, 标题, 文本标题, 无新增时的提示)
+    REPORT_PERIODS = {
+        "day": (1, "Emby 每日入库报告", "Emby 今日入库日报", "今日暂无新入库内容。"),
+        "week": (7, "Emby 每周入库报告", "Emby 近 7 天入库周报", "近 7 天暂无新入库内容。"),
+        "month": (30, "Emby 每月入库报告", "Emby 近 30 天入库月报", "近 30 天暂无新入库内容。"),
+    }
 
-        for path in font_paths:
-            try:
-                if os.path.exists(path):
-                    font = ImageFont.truetype(path, font_size)
-                    title_font = ImageFont.truetype(path, title_font_size)
-                    small_font = ImageFont.truetype(path, small_font_size)
-                    break
-            except Exception:
-                continue
-
-        for path in bold_font_paths:
-            try:
-                if os.path.exists(path):
-                    bold_font = ImageFont.truetype(path, font_size)
-                    break
-            except Exception:
-                continue
-
-        if not font:
-            font = ImageFont.load_default()
-            title_font = font
-            small_font = font
-        if not bold_font:
-            bold_font = font
-
-        # 分类整理入库项目
-        movies = []
-        series = []
-        for item_str in items:
-            if item_str.startswith("[电影]"):
-                movies.append(item_str.replace("[电影] ", ""))
-            elif item_str.startswith("[剧集]"):
-                series.append(item_str.replace("[剧集] ", ""))
-
-        # 时间戳
-        timestamp = datetime.now().strftime("%H:%M")
-
-        # 计算图片高度
-        img_width = 500
-
-        # 标题区域
-        header_height = line_height + 10
-        # 统计区域
-        stats_height = line_height * 2 + 20
-        # 电影区域
-        movies_height = (len(movies[:8]) * line_height + line_height + 20) if movies else 0
-        # 剧集区域
-        series_height = (len(series[:8]) * line_height + line_height + 20) if series else 0
-        # 底部区域（时间戳）
-        footer_height = line_height + padding
-
-        img_height = padding + header_height + stats_height + movies_height + series_height + footer_height + padding
-
-        # 创建图片
-        img = Image.new('RGB', (img_width, img_height), bg_color)
-        draw = ImageDraw.Draw(img)
-
-        current_y = padding
-
-        # 1. 标题行
-        draw.text((padding, current_y), f"Emby 每日入库报告 | {date_str}", font=title_font, fill=text_color)
-        current_y += header_height + 10
-
-        # 2. 统计区域
-        movie_count = stats.get("Movie", 0)
-        series_count = stats.get("Series", 0)
-
-        draw.text((padding, current_y), f"新增电影: {movie_count} 部", font=font, fill=text_color)
-        current_y += line_height
-        draw.text((padding, current_y), f"新增剧集: {series_count} 部", font=font, fill=text_color)
-        current_y += line_height + padding
-
-        # 3. 电影列表
-        if movies:
-            draw.text((padding, current_y), "电影:", font=bold_font, fill=text_color)
-            current_y += line_height
-            for movie in movies[:8]:
-                display_name = movie[:22] + "..." if len(movie) > 22 else movie
-                draw.text((padding + 10, current_y), f"· {display_name}", font=small_font, fill=muted_color)
-                current_y += line_height
-            current_y += 10
-
-        # 4. 剧集列表
-        if series:
-            draw.text((padding, current_y), "剧集:", font=bold_font, fill=text_color)
-            current_y += line_height
-            for show in series[:8]:
-                display_name = show[:22] + "..." if len(show) > 22 else show
-                draw.text((padding + 10, current_y), f"· {display_name}", font=small_font, fill=muted_color)
-                current_y += line_height
-
-        # 5. 右下角时间戳
-        try:
-            ts_bbox = draw.textbbox((0, 0), timestamp, font=font)
-            ts_width = ts_bbox[2] - ts_bbox[0]
-        except:
-            ts_width = len(timestamp) * font_size // 2
-        draw.text((img_width - padding - ts_width, img_height - padding - line_height + 5),
-                  timestamp, font=font, fill=muted_color)
-
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG', optimize=True)
-        return buffer.getvalue()
-
-    async def send_daily_report(self, manual_trigger: bool = False, event: AstrMessageEvent = None):
+    async def send_daily_report(self, manual_trigger: bool = False, event: AstrMessageEvent = None,
+                                period: str = "day"):
         """发送每日入库简报
 
         Args:
             manual_trigger: 是否为手动触发
             event: 触发事件对象 (仅手动触发时存在)
+            period: day / week / month，周报和月报由预聚合的日桶合并，并附带每日趋势
         """
         target_id = None
         # 如果是手动触发且有 event，优先使用 event 发送，这样最稳
@@ -533,19 +322,38 @@ class MyPlugin(Star):
                    await event.send(event.plain_result(msg))
                 return
 
-        logger.info(f"开始执行每日入库统计推送 (手动触发: {manual_trigger})...")
-        data = await self.emby_api.get_today_additions_stats()
+        days, card_title, text_title, empty_msg = self.REPORT_PERIODS.get(period, self.REPORT_PERIODS["day"])
+        logger.info(f"开始执行入库统计推送 (周期: {period}, 手动触发: {manual_trigger})...")
+        trend = ""
+        # webhook 在线时入库汇总已实时写入，日报也直接读取汇总，不再查询 Emby
+        pushed = self.webhook is not None and self.webhook.running and self.emby_api.has_rollup
+        if days > 1 or pushed:
+            data = await self.emby_api.get_additions_report(days, refresh=not pushed)
+            if not data:
+                msg = "未启用入库汇总，无法生成周报/月报。"
+                if manual_trigger and event:
+                    await event.send(event.plain_result(msg))
+                return
+            if days > 1:
+                date_str = f"{data.get('start', '')} ~ {data.get('end', '')}"
+                # 每天的电影 + 剧集 + 单集新增数
+                trend = sparkline([sum(counts.values()) for _, counts in data.get("trend", [])])
+            else:
+                date_str = data.get('end') or datetime.now().strftime('%Y-%m-%d')
+        else:
+            data = await self.emby_api.get_today_additions_stats()
+            date_str = datetime.now().strftime('%Y-%m-%d')
 
         stats = data.get("stats", {})
         items = data.get("items", [])
         total = stats.get("Total", 0)
-
-        date_str = datetime.now().strftime('%Y-%m-%d')
+        # 未响应的服务器不影响其余服务器的报告，只在末尾单独注明，不混入入库条目
+        failed = data.get("failed")
 
         if total == 0:
-            logger.info("今日无新入库")
+            logger.info("统计周期内无新入库")
             if manual_trigger:
-                msg = f"{date_str}\n今日暂无新入库内容。"
+                msg = f"{date_str}\n{empty_msg}{self._emby_failed_note(failed)}"
                 if event:
                     await event.send(event.plain_result(msg))
                 elif target_id:
@@ -555,7 +363,9 @@ class MyPlugin(Star):
         # 尝试渲染为图片发送
         if HAS_PILLOW:
             try:
-                img_bytes = await asyncio.to_thread(self.render_daily_report_card, stats, items, date_str)
+                note = f"未计入: {'、'.join(failed)}" if failed else ""
+                img_bytes = await self.renderer.run(compose_daily_report_card, stats, items, date_str,
+                                                    "", card_title, trend, note)
                 if img_bytes:
                     # 保存到临时文件
                     with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
@@ -579,7 +389,7 @@ class MyPlugin(Star):
                 logger.warning(f"图片渲染失败，回退到文本模式: {e}")
 
         # 回退到纯文本模式
-        msg = f"Emby 今日入库日报 ({date_str})\n"
+        msg = f"{text_title} ({date_str})\n"
         msg += "---\n"
         if stats.get("Movie", 0) > 0:
             msg += f"电影新增：{stats['Movie']} 部\n"
@@ -587,17 +397,20 @@ class MyPlugin(Star):
             msg += f"剧集新增：{stats['Series']} 部\n"
         if stats.get("Episode", 0) > 0:
             msg += f"单集新增：{stats['Episode']} 集\n"
+        if trend:
+            msg += f"每日趋势：{trend}\n"
         if items:
             msg += "---\n入库详情：\n"
             for i, item_str in enumerate(items[:10], 1):
                 msg += f"{i}. {item_str}\n"
             if len(items) > 10:
                 msg += f"...等共 {len(items)} 条记录"
+        msg = msg.strip() + self._emby_failed_note(failed)
 
         if manual_trigger and event:
-            await event.send(event.plain_result(msg.strip()))
+            await event.send(event.plain_result(msg))
         else:
-            await self._send_to_target(target_id, msg.strip())
+            await self._send_to_target(target_id, msg)
 
     async def _send_image_to_target(self, target_id: str, image_path: str):
         """发送图片到指定目标"""
@@ -800,27 +613,205 @@ class MyPlugin(Star):
             logger.error(f"执行推送逻辑致命错误: {e}")
             return False
 
+    async def _send_to_session(self, session: str, msg: str):
+        """通过会话标识 (unified_msg_origin) 主动发送文本消息"""
+        await self.context.send_message(session, MessageChain().message(msg))
+
+    async def _notify_subscribe_change(self, msg: str):
+        """推送订阅变化通知，未单独配置目标时使用日报推送目标"""
+        target_id = self.config.get("subscribe_watch_target") or self.config.get("report_target_id")
+        if not target_id:
+            logger.warning("未配置订阅通知推送目标，已跳过推送")
+            return
+        await self._send_to_target(target_id, msg)
+
+    async def _on_webhook_items(self, items: list[dict]):
+        """处理 webhook 合并后的一批新入库条目：按来源服务器写入入库汇总、更新搜索索引，按配置推送通知"""
+        by_server: dict[str, list[dict]] = {}
+        for item in items:
+            by_server.setdefault(item.get("Server", ""), []).append(item)
+        messages = []
+        for name, server_items in by_server.items():
+            server = self.emby_api.get_server(name)
+            if server.rollup is not None:
+                await server.rollup.record_async(server_items)
+            index = server.search_index
+            if index is not None and index.ready:
+                index.update([item for item in server_items if item.get("Type") in ("Movie", "Series")])
+            messages.append(format_batch(server_items, f"{server.label} 新入库"))
+        if not self.config.get("webhook_notify", False):
+            return
+        target_id = self.config.get("webhook_notify_target") or self.config.get("report_target_id")
+        if not target_id:
+            logger.warning("未配置入库通知推送目标，已跳过推送")
+            return
+        await self._send_to_target(target_id, "\n\n".join(messages))
+
     async def terminate(self):
         """插件卸载时清理"""
         if self.scheduler:
             self.scheduler.shutdown()
             logger.info("已停止定时任务")
 
+        if self.webhook:
+            await self.webhook.stop()
+
+        if self.subscribe_watcher:
+            await self.subscribe_watcher.stop()
+        await self.download_watcher.stop()
+
+        # 关闭共享的 HTTP 连接池
+        for client in (self.api, self.emby_api):
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"关闭 HTTP 客户端失败: {e}")
+        if self._image_session is not None and not self._image_session.closed:
+            await self._image_session.close()
+        self.renderer.shutdown()
+
+    def _is_admin(self, event: AstrMessageEvent) -> bool:
+        """判断事件发送者是否为管理员"""
+        is_admin = False
+        try:
+            if hasattr(event, "is_admin"):
+                if callable(event.is_admin):
+                    is_admin = event.is_admin()
+                else:
+                    is_admin = bool(event.is_admin)
+
+            if not is_admin:
+                role = getattr(event, "role", None)
+                if isinstance(role, str) and role.lower() == "admin":
+                    is_admin = True
+
+            if not is_admin:
+                sender_id = str(event.get_sender_id())
+                astrbot_config = self.context.get_config()
+                for key in ("admins", "admin_ids", "admin_list", "superusers"):
+                    ids = astrbot_config.get(key, [])
+                    if isinstance(ids, (list, tuple, set)) and sender_id in {str(i) for i in ids}:
+                        is_admin = True
+                        break
+        except Exception:
+            pass
+        return is_admin
+
+    def _is_whitelisted(self, event: AstrMessageEvent) -> bool:
+        """订阅白名单检查，未开启白名单时总是放行"""
+        if not self.config.get("enable_whitelist", False):
+            return True
+        sender_id = str(event.get_sender_id())
+        whitelist_str = self.config.get("subscribe_whitelist", "")
+        whitelist = [uid.strip() for uid in whitelist_str.split(",") if uid.strip()]
+        return sender_id in whitelist
+
+    async def _sub_lookups(self, message: str):
+        """并发搜索影片并取得订阅索引、Emby 入库索引
+
+        两个索引都直接使用现有版本并在后台刷新，只有首次构建时才有限地等待
+
+        gather 的子任务在此协程内创建，才能继承 Deadline.run 设置的命令预算
+        """
+        return await asyncio.gather(
+            self.api.search_media_info(message),  # 使用 self.api 访问实例属性
+            self.api.ensure_subscribe_index(max_wait=float(self.config.get("mp_subscribe_index_wait", 2))),
+            self.emby_api.ensure_library_index(max_wait=float(self.config.get("emby_library_index_wait", 2))),
+        )
+
+    @staticmethod
+    def _subscribed_label(movie: dict, sub_index) -> str:
+        """根据本地订阅索引生成搜索结果的已订阅标注"""
+        if not movie.get('tmdb_id'):
+            return ""
+        if movie.get('type') == "电视剧":
+            seasons = sub_index.seasons(movie['tmdb_id'])
+            if seasons:
+                return f" [已订阅 {','.join(f'S{n}' for n in seasons)}]"
+            return ""
+        return " [已订阅]" if sub_index.has(SubscribeIndex.MOVIE, movie['tmdb_id']) else ""
+
+    def _library_label(self, movie: dict, libraries: list) -> str:
+        """根据 Emby 入库索引生成搜索结果的已入库标注，剧集附带已有的季，多服务器时附带服务器标签"""
+        if not movie.get('tmdb_id'):
+            return ""
+        kind = "Series" if movie.get('type') == "电视剧" else "Movie"
+        found = [(server, seasons) for server, index in libraries
+                 if (seasons := index.lookup(kind, movie['tmdb_id'])) is not None]
+        if not found:
+            return ""
+        label = " [已入库"
+        seasons = sorted(set().union(*(seasons for _, seasons in found)))
+        if seasons:
+            label += f" {','.join(f'S{n}' for n in seasons)}"
+        if self.emby_api.tagged:
+            label += f": {'/'.join(server.name for server, _ in found)}"
+        return label + "]"
+
+    def _check_rate_limit(self, event: AstrMessageEvent) -> str | None:
+        """检查命令限流，超限时返回提示文本，放行时返回 None"""
+        if not self.rate_limiter.enabled:
+            return None
+        try:
+            group_id = str(event.get_group_id() or "")
+        except Exception:
+            group_id = ""
+        limited = self.rate_limiter.check(str(event.get_sender_id()), group_id)
+        if limited is None:
+            return None
+        scope, wait = limited
+        scope_name = {"user": "您", "group": "本群", "global": "机器人"}.get(scope, "")
+        return f"⏳ {scope_name}的请求过于频繁，请 {int(wait) + 1} 秒后再试。"
+
+    @staticmethod
+    def _unavailable_msg(client, default: str) -> str:
+        """后端熔断中时返回明确的不可用提示，否则返回默认提示"""
+        breaker = client.breaker
+        if breaker.is_open:
+            return f"⚠️ {breaker.name} 暂时不可用（连续请求失败），约 {int(breaker.retry_after()) + 1} 秒后自动恢复重试。"
+        return default
+
+    @staticmethod
+    def _emby_failed_note(failed: list[str] | None) -> str:
+        """多服务器查询时未响应服务器的提示，全部正常时为空"""
+        return f"\n⚠️ 以下服务器未响应，结果不完整: {'、'.join(failed)}" if failed else ""
+
+    def _emby_tag(self, media: dict) -> str:
+        """多服务器时结果的来源服务器标签"""
+        return f" [{'/'.join(media.get('servers', []))}]" if self.emby_api.tagged else ""
+
+    def _command_deadline(self) -> Deadline:
+        """单条命令的总时间预算，请求超时和图片下载都不会超过剩余预算"""
+        return Deadline(float(self.config.get('command_deadline', 45)))
+
+    @staticmethod
+    def _format_cache_stats(name: str, stats: dict) -> str:
+        return (f"{name}: {stats['size']}/{stats['maxsize']} 条，"
+                f"命中 {stats['hits']} / 未命中 {stats['misses']}（命中率 {stats['hit_rate']:.0%}）")
+
     @filter.command("mp订阅")
     async def sub(self, event: AstrMessageEvent, message: str):
         '''订阅影片'''
         # 白名单权限检查
-        if self.config.get("enable_whitelist", False):
-            sender_id = str(event.get_sender_id())
-            whitelist_str = self.config.get("subscribe_whitelist", "")
-            whitelist = [uid.strip() for uid in whitelist_str.split(",") if uid.strip()]
-            if sender_id not in whitelist:
-                yield event.plain_result("您没有使用订阅功能的权限，请联系管理员添加白名单。")
-                return
+        if not self._is_whitelisted(event):
+            yield event.plain_result("您没有使用订阅功能的权限，请联系管理员添加白名单。")
+            return
+
+        limited_msg = self._check_rate_limit(event)
+        if limited_msg:
+            yield event.plain_result(limited_msg)
+            return
 
-        movies = await self.api.search_media_info(message)  # 使用 self.api 访问实例属性
+        # 搜索的同时刷新本地订阅索引和 Emby 入库索引，用于标注已订阅、已入库的结果
+        try:
+            movies, sub_index, libraries = await self._command_deadline().run(self._sub_lookups(message))
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
         if movies:
-            movie_list = "\n".join([f"{i + 1}. {movie['title']} ({movie['year']})" for i, movie in enumerate(movies)])
+            movie_list = "\n".join([f"{i + 1}. {movie['title']} ({movie['year']}){self._subscribed_label(movie, sub_index)}"
+                                    f"{self._library_label(movie, libraries)}"
+                                    for i, movie in enumerate(movies)])
             logger.debug(f"搜索结果: {movie_list}")
             media_list = "\n查询到的影片如下\n请直接回复序号进行订阅（回复0退出选择）：\n" + movie_list
 
@@ -860,9 +851,16 @@ class MyPlugin(Star):
             message_result.chain.append(Comp.Plain(media_list))
             yield message_result
 
+            # 等待用户选择期间预取前几个结果的季列表和卡片图片
+            prefetcher = SelectionPrefetcher(
+                self.api, self._download_card_image,
+                top_n=self.config.get("prefetch_top_n", 3),
+                concurrency=self.config.get("prefetch_concurrency", 3),
+            )
+            prefetcher.start(movies)
+
             # 使用会话控制器等待用户回复
-            @session_waiter(timeout=60, record_history_chains=False)
-            async def movie_selection_waiter(controller: SessionController, event: AstrMessageEvent):
+            async def handle_selection(controller: SessionController, event: AstrMessageEvent):
                 try:
                     # 检查是否为同一用户，忽略其他用户的消息
                     current_sender_id = event.get_sender_id()
@@ -878,6 +876,7 @@ class MyPlugin(Star):
                         index = int(user_input) - 1
 
                         if index == -1:  # 用户输入0
+                            prefetcher.cancel()
                             message_result = event.make_result()
                             message_result.chain = [Comp.Plain("操作已取消。")]
                             await event.send(message_result)
@@ -886,27 +885,43 @@ class MyPlugin(Star):
 
                         if 0 <= index < len(movies):
                             selected_movie = movies[index]
+                            prefetcher.keep_only(index)
                             if selected_movie['type'] == "电视剧":
                                 # 如果是电视剧，直接订阅所有季
-                                seasons = await self.api.list_all_seasons(selected_movie['tmdb_id'])
+                                seasons = await prefetcher.seasons(selected_movie)
                                 if seasons:
                                     message_result = event.make_result()
                                     message_result.chain = [Comp.Plain(f"正在订阅 {selected_movie['title']} 的所有季...")]
                                     await event.send(message_result)
 
-                                    # 订阅所有季
-                                    result = await self.api.subscribe_all_seasons(selected_movie, seasons)
+                                    # 并发订阅所有季，超过等待时间的季在后台继续提交
+                                    result = await self.api.subscribe_all_seasons(
+                                        selected_movie, seasons,
+                                        deadline=budget(
+                                            self.config.get("mp_subscribe_deadline", 20),
+                                            reserve=self.CARD_FALLBACK_RESERVE * 2,
+                                        )
+                                    )
 
                                     if result["success"] > 0:
                                         await self.send_subscribe_result(
                                             event, selected_movie,
                                             success_count=result["success"],
-                                            failed_count=result["failed"],
-                                            is_movie=False
+                                            failed_count=result["exists"],
+                                            is_movie=False,
+                                            error_count=result["errors"],
+                                            pending_count=result["pending"],
+                                            prefetcher=prefetcher
                                         )
                                     else:
+                                        if result["total"] > 0 and result["exists"] == result["total"]:
+                                            msg = "该剧所有季均已订阅。"
+                                        elif result["pending"] > 0:
+                                            msg = f"订阅请求已提交，{self._season_extra_info(result['exists'], result['errors'], result['pending'])}。"
+                                        else:
+                                            msg = "订阅失败，可能已全部订阅。"
                                         message_result = event.make_result()
-                                        message_result.chain = [Comp.Plain("订阅失败，可能已全部订阅。")]
+                                        message_result.chain = [Comp.Plain(msg)]
                                         await event.send(message_result)
                                     controller.stop()
                                 else:
@@ -916,9 +931,16 @@ class MyPlugin(Star):
                                     controller.stop()
                             else:
                                 # 如果是电影，直接订阅
+                                if sub_index.has(SubscribeIndex.MOVIE, selected_movie['tmdb_id']):
+                                    message_result = event.make_result()
+                                    message_result.chain = [Comp.Plain(f"{selected_movie['title']} 已在订阅中。")]
+                                    await event.send(message_result)
+                                    controller.stop()
+                                    return
                                 success = await self.api.subscribe_movie(selected_movie)
                                 if success:
-                                    await self.send_subscribe_result(event, selected_movie, is_movie=True)
+                                    await self.send_subscribe_result(event, selected_movie, is_movie=True,
+                                                                     prefetcher=prefetcher)
                                 else:
                                     message_result = event.make_result()
                                     message_result.chain = [Comp.Plain("订阅失败。")]
@@ -941,22 +963,178 @@ class MyPlugin(Star):
                     await event.send(message_result)
                     controller.stop()
 
+            @session_waiter(timeout=60, record_history_chains=False)
+            async def movie_selection_waiter(controller: SessionController, event: AstrMessageEvent):
+                # 每次回复单独计算预算，不包含用户思考的时间
+                try:
+                    await self._command_deadline().run(handle_selection(controller, event))
+                except DeadlineExceeded:
+                    await event.send(event.plain_result("⏱️ 处理超时，订阅可能仍在后台提交，稍后可用 /mp当前订阅 查看。"))
+                    controller.stop()
+
             try:
                 await movie_selection_waiter(event)
             except Exception as e:
                 logger.error(f"Movie selection error: {e}")
                 yield event.plain_result(f"发生错误：{str(e)}")
             finally:
+                # 选择结束或会话超时，取消尚未完成的预取
+                prefetcher.cancel()
                 event.stop_event()
         else:
-            yield event.plain_result("没有查询到影片，请检查名字。")
+            yield event.plain_result(self._unavailable_msg(self.api, "没有查询到影片，请检查名字。"))
+
+    async def _read_attached_text(self, event: AstrMessageEvent) -> str:
+        """读取消息中附带的文本/CSV 文件内容"""
+        for comp in event.get_messages():
+            if not isinstance(comp, Comp.File):
+                continue
+            try:
+                path = await comp.get_file()
+                if not path or os.path.getsize(path) > 1024 * 1024:
+                    continue
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                for encoding in ('utf-8-sig', 'gb18030'):
+                    try:
+                        return raw.decode(encoding)
+                    except UnicodeDecodeError:
+                        continue
+            except Exception as e:
+                logger.warning(f"读取附件失败: {e}")
+        return ""
+
+    async def _bulk_subscribe_one(self, movie: dict) -> str:
+        """订阅单个条目，返回 subscribed / exists / failed"""
+        if movie.get('type') == "电视剧":
+            seasons = await self.api.list_all_seasons(movie['tmdb_id'])
+            if not seasons:
+                return "failed"
+            result = await self.api.subscribe_all_seasons(
+                movie, seasons, deadline=self.config.get("mp_subscribe_deadline", 20)
+            )
+            if result["success"] > 0 or result["pending"] > 0:
+                return "subscribed"
+            return "exists" if result["total"] > 0 and result["exists"] == result["total"] else "failed"
+
+        if self.api.sub_index.has(SubscribeIndex.MOVIE, movie['tmdb_id']):
+            return "exists"
+        return "subscribed" if await self.api.subscribe_movie(movie) else "failed"
+
+    async def _bulk_subscribe(self, entries: list[tuple[str, str]]) -> dict[str, list[str]]:
+        """批量订阅：并发搜索，唯一精确匹配的条目经流水线交给订阅工作者
+
+        搜索和订阅同时进行，先搜到的条目先开始订阅。
+        """
+        report = {"subscribed": [], "exists": [], "ambiguous": [], "not_found": [], "failed": []}
+        queue: asyncio.Queue = asyncio.Queue()
+        search_semaphore = asyncio.Semaphore(max(1, int(self.config.get("bulk_search_concurrency", 4))))
+        await self.api.ensure_subscribe_index()
+
+        async def search(title: str, year: str):
+            async with search_semaphore:
+                results = await self.api.search_media_info(title)
+            label = f"{title} ({year})" if year else title
+            if results is None:
+                report["failed"].append(f"{label}（搜索失败）")
+                return
+            if not results:
+                report["not_found"].append(label)
+                return
+            movie, candidates = pick_exact_match(results, title, year)
+            if movie is None:
+                names = " / ".join(f"{c.get('title')} ({c.get('year')})" for c in candidates[:3])
+                report["ambiguous"].append(f"{label}（候选: {names}）")
+                return
+            await queue.put(movie)
+
+        async def worker():
+            while True:
+                movie = await queue.get()
+                try:
+                    if movie is None:
+                        return
+                    label = f"{movie.get('title')} ({movie.get('year')})"
+                    try:
+                        status = await self._bulk_subscribe_one(movie)
+                    except Exception as e:
+                        logger.error(f"批量订阅 {label} 失败: {e}")
+                        status = "failed"
+                    report[status].append(label)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker())
+                   for _ in range(max(1, int(self.config.get("bulk_subscribe_workers", 2))))]
+        try:
+            await asyncio.gather(*(search(title, year) for title, year in entries))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return report
+
+    @filter.command("mp批量订阅")
+    async def bulk_sub(self, event: AstrMessageEvent):
+        '''批量订阅影片，每行一部，可附带年份；也可以发送 txt/csv 文件'''
+        if not self._is_whitelisted(event):
+            yield event.plain_result("您没有使用订阅功能的权限，请联系管理员添加白名单。")
+            return
+
+        limited_msg = self._check_rate_limit(event)
+        if limited_msg:
+            yield event.plain_result(limited_msg)
+            return
+
+        # 去掉命令本身，剩余内容为片名列表
+        text = event.message_str.strip().lstrip("/")
+        if text.startswith("mp批量订阅"):
+            text = text[len("mp批量订阅"):]
+        text = "\n".join(filter(None, [text, await self._read_attached_text(event)]))
+
+        entries = parse_title_list(text)
+        if not entries:
+            yield event.plain_result("请在命令后换行粘贴片名列表，每行一部，可附带年份，例如:\n/mp批量订阅\n流浪地球 2019\n沙丘,2021")
+            return
+
+        max_titles = int(self.config.get("bulk_max_titles", 50))
+        skipped = len(entries) - max_titles
+        entries = entries[:max_titles]
+        yield event.plain_result(f"⏳ 正在批量订阅 {len(entries)} 部影片，请稍候...")
+
+        report = await self._bulk_subscribe(entries)
+
+        sections = [
+            ("✅ 已订阅", "subscribed"),
+            ("📌 已在订阅中", "exists"),
+            ("❓ 有歧义，请单独订阅", "ambiguous"),
+            ("🔍 未找到", "not_found"),
+            ("❌ 订阅失败", "failed"),
+        ]
+        lines = [f"📋 批量订阅结果（共 {len(entries)} 部）", "━━━━━━━━━━━━━━━━━━━━"]
+        for title, key in sections:
+            if report[key]:
+                lines.append(f"\n{title} ({len(report[key])})：")
+                lines.extend(f"  · {item}" for item in report[key])
+        if skipped > 0:
+            lines.append(f"\n超出单次上限 {max_titles} 部，已忽略 {skipped} 部")
+        yield event.plain_result(self._unavailable_msg(self.api, "\n".join(lines)))
 
     @filter.command("mp当前订阅")
     async def current_subscribes(self, event: AstrMessageEvent):
         '''查看当前订阅列表（仅显示订阅中的）'''
-        subscribes = await self.api.get_subscribes()
+        # 已完成的订阅在流式解析时直接丢弃
+        try:
+            subscribes = await self._command_deadline().run(self.api.get_subscribes(
+                predicate=lambda sub: sub.get('state', '') not in ('已完成', 'completed')
+            ))
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
         if subscribes is None:
-            yield event.plain_result("获取订阅列表失败，请检查 MoviePilot 配置。")
+            yield event.plain_result(self._unavailable_msg(self.api, "获取订阅列表失败，请检查 MoviePilot 配置。"))
             return
 
         if len(subscribes) == 0:
@@ -1034,31 +1212,45 @@ class MyPlugin(Star):
         yield event.plain_result("\n".join(result_lines))
 
     @filter.command("mp下载")
-    async def progress(self, event: AstrMessageEvent):
-        '''查看下载'''
-        progress_data = await self.api.get_download_progress()
+    async def progress(self, event: AstrMessageEvent, action: str = ""):
+        '''查看下载
+
+        参数:
+            action: 可选 watch(持续监控) / stop(停止监控)
+        '''
+        action = action.lower()
+        session = event.unified_msg_origin
+        if action not in ("stop", "停止"):
+            limited_msg = self._check_rate_limit(event)
+            if limited_msg:
+                yield event.plain_result(limited_msg)
+                return
+        if action in ("watch", "监控"):
+            self.download_watcher.subscribe(session)
+            yield event.plain_result("已开始监控下载进度，进度有明显变化或下载完成时会通知本会话，队列清空后自动停止。")
+            return
+        if action in ("stop", "停止"):
+            if self.download_watcher.unsubscribe(session):
+                yield event.plain_result("已停止监控下载进度。")
+            else:
+                yield event.plain_result("本会话没有在监控下载进度。")
+            return
+
+        try:
+            progress_data = await self._command_deadline().run(self.api.get_download_progress())
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
         if progress_data is not None:  # 如果成功获取到数据
             if len(progress_data) == 0:  # 如果没有正在下载的任务
                 yield event.plain_result("当前没有正在下载的任务。")
                 return
 
             # 格式化下载进度信息
-            progress_list = []
-            for task in progress_data:
-                media = task.get('media', {})
-                title = media.get('title', task.get('title', '未知'))
-                season = media.get('season', '')
-                episode = media.get('episode', '')
-                progress = round(task.get('progress', 0), 2)  # 保留两位小数
-
-                # 按照要求格式化：title season episode：progress
-                formatted_info = f"{title} {season} {episode}：{progress}%"
-                progress_list.append(formatted_info)
-
-            result = "\n".join(progress_list)
+            result = "\n".join(format_download_task(task) for task in progress_data)
             yield event.plain_result(result)
         else:
-            yield event.plain_result("获取下载进度失败，请稍后重试。")
+            yield event.plain_result(self._unavailable_msg(self.api, "获取下载进度失败，请稍后重试。"))
 
     @filter.command("emby")
     async def emby_latest(self, event: AstrMessageEvent, media_type: str = "all"):
@@ -1071,6 +1263,11 @@ class MyPlugin(Star):
             yield event.plain_result("Emby 未配置，请先在插件配置中填写 Emby 服务器信息。")
             return
 
+        limited_msg = self._check_rate_limit(event)
+        if limited_msg:
+            yield event.plain_result(limited_msg)
+            return
+
         # 处理类型参数
         type_map = {
             "movie": "movie",
@@ -1087,10 +1284,15 @@ class MyPlugin(Star):
 
         yield event.plain_result(f"正在查询 Emby 最新入库（{type_name.get(media_type, '全部')}）...")
 
-        media_list = await self.emby_api.get_latest_media(media_type)
+        try:
+            media_list, failed = await self._command_deadline().run(self.emby_api.get_latest_media(media_type))
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
 
         if not media_list:
-            yield event.plain_result("暂无入库记录或查询失败。")
+            yield event.plain_result(self._unavailable_msg(self.emby_api.primary, "暂无入库记录或查询失败。")
+                                     + self._emby_failed_note(failed))
             return
 
         # 格式化输出
@@ -1102,10 +1304,10 @@ class MyPlugin(Star):
             date_created = media.get('date_created', '')
 
             year_str = f" ({year})" if year else ""
-            result_lines.append(f"{i}. 《{name}》{year_str} [{m_type}]")
+            result_lines.append(f"{i}. 《{name}》{year_str} [{m_type}]{self._emby_tag(media)}")
             result_lines.append(f"   入库时间: {date_created}")
 
-        yield event.plain_result("\n".join(result_lines))
+        yield event.plain_result("\n".join(result_lines) + self._emby_failed_note(failed))
 
     @filter.command("emby搜索")
     async def emby_search(self, event: AstrMessageEvent, keyword: str):
@@ -1118,12 +1320,22 @@ class MyPlugin(Star):
             yield event.plain_result("请输入搜索关键词，例如: /emby搜索 复仇者联盟")
             return
 
+        limited_msg = self._check_rate_limit(event)
+        if limited_msg:
+            yield event.plain_result(limited_msg)
+            return
+
         yield event.plain_result(f"正在搜索: {keyword}...")
 
-        media_list = await self.emby_api.search_media(keyword)
+        try:
+            media_list, failed = await self._command_deadline().run(self.emby_api.search_media(keyword))
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
 
         if not media_list:
-            yield event.plain_result(f"未找到与 \"{keyword}\" 相关的内容。")
+            yield event.plain_result(self._unavailable_msg(self.emby_api.primary, f"未找到与 \"{keyword}\" 相关的内容。")
+                                     + self._emby_failed_note(failed))
             return
 
         # 格式化输出
@@ -1136,9 +1348,9 @@ class MyPlugin(Star):
 
             year_str = f" ({year})" if year else ""
             original_str = f" / {original_title}" if original_title and original_title != name else ""
-            result_lines.append(f"{i}. 《{name}》{original_str}{year_str} [{m_type}]")
+            result_lines.append(f"{i}. 《{name}》{original_str}{year_str} [{m_type}]{self._emby_tag(media)}")
 
-        yield event.plain_result("\n".join(result_lines))
+        yield event.plain_result("\n".join(result_lines) + self._emby_failed_note(failed))
 
     @filter.command("emby统计")
     async def emby_stats(self, event: AstrMessageEvent):
@@ -1147,24 +1359,40 @@ class MyPlugin(Star):
             yield event.plain_result("Emby 未配置，请先在插件配置中填写 Emby 服务器信息。")
             return
 
-        stats = await self.emby_api.get_library_stats()
+        try:
+            results, failed = await self._command_deadline().run(self.emby_api.get_library_stats())
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
+            return
 
-        if not stats:
-            yield event.plain_result("获取统计信息失败。")
+        results = [(server, stats) for server, stats in results if stats]
+        if not results:
+            yield event.plain_result(self._unavailable_msg(self.emby_api.primary, "获取统计信息失败。")
+                                     + self._emby_failed_note(failed))
             return
 
+        stats = {key: sum(s.get(key, 0) for _, s in results) for key in ('movies', 'series', 'episodes')}
         result = f"""📊 Emby 媒体库统计 📊
 ━━━━━━━━━━━━━━━━━━━━
 🎬 电影: {stats.get('movies', 0)} 部
 📺 电视剧: {stats.get('series', 0)} 部
 🎞️ 剧集: {stats.get('episodes', 0)} 集
 ━━━━━━━━━━━━━━━━━━━━"""
+        if self.emby_api.tagged:
+            # 各服务器分别列出，合计未去除服务器间重复的作品
+            for server, s in results:
+                result += (f"\n[{server.name}] 电影 {s.get('movies', 0)} / 电视剧 {s.get('series', 0)}"
+                           f" / 剧集 {s.get('episodes', 0)}")
 
-        yield event.plain_result(result)
+        yield event.plain_result(result + self._emby_failed_note(failed))
 
     @filter.command("emby推送")
-    async def manual_daily_report(self, event: AstrMessageEvent):
-        '''手动发送一次今日入库日报'''
+    async def manual_daily_report(self, event: AstrMessageEvent, period: str = "日"):
+        '''手动发送一次入库报告
+
+        参数:
+            period: 可选 日(默认) / 周(近 7 天) / 月(近 30 天)
+        '''
         # 鉴权：仅管理员可用
         is_admin = False
         try:
@@ -1194,10 +1422,17 @@ class MyPlugin(Star):
             yield event.plain_result("🚫 仅管理员可执行此操作")
             return
 
-        yield event.plain_result("⏳ 正在触发日报推送...")
+        period = {"日": "day", "day": "day", "周": "week", "week": "week",
+                  "月": "month", "month": "month"}.get(period.strip().lower(), "day")
+        label = {"day": "日报", "week": "周报", "month": "月报"}[period]
+        yield event.plain_result(f"⏳ 正在触发{label}推送...")
 
         # 强制执行推送，并开启手动触发标志
-        await self.send_daily_report(manual_trigger=True, event=event)
+        try:
+            await self._command_deadline().run(
+                self.send_daily_report(manual_trigger=True, event=event, period=period))
+        except DeadlineExceeded:
+            yield event.plain_result(self.TIMEOUT_MSG)
 
     @filter.command("emby推送配置")
     async def config_daily_report(self, event: AstrMessageEvent, action: str = "", value: str = ""):
@@ -1428,6 +1663,64 @@ class MyPlugin(Star):
             logger.error(f"白名单操作失败: {e}")
             yield event.plain_result(f"操作失败: {str(e)}")
 
+    @filter.command("mp状态")
+    async def plugin_status(self, event: AstrMessageEvent):
+        '''查看插件运行状态（缓存等诊断信息）'''
+        if not self._is_admin(event):
+            yield event.plain_result("🚫 仅管理员可执行此操作")
+            return
+
+        lines = ["🩺 插件运行状态", "━━━━━━━━━━━━━━━━━━━━"]
+        lines.append(self._format_cache_stats("搜索缓存", self.api.search_cache.stats()))
+        lines.append(self._format_cache_stats("季列表缓存", self.api.season_cache.stats()))
+        lines.append(f"订阅索引: {len(self.api.sub_index)} 条{'（已过期）' if self.api.sub_index.stale else ''}")
+        for name, client in [("MoviePilot", self.api)] + [(s.label, s) for s in self.emby_api.configured()]:
+            sf = client._singleflight.stats()
+            lines.append(f"{name} 请求合并: 共 {sf['calls']} 次 GET，合并 {sf['shared']} 次，进行中 {sf['inflight']}")
+            cb = client.breaker.stats()
+            state_name = {"closed": "正常", "open": "熔断中", "half_open": "探测中"}.get(cb['state'], cb['state'])
+            cb_line = f"{name} 熔断器: {state_name}，连续失败 {cb['failures']} 次，累计熔断 {cb['open_count']} 次"
+            if cb['state'] == "open":
+                cb_line += f"，{cb['retry_after']} 秒后探测"
+            if cb['last_error']:
+                cb_line += f"，最近错误: {cb['last_error']}"
+            lines.append(cb_line)
+        if self.subscribe_watcher:
+            watcher = self.subscribe_watcher
+            watch_state = "运行中" if watcher.running else "已停止"
+            tracked = len(watcher.snapshot) if watcher.snapshot else 0
+            lines.append(f"订阅监听: {watch_state}，跟踪 {tracked} 个订阅，当前间隔 {watcher.interval} 秒")
+        for server in self.emby_api.servers:
+            if not server.mirror:
+                continue
+            mirror = server.mirror.stats()
+            sync_state = "运行中" if mirror['running'] else "已停止"
+            last_sync = datetime.fromtimestamp(mirror['last_sync']).strftime('%m-%d %H:%M') if mirror['last_sync'] else "从未"
+            lines.append(f"{server.label} 镜像: {mirror['size']} 条，同步{sync_state}，上次同步 {last_sync}"
+                         f"{'' if mirror['fresh'] else '（已过期，使用在线查询）'}")
+            if server.search_index is not None:
+                index = server.search_index
+                lines.append(f"{server.label} 搜索索引: {len(index)} 部{'' if index.ready else '（构建中）'}")
+        for server in self.emby_api.configured():
+            if server.library_index.ready:
+                lines.append(f"{server.label} 入库索引: {len(server.library_index)} 部"
+                             f"{'（已过期）' if server.library_index.stale else ''}")
+        if self.webhook:
+            hook = self.webhook
+            hook_state = f"监听 {hook.port} 端口" if hook.running else "未运行"
+            lines.append(f"Emby webhook: {hook_state}，已收到 {hook.received} 个入库事件，合并为 {hook.batches} 批")
+        if HAS_PILLOW:
+            rs = self.renderer.stats()
+            lines.append(f"卡片渲染: {'进程池' if rs['mode'] == 'process' else '线程池'} {rs['workers']} 个，"
+                         f"排队/执行中 {rs['pending']}/{rs['max_queue']}，已拒绝 {rs['rejected']} 次")
+        if self.rate_limiter.enabled:
+            rl = self.rate_limiter.stats()
+            lines.append(f"命令限流: 活跃令牌桶 {rl['buckets']} 个，已拒绝 {rl['rejected']} 次")
+        if self.download_watcher.running:
+            lines.append(f"下载监控: {len(self.download_watcher.sessions)} 个会话，当前间隔 {self.download_watcher.interval} 秒")
+        lines.append("━━━━━━━━━━━━━━━━━━━━")
+        yield event.plain_result("\n".join(lines))
+
     @filter.command("订阅帮助")
     async def show_help(self, event: AstrMessageEvent):
         '''显示帮助信息'''
@@ -1435,8 +1728,10 @@ class MyPlugin(Star):
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━
 【MoviePilot 功能】
   /mp订阅 [片名]      - 搜索并订阅影片
+  /mp批量订阅 [列表]  - 批量订阅（每行一部，或发送 txt/csv）
   /mp当前订阅         - 查看当前订阅列表
   /mp下载             - 查看下载进度
+  /mp下载 watch       - 持续监控下载进度（stop 停止）
 
 【Emby 功能】
   /emby [类型]     - 查看最新入库
@@ -1446,7 +1741,8 @@ class MyPlugin(Star):
 
 【推送管理】(管理员)
   /emby推送配置    - 查看/修改推送设置
-  /emby推送        - 手动触发一次推送
+  /emby推送 [周期]  - 手动推送（日/周/月，默认日）
+  /mp状态          - 查看缓存等运行状态
 
 【其他】
   /订阅帮助            - 显示此帮助
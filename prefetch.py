@@ -0,0 +1,89 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from astrbot.api import logger
+
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p"
+
+
+def backdrop_url(path: str) -> str:
+    return f"{TMDB_IMAGE_BASE}/w780{path}"
+
+
+def poster_url(path: str) -> str:
+    return f"{TMDB_IMAGE_BASE}/w500{path}"
+
+
+class SelectionPrefetcher:
+    """在用户选择搜索结果的等待期间，预取前 N 个结果的季列表和卡片图片
+
+    用户选定后直接复用预取结果；取消选择、选定其他条目或会话超时时取消未完成的预取。
+    """
+
+    def __init__(self, api, download: Callable[[str], Awaitable[bytes | None]],
+                 top_n: int = 3, concurrency: int = 3):
+        self.api = api
+        self.download = download
+        self.top_n = max(0, int(top_n))
+        self._semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+        self._tasks: dict[tuple, asyncio.Task] = {}
+        self._owners: dict[tuple, int] = {}  # 预取任务属于哪个搜索结果
+
+    def start(self, movies: list):
+        for index, movie in enumerate(movies[:self.top_n]):
+            if movie.get('type') == "电视剧" and movie.get('tmdb_id'):
+                self._spawn(index, ("seasons", str(movie['tmdb_id'])), self.api.list_all_seasons(movie['tmdb_id']))
+            # 卡片优先使用横图，没有横图时才会用竖版海报
+            if movie.get('backdrop_path'):
+                url = backdrop_url(movie['backdrop_path'])
+            elif movie.get('poster_path'):
+                url = poster_url(movie['poster_path'])
+            else:
+                continue
+            self._spawn(index, ("image", url), self.download(url))
+
+    def _spawn(self, index: int, key: tuple, coro: Awaitable):
+        if key in self._tasks:
+            coro.close()
+            return
+
+        async def run():
+            async with self._semaphore:
+                return await coro
+
+        self._tasks[key] = asyncio.create_task(run())
+        self._owners[key] = index
+
+    async def _get(self, key: tuple, fallback: Callable[[], Awaitable]):
+        task = self._tasks.get(key)
+        if task is not None and not task.cancelled():
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                # 预取任务本身被取消时改为直接请求；调用方被取消时继续向上抛出
+                if not task.cancelled():
+                    raise
+            except Exception as e:
+                logger.debug(f"预取失败，改为直接请求: {e}")
+        return await fallback()
+
+    async def seasons(self, movie: dict):
+        """获取季列表，优先使用预取结果"""
+        return await self._get(("seasons", str(movie['tmdb_id'])),
+                               lambda: self.api.list_all_seasons(movie['tmdb_id']))
+
+    async def image(self, url: str) -> bytes | None:
+        """获取图片，优先使用预取结果"""
+        return await self._get(("image", url), lambda: self.download(url))
+
+    def keep_only(self, index: int):
+        """用户已选定 index，取消其他结果的预取"""
+        for key, task in self._tasks.items():
+            if self._owners.get(key) != index:
+                task.cancel()
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._owners.clear()
@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """令牌桶：容量为 capacity，每秒补充 rate 个令牌"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """还需等待多少秒才有一个令牌（调用前先 refill）"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """按用户、群组、全局三级限流
+
+    每级限制为"每分钟次数"，0 表示不限制。三级都有令牌时才会同时扣减，
+    被拒绝的请求不消耗任何令牌。每次检查为 O(1)，闲置的桶按 LRU 淘汰以限制内存。
+    """
+
+    def __init__(self, per_user: float = 0, per_group: float = 0, per_global: float = 0,
+                 max_buckets: int = 10000):
+        self.limits = {"user": float(per_user), "group": float(per_group), "global": float(per_global)}
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[tuple, TokenBucket] = OrderedDict()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return any(limit > 0 for limit in self.limits.values())
+
+    def _bucket(self, scope: str, key: str, now: float) -> TokenBucket | None:
+        limit = self.limits[scope]
+        if limit <= 0:
+            return None
+        bucket_key = (scope, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = TokenBucket(capacity=limit, rate=limit / 60, now=now)
+            self._buckets[bucket_key] = bucket
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket.refill(now)
+        return bucket
+
+    def check(self, user_id: str, group_id: str = "") -> tuple[str, float] | None:
+        """检查并扣减令牌
+
+        Returns:
+            None 表示放行；否则返回 (被限制的级别, 需等待的秒数)
+        """
+        now = time.monotonic()
+        scopes = [("user", user_id), ("global", "")]
+        if group_id:
+            scopes.insert(1, ("group", group_id))
+
+        buckets = []
+        for scope, key in scopes:
+            bucket = self._bucket(scope, key, now)
+            if bucket is None:
+                continue
+            wait = bucket.wait_time()
+            if wait > 0:
+                self.rejected += 1
+                return scope, wait
+            buckets.append(bucket)
+
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return None
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "rejected": self.rejected}
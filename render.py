@@ -0,0 +1,369 @@
+import asyncio
+import concurrent.futures
+import io
+import multiprocessing
+import threading
+from datetime import datetime
+from typing import Callable, TypeVar
+
+from astrbot.api import logger
+
+from .fonts import configure_fonts, get_fonts
+
+# 尝试导入 Pillow
+try:
+    from PIL import Image, ImageDraw
+    HAS_PILLOW = True
+except ImportError:
+    HAS_PILLOW = False
+    logger.warning("Pillow 未安装，推送将使用纯文本模式。可通过 pip install Pillow 安装")
+
+T = TypeVar("T")
+
+
+class RenderBusy(Exception):
+    """渲染队列已满"""
+
+
+class RenderExecutor:
+    """卡片渲染专用的执行器，Pillow 的解码、缩放、绘制和 PNG 压缩都不在事件循环上执行
+
+    - mode 为 "thread" 时使用线程池；为 "process" 时使用进程池（spawn 启动，各进程自行加载字体），
+      不受 GIL 影响，适合渲染量大的场景
+    - 排队和执行中的任务总数超过 max_queue 时直接抛出 RenderBusy，由调用方回退到文本，
+      不会在高峰期无限堆积
+    - 调用方取消等待时，已开始执行的任务仍会执行完毕并计入队列，直到真正结束
+    """
+
+    def __init__(self, config: dict):
+        self.mode = "process" if str(config.get('card_render_mode', 'thread')).lower() == "process" else "thread"
+        self.workers = max(1, int(config.get('card_render_workers', 2)))
+        self.max_queue = max(self.workers, int(config.get('card_render_queue', 8)))
+        self.font_path = config.get('card_font_path', '')
+        self._pool: concurrent.futures.Executor | None = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def _new_pool(self) -> concurrent.futures.Executor:
+        if self.mode == "process":
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_fonts,
+                initargs=(self.font_path,),
+            )
+        return concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="card-render")
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """在渲染池中执行 fn(*args)，fn 须为模块级函数（进程池需要序列化）"""
+        with self._lock:
+            if self.pending >= self.max_queue:
+                self.rejected += 1
+                raise RenderBusy(f"渲染队列已满（{self.max_queue}）")
+            self.pending += 1
+            if self._pool is None:
+                self._pool = self._new_pool()
+            pool = self._pool
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except concurrent.futures.BrokenExecutor:
+            # 工作进程异常退出后进程池不可再用，下次渲染时重建
+            logger.error("卡片渲染进程池已损坏，将重新创建")
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "workers": self.workers, "pending": self.pending,
+                "max_queue": self.max_queue, "rejected": self.rejected}
+
+
+def compose_subscribe_card(media_info: dict, backdrop_data: bytes | None = None, poster_data: bytes | None = None,
+                           season_info: str = "") -> bytes | None:
+    """合成订阅成功卡片 - 上方横图海报，下方文字信息
+
+    backdrop_data / poster_data 为已下载的横图和竖版海报，优先使用横图；season_info 为剧集的季订阅说明
+    """
+    if not HAS_PILLOW:
+        return None
+
+    # 配置参数
+    padding = 20
+    font_size = 20
+    title_font_size = 24
+    line_height = 32
+
+    # 纯白背景，黑色文字
+    bg_color = (255, 255, 255)
+    text_color = (50, 50, 50)
+    muted_color = (120, 120, 120)
+
+    # 字体由进程内共享的注册表提供（优先微软雅黑，黑体用于简介）
+    fonts = get_fonts()
+    font = fonts.get("regular", font_size)
+    title_font = fonts.get("regular", title_font_size)
+    bold_font = fonts.get("bold", font_size)
+
+    # 获取媒体信息
+    title = media_info.get('title', '未知')
+    year = media_info.get('year', '')
+    media_type = media_info.get('type', '电影')
+    vote_average = media_info.get('vote_average', 0)
+    overview = media_info.get('overview', '')
+
+    # 图片宽度
+    img_width = 500
+    poster_height = 280
+
+    # 优先使用横图（backdrop），没有时用竖版海报裁剪
+    poster_img = None
+    if backdrop_data:
+        try:
+            poster_img = Image.open(io.BytesIO(backdrop_data))
+            # 按宽度缩放，保持比例
+            ratio = img_width / poster_img.width
+            new_height = int(poster_img.height * ratio)
+            poster_img = poster_img.resize((img_width, new_height), Image.Resampling.LANCZOS)
+            poster_height = new_height
+        except Exception as e:
+            logger.warning(f"解析横图失败: {e}")
+            poster_img = None
+
+    if not poster_img and poster_data:
+        try:
+            poster_img = Image.open(io.BytesIO(poster_data))
+            # 缩放到合适宽度
+            ratio = img_width / poster_img.width
+            new_height = int(poster_img.height * ratio)
+            poster_img = poster_img.resize((img_width, new_height), Image.Resampling.LANCZOS)
+            # 如果太高则裁剪
+            if new_height > 400:
+                poster_img = poster_img.crop((0, 0, img_width, 400))
+                poster_height = 400
+            else:
+                poster_height = new_height
+        except Exception as e:
+            logger.warning(f"解析海报失败: {e}")
+            poster_img = None
+
+    # 构建文本内容
+    # 标题行
+    title_line = f"{title}"
+    if year:
+        title_line += f" ({year})"
+    title_line += " 已完成订阅"
+
+    # 信息行
+    info_parts = []
+    if vote_average and vote_average > 0:
+        info_parts.append(f"评分：{vote_average}")
+    info_parts.append(f"类型：{media_type}")
+    if season_info:
+        info_parts.append(season_info)
+    info_line = "  ".join(info_parts)
+
+    # 简介处理（自动换行）
+    overview_lines = []
+    if overview:
+        chars_per_line = 22  # 减少每行字数，留出左右间距
+        overview_text = overview[:200]
+        for i in range(0, len(overview_text), chars_per_line):
+            overview_lines.append(overview_text[i:i+chars_per_line])
+        if len(overview) > 200 and overview_lines:
+            overview_lines[-1] = overview_lines[-1][:chars_per_line-3] + "..."
+
+    # 时间戳
+    timestamp = datetime.now().strftime("%H:%M")
+
+    # 计算文字区域高度
+    text_area_height = padding + line_height  # 标题
+    text_area_height += line_height  # 信息行
+    if overview_lines:
+        text_area_height += padding * 2 + line_height * len(overview_lines)  # 简介上下间距
+    text_area_height += padding + line_height  # 底部时间戳
+
+    # 总高度
+    img_height = poster_height + text_area_height if poster_img else text_area_height + 50
+
+    # 创建图片
+    img = Image.new('RGB', (img_width, img_height), bg_color)
+    draw = ImageDraw.Draw(img)
+
+    current_y = 0
+
+    # 粘贴海报（铺满上方）
+    if poster_img:
+        img.paste(poster_img, (0, 0))
+        current_y = poster_height + padding
+    else:
+        current_y = padding
+
+    # 渲染标题
+    draw.text((padding, current_y), title_line, font=title_font, fill=text_color)
+    current_y += line_height + 5
+
+    # 渲染信息行
+    draw.text((padding, current_y), info_line, font=font, fill=muted_color)
+    current_y += line_height
+
+    # 渲染简介（四周有间距，使用黑体）
+    if overview_lines:
+        current_y += padding  # 上间距
+        draw.text((padding + 10, current_y), "简介：", font=bold_font, fill=text_color)
+        current_y += line_height
+        for line in overview_lines:
+            draw.text((padding + 10, current_y), line, font=bold_font, fill=muted_color)
+            current_y += line_height - 2
+        current_y += padding  # 下间距
+
+    # 右下角时间戳
+    timestamp_text = timestamp
+    # 计算时间戳位置（右下角）
+    try:
+        ts_bbox = draw.textbbox((0, 0), timestamp_text, font=font)
+        ts_width = ts_bbox[2] - ts_bbox[0]
+    except:
+        ts_width = len(timestamp_text) * font_size // 2
+    draw.text((img_width - padding - ts_width, img_height - padding - line_height + 5),
+              timestamp_text, font=font, fill=muted_color)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def compose_daily_report_card(stats: dict, items: list, date_str: str, free_space: str = "",
+                              title: str = "Emby 每日入库报告", trend: str = "", note: str = "") -> bytes | None:
+    """合成每日入库日报卡片 - 纯白背景，微软雅黑字体；周报、月报传入 title 和每日趋势 trend
+
+    note 为底部附注（如未计入的服务器），不参与入库条目的分类
+    """
+    if not HAS_PILLOW:
+        return None
+
+    # 配置参数
+    padding = 25
+    line_height = 32
+    font_size = 20
+    title_font_size = 24
+    small_font_size = 18
+
+    # 纯白背景，黑色文字
+    bg_color = (255, 255, 255)
+    text_color = (50, 50, 50)
+    muted_color = (120, 120, 120)
+
+    # 字体由进程内共享的注册表提供（优先微软雅黑）
+    fonts = get_fonts()
+    font = fonts.get("regular", font_size)
+    title_font = fonts.get("regular", title_font_size)
+    small_font = fonts.get("regular", small_font_size)
+    bold_font = fonts.get("bold", font_size)
+
+    # 分类整理入库项目
+    movies = []
+    series = []
+    for item_str in items:
+        if item_str.startswith("[电影]"):
+            movies.append(item_str.replace("[电影] ", ""))
+        elif item_str.startswith("[剧集]"):
+            series.append(item_str.replace("[剧集] ", ""))
+
+    # 时间戳
+    timestamp = datetime.now().strftime("%H:%M")
+
+    # 计算图片高度
+    img_width = 500
+
+    # 标题区域
+    header_height = line_height + 10
+    # 统计区域
+    stats_height = line_height * (3 if trend else 2) + 20
+    # 电影区域
+    movies_height = (len(movies[:8]) * line_height + line_height + 20) if movies else 0
+    # 剧集区域
+    series_height = (len(series[:8]) * line_height + line_height + 20) if series else 0
+    # 底部区域（附注、时间戳）
+    footer_height = line_height + padding + (line_height if note else 0)
+
+    img_height = padding + header_height + stats_height + movies_height + series_height + footer_height + padding
+
+    # 创建图片
+    img = Image.new('RGB', (img_width, img_height), bg_color)
+    draw = ImageDraw.Draw(img)
+
+    current_y = padding
+
+    # 1. 标题行
+    draw.text((padding, current_y), f"{title} | {date_str}", font=title_font, fill=text_color)
+    current_y += header_height + 10
+
+    # 2. 统计区域
+    movie_count = stats.get("Movie", 0)
+    series_count = stats.get("Series", 0)
+
+    draw.text((padding, current_y), f"新增电影: {movie_count} 部", font=font, fill=text_color)
+    current_y += line_height
+    draw.text((padding, current_y), f"新增剧集: {series_count} 部", font=font, fill=text_color)
+    current_y += line_height
+    if trend:
+        draw.text((padding, current_y), f"每日趋势: {trend}", font=font, fill=muted_color)
+        current_y += line_height
+    current_y += padding
+
+    # 3. 电影列表
+    if movies:
+        draw.text((padding, current_y), "电影:", font=bold_font, fill=text_color)
+        current_y += line_height
+        for movie in movies[:8]:
+            display_name = movie[:22] + "..." if len(movie) > 22 else movie
+            draw.text((padding + 10, current_y), f"· {display_name}", font=small_font, fill=muted_color)
+            current_y += line_height
+        current_y += 10
+
+    # 4. 剧集列表
+    if series:
+        draw.text((padding, current_y), "剧集:", font=bold_font, fill=text_color)
+        current_y += line_height
+        for show in series[:8]:
+            display_name = show[:22] + "..." if len(show) > 22 else show
+            draw.text((padding + 10, current_y), f"· {display_name}", font=small_font, fill=muted_color)
+            current_y += line_height
+
+    # 5. 底部附注
+    if note:
+        display_note = note[:26] + "..." if len(note) > 26 else note
+        draw.text((padding, img_height - padding - line_height * 2 + 5), display_note,
+                  font=small_font, fill=muted_color)
+
+    # 6. 右下角时间戳
+    try:
+        ts_bbox = draw.textbbox((0, 0), timestamp, font=font)
+        ts_width = ts_bbox[2] - ts_bbox[0]
+    except:
+        ts_width = len(timestamp) * font_size // 2
+    draw.text((img_width - padding - ts_width, img_height - padding - line_height + 5),
+              timestamp, font=font, fill=muted_color)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,106 @@
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+from astrbot.api import logger
+
+from .resilience import CircuitOpenError
+
+_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING,
+           "ERROR": logging.ERROR, "OFF": logging.CRITICAL + 10}
+
+
+def parse_log_rules(rules: str) -> list[tuple[str, int, float]]:
+    """解析按接口的日志规则，格式: "路径前缀=级别[@采样率]"，多条用英文逗号分隔
+
+    例如 "/api/v1/download/=DEBUG, /Items=INFO@0.1"
+    """
+    parsed = []
+    for rule in (rules or "").split(","):
+        if "=" not in rule:
+            continue
+        prefix, _, spec = rule.partition("=")
+        level_name, _, rate = spec.partition("@")
+        level = _LEVELS.get(level_name.strip().upper())
+        if level is None:
+            logger.warning(f"忽略无效的请求日志规则: {rule.strip()}")
+            continue
+        try:
+            sample = min(1.0, max(0.0, float(rate))) if rate.strip() else 1.0
+        except ValueError:
+            sample = 1.0
+        parsed.append((prefix.strip(), level, sample))
+    # 最长前缀优先
+    return sorted(parsed, key=lambda r: len(r[0]), reverse=True)
+
+
+class _Record:
+    __slots__ = ("response",)
+
+    def __init__(self):
+        self.response: httpx.Response | None = None
+
+
+class RequestLogger:
+    """HTTP 层的请求日志，每个请求只输出一行耗时记录
+
+    - 按接口路径前缀配置日志级别和采样率，高频接口可降级或抽样
+    - 先判断级别和采样再格式化，被过滤的记录不产生任何格式化开销
+    - 4xx/5xx 和异常始终以 WARNING 输出，不参与采样
+    """
+
+    def __init__(self, backend: str, config: dict):
+        self.backend = backend
+        self.default_level = _LEVELS.get(str(config.get('http_log_level', 'INFO')).upper(), logging.INFO)
+        self.rules = parse_log_rules(config.get('http_log_rules', ''))
+
+    def _rule_for(self, path: str) -> tuple[int, float]:
+        for prefix, level, sample in self.rules:
+            if path.startswith(prefix):
+                return level, sample
+        return self.default_level, 1.0
+
+    def log(self, method: str, url: str, status: int | None, nbytes: int, elapsed_ms: float,
+            error: BaseException | None = None):
+        path = urlsplit(url).path
+        if error is not None or status is None or status >= 400:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("[%s] %s %s -> %s %dB %.0fms%s", self.backend, method, path,
+                               status if status is not None else "ERR", nbytes, elapsed_ms,
+                               f" {type(error).__name__}: {error}" if error is not None else "")
+            return
+
+        level, sample = self._rule_for(path)
+        if not logger.isEnabledFor(level):
+            return
+        if sample < 1.0 and random.random() >= sample:
+            return
+        logger.log(level, "[%s] %s %s -> %d %dB %.0fms", self.backend, method, path, status, nbytes, elapsed_ms)
+
+    @asynccontextmanager
+    async def track(self, method: str, url: str) -> AsyncIterator[_Record]:
+        """记录一次请求的耗时：在块内把响应赋给 record.response，退出时输出一行日志
+
+        流式响应在块内读完后退出，记录的字节数即为实际下载量。熔断导致未发出的请求不记录。
+        """
+        record = _Record()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield record
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            r = record.response
+            if r is not None or error is not None:
+                self.log(method, url, r.status_code if r is not None else None,
+                         r.num_bytes_downloaded if r is not None else 0,
+                         (time.perf_counter() - start) * 1000,
+                         error if r is None else None)
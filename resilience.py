@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+import httpx
+
+from .deadline import time_left, timeout_clamped
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时快速失败"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} 暂时不可用，约 {int(retry_after) + 1} 秒后重试")
+
+
+class CircuitBreaker:
+    """按后端划分的熔断器
+
+    - closed: 正常放行，连续失败达到阈值后打开
+    - open: 直接抛出 CircuitOpenError，不再等待超时
+    - half_open: 冷却结束后只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = float(recovery_timeout)
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.last_error = ""
+        self._probing = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and self.retry_after() > 0
+
+    def before_call(self):
+        """请求前检查，熔断中抛出 CircuitOpenError"""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.name, self.retry_after())
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError(self.name, self.recovery_timeout)
+            self._probing = True
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def record_failure(self, error: str = ""):
+        self._probing = False
+        self.failures += 1
+        self.last_error = error
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.open_count += 1
+
+    def release(self):
+        """请求被取消等未得出结论时释放探测名额"""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "open_count": self.open_count,
+            "retry_after": round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+            "last_error": self.last_error,
+        }
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """带完全抖动的指数退避：在 [0, min(cap, base * 2^attempt)] 中随机取值"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def resilient_call(
+        send: Callable[[], Awaitable[httpx.Response]],
+        breaker: CircuitBreaker,
+        retries: int = 0,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+) -> httpx.Response:
+    """经熔断器发送请求，网络错误和 5xx 按退避重试 retries 次
+
+    只有幂等请求（GET）应传入 retries > 0。4xx 视为后端正常响应，不计入失败。
+    命令剩余预算不足以再退避一次时不再重试；超时被收紧到命令剩余预算时，
+    超时是命令预算用完所致，直接抛出且不计入后端失败。
+    """
+    breaker.before_call()
+    attempt = 0
+    try:
+        while True:
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            remaining = time_left()
+            last_attempt = attempt >= retries or (remaining is not None and delay >= remaining)
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                if isinstance(e, httpx.TimeoutException) and timeout_clamped():
+                    raise
+                if last_attempt:
+                    breaker.record_failure(f"{type(e).__name__}: {e}")
+                    raise
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                    return response
+                if last_attempt:
+                    breaker.record_failure(f"HTTP {response.status_code}")
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+    finally:
+        breaker.release()
+
+
+@asynccontextmanager
+async def resilient_stream(client: httpx.AsyncClient, method: str, url: str,
+                           breaker: CircuitBreaker, **kwargs) -> AsyncIterator[httpx.Response]:
+    """经熔断器发起流式请求；流式响应读到一半无法安全重放，因此不重试
+
+    与 resilient_call 相同，命令预算用完导致的超时不计入后端失败
+    """
+    breaker.before_call()
+    try:
+        async with client.stream(method, url, **kwargs) as response:
+            if response.status_code >= 500:
+                breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                breaker.record_success()
+            yield response
+    except httpx.TransportError as e:
+        if not (isinstance(e, httpx.TimeoutException) and timeout_clamped()):
+            breaker.record_failure(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        breaker.release()
@@ -0,0 +1,218 @@
+import asyncio
+import bisect
+import json
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+from astrbot.api import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    id TEXT PRIMARY KEY,
+    day TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    label TEXT,
+    season INTEGER,
+    ranges TEXT,
+    count INTEGER NOT NULL DEFAULT 0,
+    last_created TEXT,
+    PRIMARY KEY (day, kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_seen_day ON seen (day);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+_FRACTION = re.compile(r"(\.\d{6})\d+")
+_SPARKS = "▁▂▃▄▅▆▇█"
+
+
+def add_range(ranges: list[list[int]], start: int, end: int):
+    """把 [start, end] 并入有序且互不相邻的区间列表 [[起, 止], ...]"""
+    i = bisect.bisect_left(ranges, [start, start])
+    if i > 0 and ranges[i - 1][1] >= start - 1:
+        i -= 1
+        start = ranges[i][0]
+        end = max(end, ranges[i][1])
+    j = i
+    while j < len(ranges) and ranges[j][0] <= end + 1:
+        end = max(end, ranges[j][1])
+        j += 1
+    ranges[i:j] = [[start, end]]
+
+
+def add_episode(ranges: list[list[int]], ep: int):
+    """把集号并入区间列表"""
+    add_range(ranges, ep, ep)
+
+
+def format_episode_ranges(ranges: list[list[int]]) -> str:
+    """[[1, 3], [5, 5]] -> 'E1-E3, E5'"""
+    return ", ".join(f"E{start}" if start == end else f"E{start}-E{end}" for start, end in ranges)
+
+
+def sparkline(values: list[int]) -> str:
+    """用方块字符画出数值趋势，如 [0, 3, 8] -> '▁▃█'"""
+    top = max(values, default=0)
+    if top <= 0:
+        return _SPARKS[0] * len(values)
+    return "".join(_SPARKS[min(len(_SPARKS) - 1, v * (len(_SPARKS) - 1) // top)] for v in values)
+
+
+def local_day(date_created: str) -> str:
+    """Emby 的 UTC 入库时间转为本地日期 YYYY-MM-DD，无法解析时记为今天"""
+    try:
+        dt = datetime.fromisoformat(_FRACTION.sub(r"\1", date_created).replace("Z", "+00:00"))
+        return (dt.astimezone() if dt.tzinfo else dt).date().isoformat()
+    except (TypeError, ValueError):
+        return date.today().isoformat()
+
+
+class IngestRollup:
+    """按天预聚合的入库汇总（SQLite）
+
+    - 每个条目按 ID 只计入一次，写入时即合并到入库日期的桶中：电影、剧集各占一行，
+      单集按 剧集+季 占一行并保存合并后的集数区间
+    - 周报、月报只需合并窗口内的日桶，不必重新查询 Emby 整个时间段
+    - 超过保留天数的桶定期清理
+    - 水位线记录上次成功补齐汇总的时间，按需补齐时从这里续查
+    """
+
+    KINDS = ("Movie", "Series", "Episode")
+
+    def __init__(self, db_path: str, retention_days: int = 400):
+        self.retention_days = max(31, int(retention_days))
+        self._lock = threading.Lock()
+        self._pruned_on: str | None = None
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ---------- 写入 ----------
+
+    def record(self, items: list[dict]) -> int:
+        """把条目计入对应日期的桶，已计入过的条目跳过，返回新计入的条目数"""
+        today = date.today()
+        cutoff = (today - timedelta(days=self.retention_days)).isoformat()
+        added = 0
+        with self._lock:
+            conn = self._conn
+            for item in items:
+                item_id, kind = item.get('Id'), item.get('Type')
+                if not item_id or kind not in self.KINDS:
+                    continue
+                created = item.get('DateCreated') or ""
+                day = local_day(created) if created else today.isoformat()
+                if day < cutoff:
+                    continue
+                if conn.execute("INSERT OR IGNORE INTO seen (id, day) VALUES (?, ?)", (item_id, day)).rowcount == 0:
+                    continue
+                added += 1
+                if kind == "Episode":
+                    self._record_episode(conn, day, item, created)
+                else:
+                    name, year = item.get('Name', '未知'), item.get('ProductionYear', '')
+                    conn.execute(
+                        "INSERT OR IGNORE INTO buckets (day, kind, key, label, count, last_created) VALUES (?, ?, ?, ?, 1, ?)",
+                        (day, kind, item_id, f"{name} ({year})" if year else name, created),
+                    )
+            if self._pruned_on != today.isoformat():
+                conn.execute("DELETE FROM buckets WHERE day < ?", (cutoff,))
+                conn.execute("DELETE FROM seen WHERE day < ?", (cutoff,))
+                self._pruned_on = today.isoformat()
+            conn.commit()
+        return added
+
+    @staticmethod
+    def _record_episode(conn: sqlite3.Connection, day: str, item: dict, created: str):
+        series_name = item.get('SeriesName', '未知剧集')
+        season = item.get('ParentIndexNumber', 0) or 0
+        key = f"{item.get('SeriesId', series_name)}_S{season}"
+        row = conn.execute("SELECT ranges, count, last_created FROM buckets WHERE day = ? AND kind = 'Episode' AND key = ?",
+                           (day, key)).fetchone()
+        ranges = json.loads(row[0]) if row and row[0] else []
+        if item.get('IndexNumber'):
+            add_episode(ranges, item['IndexNumber'])
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (day, kind, key, label, season, ranges, count, last_created) "
+            "VALUES (?, 'Episode', ?, ?, ?, ?, ?, ?)",
+            (day, key, series_name, season, json.dumps(ranges), (row[1] if row else 0) + 1,
+             max(created, row[2] or "") if row else created),
+        )
+
+    async def record_async(self, items: list[dict]) -> int:
+        try:
+            return await asyncio.to_thread(self.record, items)
+        except Exception as e:
+            logger.warning(f"写入入库汇总失败: {e}")
+            return 0
+
+    def watermark(self) -> str | None:
+        """上次成功补齐汇总时的 UTC 时间字符串，从未补齐过时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('watermark', ?)", (value,))
+            self._conn.commit()
+
+    # ---------- 查询 ----------
+
+    def summary(self, start_day: str, end_day: str) -> dict:
+        """合并 [start_day, end_day] 内的日桶
+
+        Returns:
+            与 EmbyApi.get_today_additions_stats 相同的 {"stats", "items"}，另含
+            "trend": [(日期, {"Movie", "Series", "Episode"})]，窗口内每天一项
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, kind, key, label, season, ranges, count, last_created FROM buckets "
+                "WHERE day BETWEEN ? AND ? ORDER BY last_created DESC",
+                (start_day, end_day),
+            ).fetchall()
+
+        stats = {"Movie": 0, "Series": 0, "Episode": 0, "Total": 0}
+        per_day: dict[str, dict[str, int]] = {}
+        labels = {"Movie": [], "Series": []}
+        episodes: dict[str, dict] = {}
+        for day, kind, key, label, season, ranges, count, _ in rows:
+            stats[kind] += count
+            stats["Total"] += count
+            per_day.setdefault(day, {"Movie": 0, "Series": 0, "Episode": 0})[kind] += count
+            if kind != "Episode":
+                labels[kind].append(label)
+                continue
+            # 同一季在多天的集数区间合并，行已按最近入库倒序，先出现的剧集排在前面
+            merged = episodes.setdefault(key, {"name": label, "season": season, "ranges": []})
+            for start, end in json.loads(ranges or "[]"):
+                add_range(merged["ranges"], start, end)
+
+        items = [f"[电影] {label}" for label in labels["Movie"]]
+        items += [f"[剧集] {label}" for label in labels["Series"]]
+        for info in episodes.values():
+            if info["ranges"]:
+                season_str = f"S{info['season']}" if info['season'] else ""
+                items.append(f"[剧集] {info['name']} {season_str} {format_episode_ranges(info['ranges'])}")
+            else:
+                items.append(f"[剧集] {info['name']}")
+
+        trend = []
+        day = date.fromisoformat(start_day)
+        while day.isoformat() <= end_day:
+            trend.append((day.isoformat(), per_day.get(day.isoformat(), {"Movie": 0, "Series": 0, "Episode": 0})))
+            day += timedelta(days=1)
+        return {"stats": stats, "items": items, "trend": trend}
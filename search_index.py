@@ -0,0 +1,223 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+from astrbot.api import logger
+
+try:
+    from pypinyin import Style, lazy_pinyin
+    HAS_PYPINYIN = True
+except ImportError:
+    HAS_PYPINYIN = False
+    logger.info("pypinyin 未安装，Emby 本地搜索不支持拼音。可通过 pip install pypinyin 安装")
+
+_STRIP = re.compile(r"[\W_]+", re.UNICODE)
+_HAS_CJK = re.compile(r"[一-鿿]")
+
+
+def normalize(text: str) -> str:
+    """全角转半角、忽略大小写，去掉空白和标点"""
+    return _STRIP.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def gram_size(text: str) -> int:
+    """文本使用的 n-gram 长度，见 grams"""
+    return 3 if text.isascii() else 2
+
+
+def grams(text: str) -> set[str]:
+    """字符 n-gram：含非 ASCII 字符的文本用二元组，纯 ASCII 文本字母表小，用三元组以缩短倒排表
+
+    短于 n 的文本整体作为一个 gram
+    """
+    n = gram_size(text)
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def title_keys(name: str, original_title: str = "") -> list[tuple[str, bool]]:
+    """一个条目可被搜索到的所有形式：片名、原名，以及中文片名的拼音全拼和首字母
+
+    返回 [(检索形式, 是否参与模糊匹配)]，拼音形式只做完全/前缀/包含匹配，避免大量误命中
+    """
+    keys = []
+    seen = set()
+    for title in (name, original_title):
+        key = normalize(title)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        keys.append((key, True))
+        if HAS_PYPINYIN and _HAS_CJK.search(key):
+            for variant in ("".join(lazy_pinyin(key)),
+                            "".join(lazy_pinyin(key, style=Style.FIRST_LETTER))):
+                if variant not in seen:
+                    seen.add(variant)
+                    keys.append((variant, False))
+    return keys
+
+
+class SearchIndex:
+    """Emby 片名的内存搜索索引
+
+    - 片名、原名、拼音全拼和拼音首字母都拆成字符 n-gram，片名和拼音分别建立倒排表
+    - 查询时先按共有 gram 数量粗筛，再对候选逐个精排：完全匹配 > 前缀 > 包含 > 相似度，
+      片名中少量错别字也能靠相似度命中
+    - 比一个 gram 还短的查询（如 "a"、"复"）无法走倒排表：前缀匹配在有序的检索形式列表上二分查找，
+      结果不足时再逐条做包含匹配
+    - 支持按条目增量更新和删除；全量重建时先在新结构中建好再整体替换，查询不会看到半成品
+    """
+
+    MIN_SCORE = 0.5
+    MIN_SHARED = 0.5  # 候选至少要包含查询中这一比例的 gram
+    MAX_CANDIDATES = 100
+
+    def __init__(self):
+        # (条目ID -> (条目, 检索形式), {是否片名: gram -> 条目ID 集合}, 有序的 [(检索形式, 条目ID)])
+        self._state: tuple[dict, dict, list] = ({}, self._new_postings(), [])
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    @staticmethod
+    def _new_postings() -> dict[bool, defaultdict]:
+        return {True: defaultdict(set), False: defaultdict(set)}
+
+    @staticmethod
+    def _entry(item: dict) -> tuple[dict, list[tuple[str, bool]]]:
+        return item, title_keys(item.get('Name', ''), item.get('OriginalTitle', ''))
+
+    @staticmethod
+    def _post(postings: dict, doc_id: str, keys: list[tuple[str, bool]]):
+        for key, fuzzy in keys:
+            for gram in grams(key):
+                postings[fuzzy][gram].add(doc_id)
+
+    def rebuild(self, items: list[dict]):
+        """全量重建，可以在线程中执行"""
+        docs, postings = {}, self._new_postings()
+        for item in items:
+            doc_id = item.get('Id')
+            if not doc_id:
+                continue
+            docs[doc_id] = self._entry(item)
+            self._post(postings, doc_id, docs[doc_id][1])
+        keys = sorted((key, doc_id) for doc_id, (_, doc_keys) in docs.items() for key, _ in doc_keys)
+        self._state = (docs, postings, keys)
+        self.ready = True
+
+    def update(self, items: list[dict] = (), removed_ids: list[str] = ()):
+        """增量更新：新增或替换 items，删除 removed_ids"""
+        docs, postings, keys = self._state
+        for doc_id in list(removed_ids) + [item.get('Id') for item in items]:
+            old = docs.pop(doc_id, None)
+            if old is None:
+                continue
+            for key, fuzzy in old[1]:
+                i = bisect.bisect_left(keys, (key, doc_id))
+                if i < len(keys) and keys[i] == (key, doc_id):
+                    del keys[i]
+                for gram in grams(key):
+                    ids = postings[fuzzy].get(gram)
+                    if ids is not None:
+                        ids.discard(doc_id)
+                        if not ids:
+                            del postings[fuzzy][gram]
+        for item in items:
+            doc_id = item.get('Id')
+            if doc_id:
+                docs[doc_id] = self._entry(item)
+                self._post(postings, doc_id, docs[doc_id][1])
+                for key, _ in docs[doc_id][1]:
+                    bisect.insort(keys, (key, doc_id))
+
+    @staticmethod
+    def _score(query: str, query_grams: set[str], keys: list[tuple[str, bool]]) -> float:
+        best = 0.0
+        for key, fuzzy in keys:
+            if key == query:
+                return 3.0
+            if key.startswith(query):
+                score = 2.0 + len(query) / len(key)
+            elif query in key:
+                score = 1.0 + len(query) / len(key)
+            elif fuzzy:
+                key_grams = grams(key)
+                score = 2 * len(query_grams & key_grams) / (len(query_grams) + len(key_grams))
+            else:
+                continue
+            best = max(best, score)
+        return best
+
+    def _rank(self, doc_ids, query: str, query_grams: set[str], types) -> list[tuple]:
+        docs = self._state[0]
+        ranked = []
+        for doc_id in doc_ids:
+            item, keys = docs[doc_id]
+            if types and item.get('Type') not in types:
+                continue
+            score = self._score(query, query_grams, keys)
+            if score >= self.MIN_SCORE:
+                ranked.append((score, item.get('DateCreated', ''), item))
+        return ranked
+
+    def _search_short(self, query: str, query_grams: set[str], limit: int, types) -> list[dict]:
+        """比一个 gram 还短的查询：先二分查找前缀匹配，不足 limit 条时再逐条找包含匹配"""
+        keys = self._state[2]
+        matched = set()
+        i = bisect.bisect_left(keys, (query,))
+        while i < len(keys) and keys[i][0].startswith(query):
+            matched.add(keys[i][1])
+            i += 1
+        ranked = self._rank(matched, query, query_grams, types)
+        if len(ranked) < limit:
+            contains = {doc_id for key, doc_id in keys if query in key} - matched
+            ranked += self._rank(contains, query, query_grams, types)
+        ranked.sort(key=lambda r: (r[0], r[1]), reverse=True)
+        return [item for _, _, item in ranked[:limit]]
+
+    def search(self, query: str, limit: int = 10, types: tuple[str, ...] | None = None) -> list[dict]:
+        query = normalize(query)
+        if not query:
+            return []
+        docs, postings, keys = self._state
+        query_grams = grams(query)
+
+        if len(query) < gram_size(query):
+            return self._search_short(query, query_grams, limit, types)
+
+        # 粗筛第一步：片名或拼音包含查询全部 gram 的条目，完全/前缀/包含匹配都在其中，集合求交很快
+        matched = set()
+        for table in postings.values():
+            by_size = sorted((table.get(gram) or set() for gram in query_grams), key=len)
+            if by_size[0]:
+                matched |= set.intersection(*by_size)
+        ranked = self._rank(matched, query, query_grams, types)
+
+        # 第二步：结果不足时按共有 gram 数量找相似的片名（错别字、漏字），拼音不参与
+        if len(ranked) < limit:
+            by_size = sorted((postings[True].get(gram) or set() for gram in query_grams), key=len)
+            min_shared = math.ceil(len(by_size) * self.MIN_SHARED)
+            hits: dict[str, int] = defaultdict(int)
+            # 满足 min_shared 的条目必然出现在最稀有的 len - min_shared + 1 个倒排表中，其余只给已有候选计数
+            for i, ids in enumerate(by_size):
+                if i <= len(by_size) - min_shared:
+                    for doc_id in ids:
+                        hits[doc_id] += 1
+                else:
+                    for doc_id in hits:
+                        if doc_id in ids:
+                            hits[doc_id] += 1
+            # 包含全部 gram 的条目第一步已处理过
+            fuzzy = heapq.nlargest(self.MAX_CANDIDATES,
+                                   (d for d, n in hits.items() if min_shared <= n < len(by_size) and d not in matched),
+                                   key=hits.__getitem__)
+            ranked += self._rank(fuzzy, query, query_grams, types)
+
+        ranked.sort(key=lambda r: (r[0], r[1]), reverse=True)
+        return [item for _, _, item in ranked[:limit]]
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable
+
+from astrbot.api import logger
+
+COMPLETED_STATES = ('已完成', 'completed')
+
+
+class SubscribeWatcher:
+    """订阅变化监听器
+
+    定期拉取 MoviePilot 订阅列表，与上次的快照比对，推送订阅完成和新增集数通知。
+    - 快照只保存每个订阅的 (state, lack_episode, name, season)，按订阅 ID 索引
+    - 有变化时缩短轮询间隔，无变化时逐步放宽到上限
+    - 快照保存在插件数据目录，重启后不会重复推送
+    """
+
+    def __init__(self, api, data_dir: str, notify: Callable[[str], Awaitable], config: dict):
+        self.api = api
+        self.notify = notify
+        self.snapshot_file = os.path.join(data_dir, "subscribe_snapshot.json")
+        self.min_interval = max(30, int(config.get('subscribe_watch_min_interval', 300)))
+        self.max_interval = max(self.min_interval, int(config.get('subscribe_watch_max_interval', 1800)))
+        self.interval = self.min_interval
+        self.snapshot: dict[str, list] | None = None
+        self.last_poll: float | None = None
+        self._task: asyncio.Task | None = None
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        try:
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    self.snapshot = json.load(f)
+        except Exception as e:
+            logger.warning(f"加载订阅快照失败: {e}")
+
+    def _save_snapshot(self):
+        try:
+            with open(self.snapshot_file, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot, f, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"保存订阅快照失败: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"已启动订阅变化监听，轮询间隔 {self.min_interval}~{self.max_interval} 秒")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self):
+        while True:
+            try:
+                changed = await self.poll()
+                if changed:
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(int(self.interval * 1.5), self.max_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"订阅变化检查失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def poll(self) -> bool:
+        """拉取一次订阅列表并推送变化，返回是否有变化"""
+        subscribes = await self.api.get_subscribes()
+        if subscribes is None:
+            return False
+        self.last_poll = asyncio.get_running_loop().time()
+
+        current = {
+            str(sub.get('id')): [
+                sub.get('state', ''),
+                sub.get('lack_episode', 0) or 0,
+                sub.get('name', '未知'),
+                sub.get('season') or 0,
+            ]
+            for sub in subscribes if sub.get('id') is not None
+        }
+
+        if self.snapshot is None:
+            # 首次运行只建立基线，不推送
+            self.snapshot = current
+            self._save_snapshot()
+            return False
+
+        messages = self.diff(self.snapshot, current)
+        changed = current != self.snapshot
+        if changed:
+            self.snapshot = current
+            self._save_snapshot()
+        if messages:
+            await self.notify("🔔 订阅动态\n" + "\n".join(messages))
+        return changed
+
+    @staticmethod
+    def diff(previous: dict, current: dict) -> list[str]:
+        """比较两次快照，生成通知文本；未变化的订阅不产生任何输出"""
+        messages = []
+        for sub_id, (state, lack, name, season) in previous.items():
+            title = f"{name} 第{season}季" if season else name
+            if sub_id not in current:
+                # MoviePilot 会在订阅完成后将其移出订阅列表
+                if state not in COMPLETED_STATES:
+                    messages.append(f"✅ {title} 订阅已结束（已完成或被移除）")
+                continue
+
+            cur_state, cur_lack, _, _ = current[sub_id]
+            if cur_state in COMPLETED_STATES and state not in COMPLETED_STATES:
+                messages.append(f"✅ {title} 订阅已完成")
+            elif cur_lack < lack:
+                remain = f"，还缺 {cur_lack} 集" if cur_lack else "，已全部入库"
+                messages.append(f"📥 {title} 新增 {lack - cur_lack} 集{remain}")
+        return messages
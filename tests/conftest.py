@@ -0,0 +1,30 @@
+import importlib
+import logging
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "mp_emby_plugin"
+
+# 没有安装 AstrBot 时只提供各模块导入的名字
+try:
+    importlib.import_module("astrbot.api")
+except ImportError:
+    astrbot = types.ModuleType("astrbot")
+    astrbot_api = types.ModuleType("astrbot.api")
+    astrbot_api.logger = logging.getLogger("astrbot")
+    astrbot_event = types.ModuleType("astrbot.api.event")
+    astrbot_event.filter = astrbot_event.AstrMessageEvent = astrbot_event.MessageEventResult = None
+    astrbot_star = types.ModuleType("astrbot.api.star")
+    astrbot_star.Context = astrbot_star.Star = astrbot_star.register = None
+    astrbot.api = astrbot_api
+    astrbot_api.event, astrbot_api.star = astrbot_event, astrbot_star
+    sys.modules.update({"astrbot": astrbot, "astrbot.api": astrbot_api,
+                        "astrbot.api.event": astrbot_event, "astrbot.api.star": astrbot_star})
+
+# 插件目录本身是包（模块间使用相对导入），以固定的包名加载
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
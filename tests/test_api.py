@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from mp_emby_plugin.api import MoviepilotApi
+
+MP_URL = "http://mp.test"
+
+
+def _mp_api(handler, **config) -> MoviepilotApi:
+    """连接到 MockTransport 的 MoviepilotApi，token 已就绪，不需要登录"""
+    api = MoviepilotApi({"mp_url": MP_URL, "mp_username": "u", "mp_password": "p", **config})
+    api._token = "token"
+    api._token_expire_at = time.time() + 3600
+    api._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return api
+
+
+def test_concurrent_get_subscribes_share_one_request():
+    calls = []
+    subscribes = [
+        {"id": 1, "name": "剧A", "type": "电视剧", "tmdbid": 10, "season": 1},
+        {"id": 2, "name": "电影B", "type": "电影", "tmdbid": 20},
+    ]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=json.dumps(subscribes).encode())
+
+    async def main():
+        api = _mp_api(handler)
+        everything, movies = await asyncio.gather(
+            api.get_subscribes(),
+            api.get_subscribes(lambda sub: sub["type"] == "电影"),
+        )
+        await api.close()
+        return api, everything, movies
+
+    api, everything, movies = asyncio.run(main())
+    assert calls == ["/api/v1/subscribe/"]
+    assert [sub["id"] for sub in everything] == [1, 2]
+    assert [sub["id"] for sub in movies] == [2]
+    assert api.sub_index.has("电视剧", 10, 1) and api.sub_index.has("电影", 20)
+
+
+def test_subscribe_list_with_new_season_invalidates_season_cache():
+    upstream = {
+        "seasons": [{"season_number": 1, "air_date": "2020-01-01"}],
+        "subscribes": [{"id": 1, "name": "剧A", "type": "电视剧", "tmdbid": 10, "season": 1}],
+    }
+    season_requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/api/v1/tmdb/seasons/"):
+            season_requests.append(request.url.path)
+            return httpx.Response(200, json=upstream["seasons"])
+        return httpx.Response(200, content=json.dumps(upstream["subscribes"]).encode())
+
+    async def main():
+        api = _mp_api(handler)
+        before = await api.list_all_seasons("10")
+        await api.get_subscribes()
+        cached = await api.list_all_seasons("10")
+        # 新季上线并在 MoviePilot 中被订阅，缓存的季列表里还没有第 2 季
+        upstream["seasons"] = upstream["seasons"] + [{"season_number": 2, "air_date": "2021-01-01"}]
+        upstream["subscribes"] = upstream["subscribes"] + [
+            {"id": 2, "name": "剧A", "type": "电视剧", "tmdbid": 10, "season": 2}]
+        await api.get_subscribes()
+        after = await api.list_all_seasons("10")
+        await api.close()
+        return before, cached, after
+
+    before, cached, after = asyncio.run(main())
+    assert [s["season_number"] for s in before] == [1]
+    assert [s["season_number"] for s in cached] == [1]
+    assert [s["season_number"] for s in after] == [1, 2]
+    assert len(season_requests) == 2
+
+
+def test_season_list_with_upcoming_season_expires_at_air_date():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404)
+
+    api = _mp_api(handler)
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    aired = [{"season_number": 1, "air_date": "2020-01-01"}]
+    assert api._season_cache_ttl(aired) == api.season_cache.ttl
+    assert api._season_cache_ttl(aired + [{"season_number": 2, "air_date": tomorrow}]) <= 86400
+
+
+def test_open_breaker_returns_no_result_without_raising():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"success": True})
+
+    async def main():
+        api = _mp_api(handler)
+        for _ in range(api.breaker.failure_threshold):
+            api.breaker.record_failure("down")
+        headers = await api._get_headers()
+        result = await api._request(MP_URL + "/api/v1/download/", headers=headers)
+        await api.close()
+        return result
+
+    assert asyncio.run(main()) is None
+    assert requests == []
+
+
+def test_stale_subscribe_index_refreshes_in_background():
+    release = asyncio.Event()
+    subscribes = [{"id": 1, "name": "电影B", "type": "电影", "tmdbid": 20}]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        return httpx.Response(200, content=json.dumps(subscribes).encode())
+
+    async def main():
+        api = _mp_api(handler)
+        api.sub_index.rebuild([])
+        api.sub_index.updated_at -= api.sub_index.ttl + 1
+        # 已有（过期的）索引时立即返回，不等待订阅列表下载
+        index = await asyncio.wait_for(api.ensure_subscribe_index(max_wait=2), timeout=0.5)
+        stale_has = index.has("电影", 20)
+        release.set()
+        await index.task
+        await api.close()
+        return stale_has, index.has("电影", 20), index.stale
+
+    stale_has, fresh_has, stale = asyncio.run(main())
+    assert not stale_has and fresh_has and not stale
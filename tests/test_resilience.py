@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+from mp_emby_plugin.deadline import Deadline, clamp_timeout
+from mp_emby_plugin.resilience import CircuitBreaker, resilient_call
+
+
+def _timing_out_send(backend_timeout: float):
+    """像发请求一样按 clamp_timeout 取得超时，然后抛出 httpx 的超时"""
+    async def send():
+        clamp_timeout(backend_timeout)
+        raise httpx.ReadTimeout("timed out")
+    return send
+
+
+def test_budget_timeout_is_not_a_backend_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    async def main():
+        with pytest.raises(httpx.ReadTimeout):
+            await Deadline(1).run(resilient_call(_timing_out_send(10), breaker))
+
+    asyncio.run(main())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_backend_timeout_counts_as_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+
+    async def main():
+        with pytest.raises(httpx.ReadTimeout):
+            await Deadline(5).run(resilient_call(_timing_out_send(0.01), breaker))
+
+    asyncio.run(main())
+    assert breaker.state == CircuitBreaker.OPEN
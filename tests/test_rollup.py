@@ -0,0 +1,63 @@
+import asyncio
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+from mp_emby_plugin.api import EmbyApi
+
+EMBY_URL = "http://emby.test"
+
+
+def _emby_time(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+
+def test_report_refresh_resumes_from_watermark(tmp_path):
+    now = datetime.now(timezone.utc)
+    library = [{"Id": "m1", "Type": "Movie", "Name": "三天前", "DateCreated": _emby_time(now - timedelta(days=3))}]
+    queries = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        since = request.url.params["MinDateCreated"]
+        queries.append(since)
+        items = [] if int(request.url.params.get("StartIndex", 0)) else [
+            item for item in library if item["DateCreated"] >= since]
+        return httpx.Response(200, content=json.dumps({"Items": items}).encode())
+
+    async def main():
+        api = EmbyApi({"emby_url": EMBY_URL, "emby_api_key": "key"}, data_dir=str(tmp_path))
+        api._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        first = await api.get_additions_report(7)
+        watermark = api.rollup.watermark()
+        # 上次报告之后入库的条目，下次报告从水位线续查时补上
+        library.append({"Id": "m2", "Type": "Movie", "Name": "报告之后",
+                        "DateCreated": _emby_time(datetime.now(timezone.utc) + timedelta(seconds=1))})
+        second = await api.get_additions_report(7)
+        await api.close()
+        return first, second, watermark
+
+    first, second, watermark = asyncio.run(main())
+    window_start = datetime.combine(date.today() - timedelta(days=6), datetime.min.time()).astimezone()
+    assert queries[0] == window_start.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    assert queries[-1] == watermark
+    assert first["stats"]["Movie"] == 1
+    assert second["stats"]["Movie"] == 2
+
+
+def test_today_stats_query_uses_utc_midnight(tmp_path):
+    queries = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        queries.append(request.url.params["MinDateCreated"])
+        return httpx.Response(200, content=b'{"Items": []}')
+
+    async def main():
+        api = EmbyApi({"emby_url": EMBY_URL, "emby_api_key": "key", "emby_rollup_enabled": False})
+        api._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await api.get_today_additions_stats()
+        await api.close()
+
+    asyncio.run(main())
+    midnight = datetime.combine(date.today(), datetime.min.time()).astimezone()
+    assert queries == [midnight.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")]
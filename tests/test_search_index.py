@@ -0,0 +1,28 @@
+from mp_emby_plugin.search_index import SearchIndex
+
+
+def _names(results: list[dict]) -> list[str]:
+    return [item["Name"] for item in results]
+
+
+def test_short_queries_match_prefix_and_substring():
+    index = SearchIndex()
+    index.rebuild([
+        {"Id": "1", "Type": "Movie", "Name": "It"},
+        {"Id": "2", "Type": "Movie", "Name": "复仇者联盟"},
+        {"Id": "3", "Type": "Movie", "Name": "Inception"},
+        {"Id": "4", "Type": "Series", "Name": "报复"},
+    ])
+    assert _names(index.search("It")) == ["It"]
+    assert _names(index.search("复"))[0] == "复仇者联盟"
+    assert set(_names(index.search("复"))) >= {"复仇者联盟", "报复"}
+    assert _names(index.search("i"))[:2] == ["It", "Inception"]
+
+
+def test_short_queries_follow_incremental_updates():
+    index = SearchIndex()
+    index.rebuild([{"Id": "1", "Type": "Movie", "Name": "Up"}])
+    index.update([{"Id": "2", "Type": "Movie", "Name": "Us"}], removed_ids=["1"])
+    assert _names(index.search("u")) == ["Us"]
+    index.update([{"Id": "2", "Type": "Movie", "Name": "Her"}])
+    assert _names(index.search("u")) == []
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from mp_emby_plugin.webhook import WebhookReceiver, format_batch
+
+TOKEN = "secret"
+
+
+def _episode(num: int) -> dict:
+    return {
+        "Event": "library.new",
+        "Item": {"Id": f"ep{num}", "Type": "Episode", "Name": f"第 {num} 集", "SeriesId": "s1",
+                 "SeriesName": "测试剧", "ParentIndexNumber": 1, "IndexNumber": num},
+    }
+
+
+MOVIE = {"Event": "library.new", "Item": {"Id": "m1", "Type": "Movie", "Name": "测试电影", "ProductionYear": 2024}}
+
+
+def _run(config: dict, scenario):
+    """启动接收端，执行 scenario(client, receiver)，返回收到的批次"""
+    batches = []
+
+    async def on_batch(items):
+        batches.append(items)
+
+    async def main():
+        receiver = WebhookReceiver({"webhook_token": TOKEN, **config}, on_batch)
+        receiver.debounce = 0.05
+        async with TestClient(TestServer(receiver.build_app())) as client:
+            await scenario(client, receiver)
+        await receiver.stop()
+
+    asyncio.run(main())
+    return batches
+
+
+def test_rejects_request_without_token():
+    async def scenario(client, receiver):
+        resp = await client.post("/emby/webhook", json=MOVIE)
+        assert resp.status == 401
+        resp = await client.post("/emby/webhook?token=wrong", json=MOVIE)
+        assert resp.status == 401
+
+    assert _run({}, scenario) == []
+
+
+def test_accepts_json_event():
+    async def scenario(client, receiver):
+        resp = await client.post(f"/emby/webhook?token={TOKEN}&server=家", json=MOVIE)
+        assert resp.status == 204
+        await asyncio.sleep(0.2)
+
+    batches = _run({}, scenario)
+    assert len(batches) == 1
+    assert batches[0][0]["Id"] == "m1"
+    assert batches[0][0]["Server"] == "家"
+
+
+def test_accepts_form_encoded_event():
+    async def scenario(client, receiver):
+        resp = await client.post("/emby/webhook", data={"data": json.dumps(MOVIE)},
+                                 headers={"X-Webhook-Token": TOKEN})
+        assert resp.status == 204
+        await asyncio.sleep(0.2)
+
+    batches = _run({}, scenario)
+    assert [item["Id"] for item in batches[0]] == ["m1"]
+
+
+def test_rejects_malformed_json():
+    async def scenario(client, receiver):
+        resp = await client.post(f"/emby/webhook?token={TOKEN}", data="{not json",
+                                 headers={"Content-Type": "application/json"})
+        assert resp.status == 400
+
+    assert _run({}, scenario) == []
+
+
+def test_debounce_merges_episode_batch():
+    async def scenario(client, receiver):
+        for num in (1, 2, 3, 5):
+            resp = await client.post(f"/emby/webhook?token={TOKEN}", json=_episode(num))
+            assert resp.status == 204
+        # 重复推送同一集只保留一条
+        await client.post(f"/emby/webhook?token={TOKEN}", json=_episode(2))
+        await asyncio.sleep(0.3)
+
+    batches = _run({}, scenario)
+    assert len(batches) == 1
+    assert sorted(item["Id"] for item in batches[0]) == ["ep1", "ep2", "ep3", "ep5"]
+    assert format_batch(batches[0]).splitlines()[1] == "📺 [剧集] 测试剧 S1 E1-E3, E5"
+
+
+def test_refuses_public_bind_without_token():
+    async def main():
+        receiver = WebhookReceiver({"webhook_host": "0.0.0.0", "webhook_port": 0}, lambda items: None)
+        await receiver.start()
+        assert not receiver.running
+
+    asyncio.run(main())
+
+
+def test_defaults_to_loopback():
+    receiver = WebhookReceiver({}, lambda items: None)
+    assert receiver.host == "127.0.0.1"
+    assert receiver.loopback
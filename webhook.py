@@ -0,0 +1,201 @@
+import asyncio
+import hmac
+import ipaddress
+import json
+import time
+from typing import Awaitable, Callable
+
+from aiohttp import web
+
+from astrbot.api import logger
+
+from .rollup import add_episode, format_episode_ranges
+
+# Emby 新入库事件；Jellyfin Webhook 插件的新增条目事件
+EMBY_NEW_EVENTS = ("library.new", "item.added")
+JELLYFIN_NEW_EVENTS = ("ItemAdded",)
+ITEM_TYPES = ("Movie", "Series", "Episode")
+
+
+def parse_webhook(payload: dict) -> dict | None:
+    """把 Emby / Jellyfin 的新入库 webhook 转为 Emby 条目格式，其他事件返回 None"""
+    if payload.get("Event") in EMBY_NEW_EVENTS:
+        item = payload.get("Item") or {}
+        if item.get("Type") not in ITEM_TYPES or not item.get("Id"):
+            return None
+        return {k: item[k] for k in ("Id", "Type", "Name", "ProductionYear", "DateCreated", "SeriesId", "SeriesName",
+                                     "ParentIndexNumber", "IndexNumber", "ProviderIds") if k in item}
+
+    if payload.get("NotificationType") in JELLYFIN_NEW_EVENTS:
+        if payload.get("ItemType") not in ITEM_TYPES or not payload.get("ItemId"):
+            return None
+        item = {
+            "Id": payload["ItemId"],
+            "Type": payload["ItemType"],
+            "Name": payload.get("Name", "未知"),
+            "ProductionYear": payload.get("Year"),
+            "SeriesId": payload.get("SeriesId"),
+            "SeriesName": payload.get("SeriesName"),
+            "ParentIndexNumber": payload.get("SeasonNumber"),
+            "IndexNumber": payload.get("EpisodeNumber"),
+            "DateCreated": payload.get("UtcTimestamp"),
+            "ProviderIds": {k[len("Provider_"):]: v for k, v in payload.items() if k.startswith("Provider_")},
+        }
+        return {k: v for k, v in item.items() if v not in (None, "", {})}
+    return None
+
+
+def _group_key(item: dict) -> str:
+    """同一季的单集合并为一组，电影和剧集各自一组"""
+    if item.get("Type") == "Episode":
+        return f"{item.get('SeriesId') or item.get('SeriesName')}_S{item.get('ParentIndexNumber') or 0}"
+    return item["Id"]
+
+
+def format_batch(items: list[dict], title: str = "Emby 新入库") -> str:
+    """把一批新入库条目合并为一条通知，同一季的单集合并为集数区间"""
+    lines = []
+    seasons: dict[str, dict] = {}
+    for item in items:
+        name, year = item.get("Name", "未知"), item.get("ProductionYear")
+        if item.get("Type") == "Movie":
+            lines.append(f"🎬 [电影] {name} ({year})" if year else f"🎬 [电影] {name}")
+        elif item.get("Type") == "Series":
+            lines.append(f"📺 [剧集] {name} ({year})" if year else f"📺 [剧集] {name}")
+        else:
+            group = seasons.setdefault(_group_key(item), {
+                "name": item.get("SeriesName", "未知剧集"), "season": item.get("ParentIndexNumber") or 0, "ranges": [],
+            })
+            if item.get("IndexNumber"):
+                add_episode(group["ranges"], item["IndexNumber"])
+    for group in seasons.values():
+        season_str = f" S{group['season']}" if group["season"] else ""
+        lines.append(f"📺 [剧集] {group['name']}{season_str} {format_episode_ranges(group['ranges'])}".rstrip())
+    return f"🆕 {title}\n" + "\n".join(lines)
+
+
+class WebhookReceiver:
+    """接收 Emby / Jellyfin 新入库 webhook 的本地 HTTP 服务
+
+    - 事件先按 剧集+季（单集）或条目 ID（电影、剧集）分组缓冲，安静 debounce 秒后统一处理，
+      整季导入产生的大量单集事件只会合并成一批；持续有事件时最多等待 max_delay 秒
+    - 每批条目交给 on_batch（写入入库汇总、推送通知等），不需要任何轮询查询
+    - 配置了 token 时，请求需在 ?token= 或 X-Webhook-Token 头中携带；
+      未配置 token 时只允许监听本机地址，否则拒绝启动
+    - 多台服务器共用一个地址，以 ?server=<服务器标签> 区分来源，条目的 Server 字段记录该标签
+    """
+
+    def __init__(self, config: dict, on_batch: Callable[[list[dict]], Awaitable]):
+        self.host = str(config.get('webhook_host') or '127.0.0.1')
+        self.port = int(config.get('webhook_port', 8765))
+        self.path = '/' + str(config.get('webhook_path', '/emby/webhook')).lstrip('/')
+        self.token = str(config.get('webhook_token', '') or '')
+        self.debounce = max(1.0, float(config.get('webhook_debounce', 30)))
+        self.max_delay = max(self.debounce, float(config.get('webhook_max_delay', 300)))
+        self.on_batch = on_batch
+        self._pending: dict[tuple, dict] = {}  # (服务器, 条目 ID) -> 条目，同一条目重复推送只保留最后一次
+        self._first_at: float | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._runner: web.AppRunner | None = None
+        self.received = 0
+        self.batches = 0
+
+    @property
+    def loopback(self) -> bool:
+        """监听地址是否只接受本机请求"""
+        if self.host == "localhost":
+            return True
+        try:
+            return ipaddress.ip_address(self.host).is_loopback
+        except ValueError:
+            return False
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 * 1024)
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def start(self):
+        """开始监听，端口被占用、缺少令牌等错误会记录日志而不抛出"""
+        if not self.token and not self.loopback:
+            logger.error(f"Emby webhook 未设置 webhook_token，拒绝监听非本机地址 {self.host}，"
+                         f"请设置令牌或将 webhook_host 改为 127.0.0.1")
+            return
+        runner = web.AppRunner(self.build_app(), access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.error(f"Emby webhook 监听 {self.host}:{self.port} 失败: {e}")
+            return
+        self._runner = runner
+        logger.info(f"Emby webhook 已监听 http://{self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self._flush()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    def _authorized(self, request: web.Request) -> bool:
+        if not self.token:
+            return True
+        supplied = request.query.get("token") or request.headers.get("X-Webhook-Token", "")
+        return hmac.compare_digest(supplied, self.token)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            return web.Response(status=401)
+        try:
+            if request.content_type == "application/json":
+                payload = await request.json()
+            else:
+                # 旧版 Emby 以 multipart 表单的 data 字段发送 JSON
+                form = await request.post()
+                payload = json.loads(form.get("data", "{}"))
+        except Exception as e:
+            logger.warning(f"无法解析 webhook 请求: {e}")
+            return web.Response(status=400)
+
+        item = parse_webhook(payload) if isinstance(payload, dict) else None
+        if item is not None:
+            item["Server"] = request.query.get("server", "")
+            self.received += 1
+            self._pending[(item["Server"], item["Id"])] = item
+            self._schedule_flush()
+        return web.Response(status=204)
+
+    def _schedule_flush(self):
+        now = time.monotonic()
+        if self._first_at is None:
+            self._first_at = now
+        # 每来一个事件重新计时，但不超过第一个事件之后 max_delay 秒
+        delay = min(self.debounce, self._first_at + self.max_delay - now)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        self._flush_task = asyncio.create_task(self._flush_later(max(0.0, delay)))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        if not self._pending:
+            return
+        items = list(self._pending.values())
+        self._pending.clear()
+        self._first_at = None
+        self.batches += 1
+        try:
+            await self.on_batch(items)
+        except Exception as e:
+            logger.error(f"处理 webhook 入库事件失败: {e}")